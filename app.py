@@ -1,4 +1,11 @@
-from src.ui.gradio_app import launch
+from src.config.settings import WEB_WORKERS
 
 if __name__ == "__main__":
-    launch()
+    if WEB_WORKERS == 1:
+        from src.ui.gradio_app import launch
+
+        launch()
+    else:
+        from src.ui.workers import serve
+
+        serve()
@@ -0,0 +1,204 @@
+"""
+Conversation engine load test against a mock LLM.
+
+Usage:
+    python -m benchmarks.bench_agent [--users 1000] [--concurrency 100] [--latency 800]
+                                     [--jitter 200] [--stream] [--no-cache] [--sessions memory|sqlite]
+
+Drives full birth-certificate and ID-appointment conversations for many
+simulated users through KebeleAgent.process_async (or process_stream) with
+the OpenAI endpoint replaced by benchmarks.mock_openai. Phrasings are mixed
+so some turns hit the rule-based fast path and some go to the (mock) LLM.
+
+Reports turn throughput, per-turn p50/p95/p99, LLM calls, session memory
+growth and the background PDF render rate. Runs in a temporary directory
+and needs no network access.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.mock_openai import MockOpenAI
+
+
+# Each step is (message, files); "{doc}" is replaced by a sample upload.
+# The first variant of a step is what the fast path understands, the others
+# are free text that needs the LLM.
+BIRTH_SCRIPT = [
+    [("A", None), ("I want to register a birth", None), ("birth certificate please", None)],
+    [("Abebe Kebede", None), ("his name is Abebe Kebede", None)],
+    [("12/10/2020", None), ("he was born on 12/10/2020", None)],
+    [("A", None), ("he is a boy", None)],
+    [("Kebede Alemu", None), ("the father's name is Kebede Alemu", None)],
+    [("Almaz Tesfaye", None), ("mother's name is Almaz Tesfaye", None)],
+    [("", ["{doc}"])],
+    [("A", None)],
+    [("A", None)],
+]
+
+ID_SCRIPT = [
+    [("B", None), ("I need an ID appointment", None)],
+    [("25", None), ("I am 25 years old", None)],
+    [("A", None)],
+    [("B", None)],
+    [("done", None)],
+    [("A", None)],
+]
+
+
+def percentile(sorted_values: list, p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def max_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def conversation(rng: random.Random, llm_ratio: float, doc: str) -> list:
+    """Pick one script and a phrasing for each step."""
+    script = BIRTH_SCRIPT if rng.random() < 0.5 else ID_SCRIPT
+    turns = []
+    for variants in script:
+        message, files = variants[0] if len(variants) == 1 or rng.random() >= llm_ratio else rng.choice(variants[1:])
+        turns.append((message, [doc] if files else None))
+    return turns
+
+
+async def run_user(agent, user_id: str, turns: list, stream: bool, latencies: list, states: dict):
+    agent.start(user_id, "en")
+    for message, files in turns:
+        start = time.perf_counter()
+        if stream:
+            async for event in agent.process_stream(user_id, message, "en", files=files):
+                pass
+        else:
+            await agent.process_async(user_id, message, "en", files=files)
+        latencies.append(time.perf_counter() - start)
+    state = agent.sessions[user_id]["state"]
+    states[state] = states.get(state, 0) + 1
+
+
+async def run(args, agent, doc: str) -> dict:
+    rng = random.Random(args.seed)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies, states = [], {}
+
+    async def limited(i: int):
+        async with semaphore:
+            await run_user(agent, f"bench_{i}", conversation(rng, args.llm_ratio, doc), args.stream, latencies, states)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(limited(i) for i in range(args.users)))
+    return {"seconds": time.perf_counter() - start, "latencies": sorted(latencies), "states": states}
+
+
+def drain_render_queue(timeout: float = 300) -> dict:
+    from src.utils.render_queue import get_render_queue
+
+    queue = get_render_queue()
+    deadline = time.perf_counter() + timeout
+    while queue.stats().get("queued", 0) and time.perf_counter() < deadline:
+        time.sleep(0.05)
+    return queue.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100, help="users in flight at once")
+    parser.add_argument("--latency", type=float, default=800, help="mock LLM latency in ms")
+    parser.add_argument("--jitter", type=float, default=200, help="mock LLM latency +/- ms")
+    parser.add_argument("--llm-ratio", type=float, default=0.3, help="share of turns phrased as free text")
+    parser.add_argument("--stream", action="store_true", help="use process_stream instead of process_async")
+    parser.add_argument("--no-cache", action="store_true", help="disable the NLU result cache")
+    parser.add_argument("--sessions", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    mock = MockOpenAI(args.latency, args.jitter).start()
+
+    # Settings are read at import time, so configure the environment first
+    os.environ["OPENAI_API_KEY"] = "sk-bench"
+    os.environ["OPENAI_BASE_URL"] = mock.base_url
+    os.environ["NLU_POOL_SIZE"] = str(max(args.concurrency, 1))
+    os.environ["SESSION_BACKEND"] = args.sessions
+    os.environ["SESSION_MAX"] = str(args.users * 2)
+    os.environ.setdefault("PDF_QUEUE_MAX", str(args.users))
+    # Scripted ID users all pick the same slot; running out of places is not what this measures
+    os.environ.setdefault("SLOT_CAPACITY", str(args.users))
+    if args.no_cache:
+        os.environ["NLU_CACHE_SIZE"] = "0"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+        os.chdir(tmp)
+        doc = Path(tmp) / "birth_notice.pdf"
+        doc.write_bytes(b"%PDF-1.4\n%bench\n")
+
+        from src.agent.core import agent
+        from src.agent.fastpath import stats as fastpath_stats
+
+        sessions_before = agent.sessions.stats()
+        rss_before = max_rss_mb()
+        result = asyncio.run(run(args, agent, str(doc)))
+        sessions_after = agent.sessions.stats()
+
+        pdf_start = time.perf_counter()
+        pdf_jobs = drain_render_queue()
+        pdf_drain = time.perf_counter() - pdf_start
+
+    mock.stop()
+    latencies = result["latencies"]
+    completed = result["states"].get("birth_complete", 0) + result["states"].get("id_complete", 0)
+    report = {
+        "users": args.users,
+        "completed": completed,
+        "turns": len(latencies),
+        "seconds": round(result["seconds"], 3),
+        "turns_per_second": round(len(latencies) / result["seconds"], 1),
+        "turn_ms": {f"p{p}": round(percentile(latencies, p) * 1000, 2) for p in (50, 95, 99)},
+        "turn_ms_max": round(latencies[-1] * 1000, 2) if latencies else 0,
+        "llm_calls": mock.requests,
+        "fastpath": fastpath_stats.snapshot(),
+        "session_bytes_before": sessions_before["bytes_total"],
+        "session_bytes_after": sessions_after["bytes_total"],
+        "session_bytes_per_user": round(sessions_after["bytes_per_session"]),
+        "max_rss_mb": {"before": round(rss_before, 1), "after": round(max_rss_mb(), 1)},
+        "pdf_jobs": pdf_jobs,
+        "pdf_drain_seconds": round(pdf_drain, 3),
+        "pdf_per_second": round(pdf_jobs.get("done", 0) / (result["seconds"] + pdf_drain), 1),
+    }
+    if completed != args.users:
+        report["final_states"] = result["states"]
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"users {report['users']}  completed {completed}  turns {report['turns']}  in {report['seconds']}s")
+    print(f"throughput        {report['turns_per_second']:10.1f} turns/s")
+    print("turn latency ms   " + "  ".join(f"{k} {v:.1f}" for k, v in report["turn_ms"].items())
+          + f"  max {report['turn_ms_max']:.1f}")
+    print(f"llm calls         {report['llm_calls']:10d}")
+    print(f"sessions          {report['session_bytes_before']:,} -> {report['session_bytes_after']:,} bytes "
+          f"({report['session_bytes_per_user']:,} per user)")
+    print(f"max rss           {report['max_rss_mb']['before']} -> {report['max_rss_mb']['after']} MB")
+    print(f"pdf               {report['pdf_jobs']}  {report['pdf_per_second']} certs/s "
+          f"(queue drained {report['pdf_drain_seconds']}s after the last turn)")
+    if "final_states" in report:
+        print(f"unfinished        {report['final_states']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+End-to-end load test through the Gradio HTTP API.
+
+Usage:
+    python -m benchmarks.bench_gradio [--users 100] [--concurrency 20] [--latency 800]
+    python -m benchmarks.bench_gradio --url http://127.0.0.1:7860 [--users 100]
+
+Without --url it starts the mock LLM and the app (create_app under uvicorn)
+in this process on a free port. With --url it targets a running server,
+which must already point at a mock or real LLM via OPENAI_BASE_URL.
+
+Speaks Gradio's queue protocol directly (POST /queue/join, then the
+server-sent events on /queue/data) so every simulated user is one browser
+session, and reports per-turn latency as the browser sees it.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+
+from benchmarks.bench_agent import conversation, percentile
+from benchmarks.mock_openai import MockOpenAI
+
+
+LANGUAGE = "English"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int):
+    """Run the app under uvicorn on a daemon thread; returns the server."""
+    import uvicorn
+    from src.ui.gradio_app import create_app
+
+    server = uvicorn.Server(uvicorn.Config(create_app(), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.time() + 30
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError("server did not start")
+        time.sleep(0.05)
+    return server
+
+
+async def fn_index(client: httpx.AsyncClient, api_name: str) -> int:
+    config = (await client.get("/config")).json()
+    for i, dep in enumerate(config["dependencies"]):
+        if dep.get("api_name") == api_name:
+            return i
+    raise RuntimeError(f"no endpoint named {api_name!r}")
+
+
+async def upload(client: httpx.AsyncClient, path: str) -> dict:
+    with open(path, "rb") as f:
+        response = await client.post("/upload", files={"files": (Path(path).name, f.read())})
+    response.raise_for_status()
+    return {"path": response.json()[0], "orig_name": Path(path).name, "meta": {"_type": "gradio.FileData"}}
+
+
+async def call(client: httpx.AsyncClient, session_hash: str, fn: int, data: list) -> list:
+    """Queue one event and wait for its output on the session's event stream."""
+    response = await client.post("/queue/join", json={
+        "data": data, "fn_index": fn, "session_hash": session_hash, "event_data": None, "trigger_id": None,
+    })
+    response.raise_for_status()
+    event_id = response.json()["event_id"]
+    async with client.stream("GET", "/queue/data", params={"session_hash": session_hash}) as stream:
+        async for line in stream.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            message = json.loads(line[5:])
+            if message.get("event_id") != event_id or message.get("msg") != "process_completed":
+                continue
+            if not message.get("success"):
+                raise RuntimeError(message.get("output", {}).get("error") or "event failed")
+            return message["output"]["data"]
+    raise RuntimeError("event stream closed before the event completed")
+
+
+async def run_user(client, fn: int, turns: list, latencies: list, errors: list):
+    session_hash = uuid.uuid4().hex[:11]
+    history = []
+    for message, files in turns:
+        start = time.perf_counter()
+        try:
+            uploads = [await upload(client, f) for f in files] if files else None
+            output = await call(client, session_hash, fn, [message, history, LANGUAGE, uploads])
+        except Exception as e:
+            errors.append(str(e))
+            return
+        latencies.append(time.perf_counter() - start)
+        history = output[0]
+
+
+async def run(args, base_url: str, doc: str) -> dict:
+    rng = random.Random(args.seed)
+    latencies, errors = [], []
+    limits = httpx.Limits(max_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        fn = await fn_index(client, "send")
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def limited():
+            async with semaphore:
+                await run_user(client, fn, conversation(rng, args.llm_ratio, doc), latencies, errors)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(limited() for _ in range(args.users)))
+        seconds = time.perf_counter() - start
+    return {"seconds": seconds, "latencies": sorted(latencies), "errors": errors}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="target a running server instead of starting one")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=800, help="mock LLM latency in ms")
+    parser.add_argument("--jitter", type=float, default=200, help="mock LLM latency +/- ms")
+    parser.add_argument("--llm-ratio", type=float, default=0.3, help="share of turns phrased as free text")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        doc = Path(tmp) / "birth_notice.pdf"
+        doc.write_bytes(b"%PDF-1.4\n%bench\n")
+
+        mock = server = None
+        base_url = args.url
+        if not base_url:
+            mock = MockOpenAI(args.latency, args.jitter).start()
+            os.environ["OPENAI_API_KEY"] = "sk-bench"
+            os.environ["OPENAI_BASE_URL"] = mock.base_url
+            sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+            os.chdir(tmp)
+            port = free_port()
+            server = start_server(port)
+            base_url = f"http://127.0.0.1:{port}"
+
+        result = asyncio.run(run(args, base_url, str(doc)))
+
+        if server is not None:
+            server.should_exit = True
+        if mock is not None:
+            mock.stop()
+
+    latencies = result["latencies"]
+    print(f"users {args.users}  turns {len(latencies)}  errors {len(result['errors'])}  in {result['seconds']:.2f}s")
+    print(f"throughput        {len(latencies) / result['seconds']:10.1f} turns/s")
+    print("turn latency ms   " + "  ".join(f"p{p} {percentile(latencies, p) * 1000:.1f}" for p in (50, 95, 99)))
+    if mock is not None:
+        print(f"llm calls         {mock.requests:10d}")
+    for error in sorted(set(result["errors"]))[:5]:
+        print(f"error: {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Cold-start profile: import time of the app and time until warm-up is done.
+
+Usage:
+    python -m benchmarks.bench_import [--module src.ui.gradio_app] [--top 15]
+    python -m benchmarks.bench_import --check     # exit 1 if a deferred dependency is imported eagerly
+
+Each measurement runs in a fresh interpreter (python -X importtime), so the
+numbers are what a new replica pays. --check is meant for CI: the LLM stack
+and ReportLab must stay out of the import chain and load during warm-up.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from src.config.settings import find_env_file
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Loaded by warm_up() or on first use, never by importing the app
+DEFERRED = ("langchain", "langchain_core", "langchain_openai", "openai", "tiktoken", "reportlab")
+if find_env_file(str(ROOT / "src" / "config")) is None:
+    DEFERRED += ("dotenv",)  # only needed to load a .env
+
+
+def import_profile(module: str) -> list:
+    """[(package, self_us, cumulative_us, depth), ...] for one cold import of ``module``."""
+    with tempfile.TemporaryDirectory() as tmp:
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=tmp, capture_output=True, text=True,
+            env={**os.environ, "PYTHONPATH": str(ROOT), "JOURNAL_ENABLED": "False"},
+        )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def warm_up_seconds(module: str) -> dict:
+    """Import ``module`` and run warm_up() in a fresh interpreter; returns its timings."""
+    code = (
+        "import json, time\n"
+        "t = time.perf_counter()\n"
+        f"import {module}\n"
+        "imported = time.perf_counter() - t\n"
+        "from src.agent.warmup import warm_up\n"
+        "state = warm_up()\n"
+        "print(json.dumps({'import': imported, 'ready': time.perf_counter() - t, 'steps': state['seconds']}))\n"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=tmp, capture_output=True, text=True,
+            env={**os.environ, "PYTHONPATH": str(ROOT), "JOURNAL_ENABLED": "False", "OPENAI_API_KEY": "sk-bench"},
+        )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default="src.ui.gradio_app")
+    parser.add_argument("--top", type=int, default=15, help="heaviest top-level packages to list")
+    parser.add_argument("--check", action="store_true", help="fail if a deferred dependency is imported")
+    parser.add_argument("--no-warm-up", action="store_true", help="skip the warm-up measurement")
+    args = parser.parse_args()
+
+    rows = import_profile(args.module)
+    packages = {}
+    for name, _, cumulative, _ in rows:
+        top = name.split(".")[0]
+        packages[top] = max(packages.get(top, 0), cumulative)
+    total = max((cumulative for name, _, cumulative, _ in rows if name == args.module), default=0)
+
+    print(f"import {args.module}: {total / 1e6:.3f}s ({len(rows)} modules)")
+    print("heaviest packages (cumulative):")
+    for top, us in sorted(packages.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"  {top:24s} {us / 1e3:9.1f} ms")
+
+    eager = sorted({name.split(".")[0] for name, *_ in rows} & set(DEFERRED))
+    print(f"deferred dependencies imported eagerly: {', '.join(eager) or 'none'}")
+
+    if not args.no_warm_up:
+        timing = warm_up_seconds(args.module)
+        steps = "  ".join(f"{k} {v:.2f}s" for k, v in timing["steps"].items())
+        print(f"ready after {timing['ready']:.2f}s (import {timing['import']:.2f}s, warm-up: {steps})")
+
+    if args.check and eager:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Certificate rendering throughput.
+
+Usage:
+    python -m benchmarks.bench_pdf [--count 500]
+
+Reports certificates per second for one-file-per-certificate rendering and,
+when available, for a single multi-page PDF.
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from src.utils import pdf_generator
+
+
+SAMPLE = {
+    "child_name": "Tadesse Taffa",
+    "date_of_birth": "12/10/2020",
+    "sex": "Male",
+    "father_name": "Taffa Bekele",
+    "mother_name": "Almaz Tesfaye",
+    "reference_number": "BIRTH/2026/ABCD1234",
+}
+
+
+def bench_files(count: int, out_dir: Path) -> float:
+    start = time.perf_counter()
+    for i in range(count):
+        pdf_generator.generate_birth_certificate_pdf(SAMPLE, str(out_dir / f"cert_{i}.pdf"))
+    return count / (time.perf_counter() - start)
+
+
+def bench_multipage(count: int, out_dir: Path) -> float:
+    start = time.perf_counter()
+    pdf_generator.render_certificates_pdf(
+        pdf_generator.BIRTH_CERTIFICATE, (SAMPLE for _ in range(count)), str(out_dir / "batch.pdf")
+    )
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        out_dir = Path(tmp)
+        pdf_generator.generate_birth_certificate_pdf(SAMPLE, str(out_dir / "warmup.pdf"))
+        print(f"one file per certificate: {bench_files(args.count, out_dir):8.1f} certs/s")
+        if hasattr(pdf_generator, "render_certificates_pdf"):
+            print(f"single multi-page PDF:    {bench_multipage(args.count, out_dir):8.1f} certs/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Local stand-in for the OpenAI chat completions endpoint.
+
+Answers /v1/chat/completions with a forced ``UserCommand`` tool call built
+from simple rules over the prompt's "Current state" and "User message", after
+a configurable delay. Supports both plain and ``stream=true`` (SSE) requests.
+
+Usage:
+    python -m benchmarks.mock_openai --port 8765 --latency 800 --jitter 200
+
+then point the agent at it with OPENAI_BASE_URL=http://127.0.0.1:8765/v1.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+STATE_RE = re.compile(r"Current state: (\S+)")
+MESSAGE_RE = re.compile(r"User message: (.*)\Z", re.S)
+DATE_RE = re.compile(r"\b(\d{1,2}/\d{1,2}/\d{4})\b")
+NAME_PREFIX_RE = re.compile(r"^(?:(?:his|her|the|my)\s+)?(?:(?:child'?s?|father'?s?|mother'?s?|kid'?s?)\s+)?"
+                            r"(?:full\s+)?name\s+is\s+|^it'?s\s+|^i am\s+", re.I)
+
+NAME_FIELDS = {
+    "birth_child_name": "child_name",
+    "birth_father_name": "father_name",
+    "birth_mother_name": "mother_name",
+}
+
+
+def canned_command(state: str, message: str) -> dict:
+    """Rule-based stand-in for what the real model would extract."""
+    text = message.strip()
+    lower = text.lower()
+    if text.upper() in ("A", "B", "C", "D", "DONE"):
+        return {"intent": "choose_option", "choice": text.upper(), "fields": {}}
+    if any(w in lower for w in ("start over", "reset", "restart")):
+        return {"intent": "reset", "fields": {}}
+    if state == "greeting":
+        if "birth" in lower or "ልደት" in text:
+            return {"intent": "choose_service", "service": "birth_certificate", "fields": {}}
+        if re.search(r"\bid\b|መታወቂያ|appointment", lower):
+            return {"intent": "choose_service", "service": "id_appointment", "fields": {}}
+        return {"intent": "unknown", "fields": {}}
+    if state in NAME_FIELDS:
+        return {"intent": "provide_field", "fields": {NAME_FIELDS[state]: NAME_PREFIX_RE.sub("", text).strip(" .")}}
+    if state == "birth_dob":
+        m = DATE_RE.search(text)
+        return {"intent": "provide_field", "fields": {"date_of_birth": m.group(1)}} if m else {"intent": "unknown", "fields": {}}
+    if state == "birth_sex":
+        if re.search(r"\b(boy|son|male)\b", lower):
+            return {"intent": "provide_field", "fields": {"sex": "Male"}}
+        if re.search(r"\b(girl|daughter|female)\b", lower):
+            return {"intent": "provide_field", "fields": {"sex": "Female"}}
+    if state == "id_age":
+        m = re.search(r"\d{1,3}", text)
+        if m:
+            return {"intent": "provide_field", "fields": {"age": int(m.group())}}
+    return {"intent": "unknown", "fields": {}}
+
+
+class MockOpenAI:
+    def __init__(self, latency_ms: float = 800, jitter_ms: float = 0, host: str = "127.0.0.1", port: int = 0):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.requests = 0
+        self._lock = threading.Lock()
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not self.path.endswith("/chat/completions"):
+                    self.send_error(404)
+                    return
+                with mock._lock:
+                    mock.requests += 1
+                prompt = "\n".join(str(m.get("content") or "") for m in body.get("messages", []))
+                state = (STATE_RE.search(prompt) or [None, "greeting"])[1]
+                message = (MESSAGE_RE.search(prompt) or [None, ""])[1]
+                arguments = json.dumps(canned_command(state, message), ensure_ascii=False)
+                time.sleep(max(0.0, mock.latency + random.uniform(-mock.jitter, mock.jitter)))
+                if body.get("stream"):
+                    self._stream(body, arguments, prompt)
+                else:
+                    self._json(body, arguments, prompt)
+
+            def _usage(self, prompt: str, arguments: str) -> dict:
+                prompt_tokens, completion_tokens = len(prompt) // 4, len(arguments) // 4
+                return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens}
+
+            def _json(self, body: dict, arguments: str, prompt: str):
+                payload = json.dumps({
+                    "id": "chatcmpl-mock",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "mock"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {
+                            "role": "assistant",
+                            "content": None,
+                            "tool_calls": [{
+                                "id": "call_mock",
+                                "type": "function",
+                                "function": {"name": "UserCommand", "arguments": arguments},
+                            }],
+                        },
+                        "finish_reason": "tool_calls",
+                    }],
+                    "usage": self._usage(prompt, arguments),
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _stream(self, body: dict, arguments: str, prompt: str):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                def chunk(delta: dict, finish: str = None):
+                    data = json.dumps({
+                        "id": "chatcmpl-mock",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": body.get("model", "mock"),
+                        "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+                    })
+                    raw = f"data: {data}\n\n".encode()
+                    self.wfile.write(f"{len(raw):x}\r\n".encode() + raw + b"\r\n")
+                    self.wfile.flush()
+
+                chunk({"role": "assistant", "content": None, "tool_calls": [{
+                    "index": 0, "id": "call_mock", "type": "function",
+                    "function": {"name": "UserCommand", "arguments": ""}}]})
+                for i in range(0, len(arguments), 16):
+                    chunk({"tool_calls": [{"index": 0, "function": {"arguments": arguments[i:i + 16]}}]})
+                chunk({}, finish="tool_calls")
+                raw = b"data: [DONE]\n\n"
+                self.wfile.write(f"{len(raw):x}\r\n".encode() + raw + b"\r\n0\r\n\r\n")
+                self.wfile.flush()
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "MockOpenAI":
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=800, help="response delay in ms")
+    parser.add_argument("--jitter", type=float, default=0, help="+/- random delay in ms")
+    args = parser.parse_args()
+    mock = MockOpenAI(args.latency, args.jitter, args.host, args.port)
+    print(f"Mock OpenAI listening on {mock.base_url}")
+    mock.server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Replay recorded conversation traces (TRACE_PATH) through KebeleAgent.process.
+
+Usage:
+    python -m benchmarks.replay_traces data/traces/*.jsonl.gz
+    python -m benchmarks.replay_traces trace.jsonl.gz --repeat 10 --profile
+    python -m benchmarks.replay_traces trace.jsonl.gz --record replay.jsonl.gz   # keep the replay's own trace
+
+Every turn runs the real fast path, flows and field handling; wherever the
+turn needed the LLM, the command recorded for it is returned instead, so
+no provider is called and a day of traffic replays in seconds. Journal,
+analytics and the NLU cache are off, and stores live in a temp directory.
+
+The report compares the replay with the recording: time per stage (the
+LLM excluded) and turns whose resulting state differs, which is how a
+change to the flows or to field handling shows up before it ships. The exit
+status is 1 if any turn ends in a different state.
+"""
+import argparse
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+def load(paths: list, read_traces) -> list:
+    """Records of all files, in time order (several worker processes write one file each)."""
+    records = [record for path in paths for record in read_traces(path)]
+    records.sort(key=lambda record: record.get("t", 0))
+    return records
+
+
+def replay(agent, records: list, doc: str, repeat: int, UserCommand, rule_parse) -> dict:
+    """Run the records through the agent; returns counts of what could not be replayed as recorded."""
+    counts = {"turns": 0, "starts": 0, "seeded": 0, "unrecorded": 0}
+    for round_ in range(repeat):
+        for record in records:
+            user = record["user"] if round_ == 0 else f"{record['user']}#{round_}"
+            if record["op"] == "start":
+                agent.start(user, record["lang"])
+                counts["starts"] += 1
+                continue
+            if record["op"] != "turn":
+                continue
+            if user not in agent.sessions:
+                # The trace began mid-conversation: resume from the recorded state
+                s = agent._new_session(record["lang"])
+                if record["before"] != s["state"]:
+                    s.update(state=record["before"], service=record.get("service"))
+                agent.sessions.save(user, s)
+                counts["seeded"] += 1
+
+            def parse(message, state, language, cmd=record.get("cmd")):
+                if cmd is not None:
+                    return UserCommand(**cmd)
+                counts["unrecorded"] += 1
+                return rule_parse(message, state, language) or UserCommand(intent="unknown", fields={})
+
+            files = [doc] * record.get("files", 0) or None
+            agent.process(user, record.get("msg", ""), record["lang"], files=files, parse=parse)
+            counts["turns"] += 1
+    return counts
+
+
+def stage_totals(turns: list) -> dict:
+    totals = {}
+    for record in turns:
+        for name, ms in record.get("stages", {}).items():
+            if name != "nlu":
+                totals[name] = totals.get(name, 0) + ms
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("traces", nargs="+", help="trace files (.jsonl or .jsonl.gz)")
+    parser.add_argument("--repeat", type=int, default=1, help="replay the traces this many times (as new users)")
+    parser.add_argument("--profile", action="store_true", help="run under cProfile and list the hottest functions")
+    parser.add_argument("--top", type=int, default=25, help="functions to list with --profile")
+    parser.add_argument("--diffs", type=int, default=10, help="diverging turns to show")
+    parser.add_argument("--record", help="also keep the replay's own trace here")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+    paths = [str(Path(p).resolve()) for p in args.traces]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        replay_trace = str(Path(args.record).resolve()) if args.record else str(Path(tmp) / "replay.jsonl")
+        # Settings are read at import time, so configure the environment first
+        os.environ.update({
+            "OPENAI_API_KEY": "sk-replay",
+            "NLU_PROVIDERS": "rules",  # never reach a real LLM, even by mistake
+            "NLU_CACHE_SIZE": "0",
+            "JOURNAL_ENABLED": "False",
+            "ANALYTICS_ENABLED": "False",
+            "SESSION_BACKEND": "memory",
+            "SESSION_MAX": "10000000",
+            "TRACE_PATH": replay_trace,
+        })
+        # A fresh inventory must not run out when traces are repeated
+        os.environ.setdefault("SLOT_CAPACITY", "1000000")
+        sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+        os.chdir(tmp)
+        doc = Path(tmp) / "upload.pdf"
+        doc.write_bytes(b"%PDF-1.4\n%replay\n")
+
+        from src.agent.core import agent
+        from src.agent.fastpath import rule_parse
+        from src.agent.nlu import UserCommand
+        from src.agent.trace import read_traces
+        from src.utils.render_queue import get_render_queue
+
+        records = load(paths, read_traces)
+        profiler = cProfile.Profile() if args.profile else None
+        started = time.perf_counter()
+        if profiler:
+            profiler.enable()
+        counts = replay(agent, records, str(doc), args.repeat, UserCommand, rule_parse)
+        if profiler:
+            profiler.disable()
+        seconds = time.perf_counter() - started
+        agent.tracer.close()
+        get_render_queue().shutdown(wait=True)
+        replayed = [r for r in read_traces(replay_trace) if r["op"] == "turn"]
+
+    recorded = [r for r in records if r["op"] == "turn"]
+    diffs = [
+        {"user": old["user"], "msg": old.get("msg"), "before": old["before"],
+         "recorded": old["after"], "replayed": new["after"]}
+        for old, new in zip(recorded, replayed) if old["after"] != new["after"]
+    ]
+    recorded_stages = stage_totals(recorded)
+    replayed_stages = stage_totals(replayed[:len(recorded)])
+    report = {
+        **counts,
+        "seconds": round(seconds, 3),
+        "turns_per_second": round(counts["turns"] / seconds, 1) if seconds else 0,
+        "stages_ms": {
+            name: {"recorded": round(recorded_stages.get(name, 0), 2), "replayed": round(replayed_stages.get(name, 0), 2)}
+            for name in sorted(set(recorded_stages) | set(replayed_stages))
+        },
+        "diverged": len(diffs),
+        "diffs": diffs[:args.diffs],
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print(f"turns {counts['turns']}  starts {counts['starts']}  in {report['seconds']}s  "
+              f"({report['turns_per_second']} turns/s)")
+        print(f"seeded sessions {counts['seeded']}  turns without a recorded command {counts['unrecorded']}")
+        print("stage ms (first pass, LLM excluded)   recorded   replayed")
+        for name, ms in report["stages_ms"].items():
+            print(f"  {name:34s} {ms['recorded']:10.1f} {ms['replayed']:10.1f}")
+        print(f"turns ending in a different state: {len(diffs)}")
+        for diff in report["diffs"]:
+            print(f"  {diff['user']} at {diff['before']}: {diff['msg']!r} -> {diff['recorded']} (recorded), "
+                  f"{diff['replayed']} (replayed)")
+    if profiler:
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(args.top)
+        print(out.getvalue())
+    if diffs:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Message catalog compiled from src/agent/prompts.py at startup.
+
+Each language becomes one flat dict with its fallbacks already filled in
+and the composed summaries already joined, so a turn picks its table with
+a single dict lookup (messages(language)) and every message after that is
+one more. Keys and texts are interned. The tables are checked while they
+are built: unknown keys, placeholders that differ from the default
+language, and untranslated messages in a language without a fallback all
+stop the app at import, like a broken flow does.
+"""
+import sys
+from string import Formatter
+from typing import Dict, List, Optional
+
+from src.agent.prompts import DEFAULT_LANGUAGE, FALLBACKS, LANGUAGES, MSG, RESPONSES
+
+
+KEYS = frozenset(v for k, v in vars(MSG).items() if k.isupper())
+
+# Messages built by joining others (with a blank line) once per language
+COMPOSED = {
+    MSG.BIRTH_COMPLETE_PDF_READY: (MSG.BIRTH_COMPLETE, MSG.PDF_READY),
+    MSG.BIRTH_COMPLETE_PDF_QUEUED: (MSG.BIRTH_COMPLETE, MSG.PDF_QUEUED),
+}
+
+
+def placeholders(text: str) -> set:
+    """Names of the {fields} in a message."""
+    return {field for _, field, _, _ in Formatter().parse(text) if field is not None}
+
+
+def check_catalog(responses: Dict[str, dict] = RESPONSES, languages: Dict[str, str] = LANGUAGES,
+                  fallbacks: Dict[str, str] = FALLBACKS, default: str = DEFAULT_LANGUAGE) -> List[str]:
+    """
+    Find mistakes in the translation tables.
+
+    Returns:
+        List of problems (empty if the catalog is usable)
+    """
+    problems = []
+    if default not in responses:
+        return [f"default language {default!r} has no messages"]
+    required = KEYS - set(COMPOSED)
+    reference = responses[default]
+    for key in sorted(required - set(reference)):
+        problems.append(f"{default}: {key!r} missing")
+    for language in languages:
+        if language not in responses:
+            problems.append(f"{language}: listed in LANGUAGES but has no messages")
+    for language, table in responses.items():
+        if language not in languages:
+            problems.append(f"{language}: has messages but is not in LANGUAGES")
+        for key in sorted(set(table) - required):
+            problems.append(f"{language}: unknown key {key!r}")
+        for key, text in table.items():
+            if key in reference and placeholders(text) != placeholders(reference[key]):
+                problems.append(f"{language}: {key!r} placeholders differ from {default!r}")
+        if language not in fallbacks:
+            for key in sorted(required - set(table)):
+                problems.append(f"{language}: {key!r} missing (and no fallback language)")
+    for language, fallback in fallbacks.items():
+        seen = {language}
+        while fallback in fallbacks and fallback not in seen:
+            seen.add(fallback)
+            fallback = fallbacks[fallback]
+        if fallback not in responses or fallback in seen:
+            problems.append(f"{language}: fallback chain does not end in a complete language")
+    return problems
+
+
+def compile_table(language: str, responses: Dict[str, dict] = RESPONSES,
+                  fallbacks: Dict[str, str] = FALLBACKS) -> Dict[str, str]:
+    """One language's messages with fallbacks resolved and composed messages joined."""
+    chain = [language]
+    while chain[-1] in fallbacks:
+        chain.append(fallbacks[chain[-1]])
+    table = {}
+    for source in reversed(chain):
+        table.update(responses.get(source, {}))
+    for key, parts in COMPOSED.items():
+        table[key] = "\n\n".join(table[part] for part in parts)
+    return {sys.intern(key): sys.intern(text) for key, text in table.items()}
+
+
+class Catalog:
+    def __init__(self, responses: Dict[str, dict] = RESPONSES, languages: Dict[str, str] = LANGUAGES,
+                 fallbacks: Dict[str, str] = FALLBACKS, default: str = DEFAULT_LANGUAGE):
+        problems = check_catalog(responses, languages, fallbacks, default)
+        if problems:
+            raise ValueError("Invalid message catalog:\n  " + "\n  ".join(problems))
+        self.languages = dict(languages)
+        self.tables = {language: compile_table(language, responses, fallbacks) for language in languages}
+        self.default = self.tables[default]
+        # Messages each partial language still shows in its fallback language
+        self.untranslated = {
+            language: sorted(KEYS - set(COMPOSED) - set(responses[language])) for language in fallbacks
+        }
+
+    def messages(self, language: Optional[str]) -> Dict[str, str]:
+        """The compiled table for a language code; unknown codes get the default language."""
+        return self.tables.get(language, self.default)
+
+
+CATALOG = Catalog()
+messages = CATALOG.messages
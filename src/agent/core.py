@@ -1,392 +1,492 @@
-import random
-import string
-from datetime import datetime
+import asyncio
+import time
 from pathlib import Path
 
 from src.agent.state import STATES
-from src.agent.prompts import RESPONSES
-from src.agent.nlu import parse_user_message
-from src.utils.file_store import save_uploads
-from src.utils.pdf_generator import generate_birth_certificate_pdf, ensure_generated_dir
+from src.agent.catalog import messages
+from src.agent.effects import BLOCKING, NLU
+from src.agent.prompts import MSG
+from src.agent.nlu import parse_user_message, aparse_user_message, astream_user_message
+from src.agent.fastpath import NAME_FIELDS, fast_parse, looks_like_name, stats as fastpath_stats
+from src.agent.flows import FLOWS, FlowEngine
+from src.agent.journal import Journal
+from src.agent.references import get_reference_service
+from src.agent.sessions import SessionStore, create_session_store
+from src.agent.slots import get_slot_inventory
+from src.agent.trace import TraceWriter, create_trace_writer
+from src.config.settings import (
+    SESSION_BACKEND,
+    SESSION_MAX,
+    SESSION_IDLE_TTL,
+    SESSION_DB_PATH,
+    PDF_BACKGROUND,
+    JOURNAL_ENABLED,
+    METRICS_LOG_PATH,
+)
+from src.utils.analytics import AnalyticsExporter, get_analytics
+from src.utils.file_store import save_uploads, seal_uploads
+from src.utils.upload_checks import UploadRejected
+from src.utils.render_queue import RenderQueueFull, get_render_queue
+from src.utils.metrics import (
+    REGISTRY,
+    SERVICE_EVENTS,
+    STAGE_SECONDS,
+    TRANSITIONS,
+    TURNS,
+    TurnLog,
+    begin_turn,
+    end_turn,
+    stage,
+    timed,
+    turn_counts,
+    turn_stages,
+)
+
+
+turn_log = TurnLog(METRICS_LOG_PATH)
 
 
 class KebeleAgent:
-    def __init__(self):
-        self.sessions = {}  # user_id -> session dict
-
-    def _gen_ref(self):
-        return "".join(random.choices(string.ascii_uppercase + string.digits, k=8))
-
-    def _validate_date(self, s: str) -> bool:
-        try:
-            d, m, y = s.strip().split("/")
-            dt = datetime(int(y), int(m), int(d))
-            return dt.year == int(y) and dt.month == int(m) and dt.day == int(d)
-        except Exception:
-            return False
-
-    def start(self, user_id: str, language: str = "am"):
-        self.sessions[user_id] = {
+    def __init__(self, sessions: SessionStore = None, journal: Journal = None, analytics: AnalyticsExporter = None,
+                 tracer: TraceWriter = None):
+        # user_id -> session dict
+        self.sessions = sessions or create_session_store(
+            SESSION_BACKEND, SESSION_MAX, SESSION_IDLE_TTL, SESSION_DB_PATH
+        )
+        # Sessions and completed requests survive a restart through the journal
+        self.journal = journal or (Journal() if JOURNAL_ENABLED else None)
+        self.references = get_reference_service()
+        # Completed requests and state changes for reports; None unless ANALYTICS_ENABLED
+        self.analytics = analytics or get_analytics()
+        # Turn-by-turn trace for offline replay; None unless TRACE_PATH is set
+        self.tracer = tracer or create_trace_writer()
+        if self.journal is not None:
+            self._restore()
+            if not self.sessions.persistent:
+                self.sessions.on_delete = self.journal.delete
+        # Flows are checked here, so a broken definition fails at startup
+        self.flows = FlowEngine(FLOWS, {
+            "birth_payment": self._birth_payment,
+            "id_payment": self._id_payment,
+            "complete_birth_certificate": self._complete_birth_certificate,
+            "complete_id_appointment": self._complete_id_appointment,
+        })
+
+    def _new_session(self, language: str) -> dict:
+        return {
             "state": STATES.GREETING,
             "language": language,
             "service": None,  # birth_certificate | id_appointment
             "data": {},
         }
-        return {"response": RESPONSES[language]["greeting"], "nextAction": "button_choice", "options": ["A", "B"]}
 
+    def _restore(self):
+        """
+        Index completed requests from the journal and, unless the session store
+        persists on its own, reload sessions (oldest first so the LRU keeps the newest).
+
+        Only records journaled since the previous startup's replay are indexed
+        again (earlier ones are already in references.db), so startup does not
+        slow down as the journal accumulates requests.
+        """
+        mark = f"journal:{self.journal.dir.resolve()}"
+        state = self.journal.replay(records_since=self.references.mark(mark))
+        records = [entry for entry in state.records.values() if entry.get("ref")]
+        self.references.index_many((entry["ref"], entry) for entry in records)
+        if records:
+            self.references.set_mark(mark, max(entry["t"] for entry in records))
+        if not self.sessions.persistent:
+            for user_id, (_, session) in sorted(state.sessions.items(), key=lambda item: item[1][0]):
+                self.sessions.save(user_id, session)
+
+    def close(self):
+        """Finish background work before the process exits: queued certificates, journal, exports."""
+        if PDF_BACKGROUND:
+            get_render_queue().shutdown(wait=True)
+        if self.journal is not None:
+            self.journal.close()
+        if self.analytics is not None:
+            self.analytics.close()
+        if self.tracer is not None:
+            self.tracer.close()
+
+    def _save_session(self, user_id: str, s: dict):
+        self.sessions.save(user_id, s)
+        if self.journal is not None and not self.sessions.persistent:
+            self.journal.session(user_id, s)
+
+    def _record(self, kind: str, data: dict):
+        """Durably journal a completed request (blocks until it is on disk) and index it by reference."""
+        if self.journal is not None:
+            self.journal.record(kind, data)
+        self.references.file_requests(kind, [data])
+
+    def find_request(self, reference: str) -> dict:
+        """A completed request by reference number (case and O/0, I/1 mix-ups tolerated), or None."""
+        return self.references.lookup(reference)
+
+    def _reference(self, data: dict, kind: str) -> str:
+        """The request's reference number, issued the first time it is needed."""
+        if not data.get("reference_number"):
+            data["reference_number"] = self.references.issue(kind)
+        return data["reference_number"]
+
+    def start(self, user_id: str, language: str = "am"):
+        self._save_session(user_id, self._new_session(language))
+        if self.tracer is not None:
+            self.tracer.start(user_id, language)
+        return {"response": messages(language)[MSG.GREETING], "nextAction": "button_choice", "options": ["A", "B"]}
+
+    @timed("apply_fields")
     def _apply_fields(self, data: dict, fields: dict, state: str):
         """Apply extracted fields to session data, only if they're relevant."""
-        # Normalize and apply fields
-        for field_name, value in fields.items():
-            if not value:  # Skip empty values
-                continue
-                
-            # Normalize sex field
-            if field_name == "sex":
-                sex_lower = str(value).lower()
-                if sex_lower in ["male", "boy", "m", "ወንድ"]:
-                    data["sex"] = "Male"
-                elif sex_lower in ["female", "girl", "f", "ሴት"]:
-                    data["sex"] = "Female"
+        self.flows.apply_fields(data, fields, state)
+
+    def process(self, user_id: str, message: str, language: str = "am", files: list = None, parse=None):
+        """
+        Handle one chat turn, blocking the calling thread for NLU and file work.
+
+        Args:
+            parse: Stands in for the LLM, (message, state, language) -> UserCommand;
+                replays use it to supply recorded commands
+        """
+        token = begin_turn()
+        turn = self._turn(user_id, message, language, files)
+        try:
+            kind, args = next(turn)
+            while True:
+                if kind == NLU:
+                    with stage("nlu"):
+                        value = (parse or parse_user_message)(*args)
                 else:
-                    data["sex"] = value  # Keep as-is if unclear
-            
-            # Normalize date format
-            elif field_name == "date_of_birth" or field_name == "dob":
-                dob_str = str(value).strip()
-                # Try to normalize to DD/MM/YYYY
-                data["date_of_birth"] = dob_str
-            
-            # Apply other fields directly
-            elif field_name in ["child_name", "father_name", "mother_name", "age", "has_previous_id", "appointment_slot", "print_option"]:
-                data[field_name] = value
+                    func, func_args = args
+                    with stage(func.__name__.lstrip("_")):
+                        value = func(*func_args)
+                kind, args = turn.send(value)
+        except StopIteration as stop:
+            return stop.value
+        finally:
+            end_turn(token)
+
+    async def process_async(self, user_id: str, message: str, language: str = "am", files: list = None):
+        """Handle one chat turn without blocking the event loop."""
+        token = begin_turn()
+        turn = self._turn(user_id, message, language, files)
+        try:
+            kind, args = next(turn)
+            while True:
+                if kind == NLU:
+                    with stage("nlu"):
+                        value = await aparse_user_message(*args)
+                else:
+                    func, func_args = args
+                    with stage(func.__name__.lstrip("_")):
+                        value = await asyncio.to_thread(func, *func_args)
+                kind, args = turn.send(value)
+        except StopIteration as stop:
+            return stop.value
+        finally:
+            end_turn(token)
+
+    async def process_stream(self, user_id: str, message: str, language: str = "am", files: list = None):
+        """
+        Handle one chat turn, yielding events as soon as they are available.
+
+        Events:
+            {"event": "ack", "response": str}        before a slow LLM parse starts
+            {"event": "partial", "fields": dict}     fields seen so far in the streamed parse
+            {"event": "result", "result": dict}      the turn's response (always last)
+        """
+        token = begin_turn()
+        turn = self._turn(user_id, message, language, files)
+        try:
+            kind, args = next(turn)
+            while True:
+                if kind == NLU:
+                    yield {"event": "ack", "response": messages(language)[MSG.ACK]}
+                    value = None
+                    with stage("nlu"):
+                        async for item in astream_user_message(*args):
+                            if isinstance(item, dict):
+                                if item.get("fields"):
+                                    yield {"event": "partial", "fields": item["fields"]}
+                            else:
+                                value = item
+                else:
+                    func, func_args = args
+                    with stage(func.__name__.lstrip("_")):
+                        value = await asyncio.to_thread(func, *func_args)
+                kind, args = turn.send(value)
+        except StopIteration as stop:
+            yield {"event": "result", "result": stop.value}
+        finally:
+            end_turn(token)
+
+    def _pdf_path(self, ref: str) -> Path:
+        Path("data/generated").mkdir(parents=True, exist_ok=True)
+        return Path("data/generated") / f"{ref.replace('/', '_')}.pdf"
+
+    def _render_pdf(self, data: dict, ref: str):
+        """Render the certificate PDF; returns its path or None on failure."""
+        # ReportLab is loaded on first use (or by warm_up), not at import
+        from src.utils.pdf_generator import generate_birth_certificate_pdf
 
-    def _auto_advance_birth_certificate(self, s: dict, data: dict, lang: dict):
-        """Auto-advance through birth certificate states if fields are complete."""
-        state = s["state"]
-        
-        # Check if we can advance from current state
-        if state == STATES.BIRTH_CHILD_NAME:
-            if data.get("child_name"):
-                if not data.get("date_of_birth"):
-                    s["state"] = STATES.BIRTH_DOB
-                    return {"response": lang["birth_dob"], "nextAction": "input_field", "fieldType": "text"}
-        
-        if state == STATES.BIRTH_DOB:
-            if data.get("date_of_birth"):
-                if not self._validate_date(data["date_of_birth"]):
-                    return {"response": "Invalid date format. Use DD/MM/YYYY (e.g., 15/03/2020).", "nextAction": "retry"}
-                if not data.get("sex"):
-                    s["state"] = STATES.BIRTH_SEX
-                    return {"response": lang["birth_sex"], "nextAction": "button_choice", "options": ["A", "B"]}
-        
-        if state == STATES.BIRTH_SEX:
-            if data.get("sex"):
-                if not data.get("father_name"):
-                    s["state"] = STATES.BIRTH_FATHER_NAME
-                    return {"response": lang["birth_father_name"], "nextAction": "input_field", "fieldType": "text"}
-        
-        if state == STATES.BIRTH_FATHER_NAME:
-            if data.get("father_name"):
-                if not data.get("mother_name"):
-                    s["state"] = STATES.BIRTH_MOTHER_NAME
-                    return {"response": lang["birth_mother_name"], "nextAction": "input_field", "fieldType": "text"}
-        
-        if state == STATES.BIRTH_MOTHER_NAME:
-            if data.get("mother_name"):
-                s["state"] = STATES.BIRTH_DOCUMENTS
-                return {"response": lang["birth_documents"], "nextAction": "file_upload", "fieldType": "file"}
-        
-        return None
-
-    def _auto_advance_id_appointment(self, s: dict, data: dict, lang: dict):
-        """Auto-advance through ID appointment states if fields are complete."""
-        state = s["state"]
-        
-        if state == STATES.ID_AGE and data.get("age"):
-            if isinstance(data["age"], str):
-                try:
-                    data["age"] = int(data["age"])
-                except:
-                    return {"response": "Please enter a number (age).", "nextAction": "retry"}
-            if data["age"] < 16:
-                return {"response": "You must be at least 16 years old. Enter your age again.", "nextAction": "retry"}
-            if "has_previous_id" not in data:
-                s["state"] = STATES.ID_HAS_ID
-                return {"response": lang["id_has_id"], "nextAction": "button_choice", "options": ["A", "B"]}
-        
-        if state == STATES.ID_HAS_ID and "has_previous_id" in data:
-            if "appointment_slot" not in data:
-                s["state"] = STATES.ID_SLOT_SELECTION
-                return {"response": lang["id_slot_selection"], "nextAction": "button_choice", "options": ["A", "B", "C", "D"]}
-        
-        return None
-
-    def process(self, user_id: str, message: str, language: str = "am", files: list = None):
-        if user_id not in self.sessions:
+        try:
+            pdf_path = self._pdf_path(ref)
+            generate_birth_certificate_pdf(data, str(pdf_path))
+            return pdf_path
+        except Exception as e:
+            print(f"Warning: PDF generation failed: {e}")
+            return None
+
+    def _save_uploads(self, user_id: str, files: list):
+        """Store uploads; returns (paths, None), or ([], UploadRejected) if a file was rejected."""
+        try:
+            return save_uploads(user_id, files), None
+        except UploadRejected as e:
+            return [], e
+
+    def _queue_pdf(self, data: dict, ref: str):
+        """
+        Hand the certificate to the background render queue.
+
+        Returns (job_id, None) when queued. If the queue is full or background
+        rendering is disabled it renders inline and returns (None, pdf_path).
+        """
+        if PDF_BACKGROUND:
+            try:
+                return get_render_queue().submit(ref, data, str(self._pdf_path(ref))), None
+            except RenderQueueFull:
+                print(f"Warning: PDF queue full, rendering {ref} inline")
+            except Exception as e:
+                print(f"Warning: could not queue PDF for {ref}: {e}")
+        return None, self._render_pdf(data, ref)
+
+    def pdf_status(self, user_id: str) -> dict:
+        """
+        Poll the certificate for a user's completed request.
+
+        Returns {"status": "none" | "queued" | "done" | "failed", "pdf_path": str | None}.
+        """
+        s = self.sessions.get(user_id)
+        data = s["data"] if s else {}
+        job_id = data.get("pdf_job")
+        if not job_id:
+            path = data.get("pdf_path")
+            return {"status": "done" if path else "none", "pdf_path": path}
+        job = get_render_queue().status(job_id)
+        if job is None:
+            # Queued by another worker process, or before a restart: the file is the answer.
+            # Until it appears the job may still be rendering there; the caller's deadline decides.
+            path = self._pdf_path(data["reference_number"]) if data.get("reference_number") else None
+            if path is not None and path.exists():
+                return {"status": "done", "pdf_path": str(path)}
+            return {"status": "queued", "pdf_path": None}
+        return {"status": job["status"], "pdf_path": job["path"] if job["status"] == "done" else None}
+
+    def _turn(self, user_id: str, message: str, language: str, files: list):
+        """
+        Conversation logic for one turn, written as a generator.
+
+        Slow work is yielded as (NLU, args) or (BLOCKING, (func, args)) and the
+        result is sent back in, so process() and process_async() share one
+        implementation. The generator's return value is the response dict.
+        """
+        started = time.perf_counter()
+        s = self.sessions.get(user_id)
+        if s is None:
             return self.start(user_id, language)
-
-        s = self.sessions[user_id]
-        lang = RESPONSES.get(s["language"], RESPONSES["en"])
+        state_before, service_before = s["state"], s["service"]
+        parsed = {}  # filled by _flow: "cmd" and "source"
+        try:
+            return (yield from self._flow(user_id, s, message, language, files, parsed))
+        finally:
+            # Stores may hand out copies, so write the mutated session back
+            self._save_session(user_id, s)
+            elapsed = time.perf_counter() - started
+            self._observe_turn(user_id, s, state_before, service_before, elapsed)
+            if self.tracer is not None:
+                self.tracer.turn(user_id, language, message, files, state_before, s["state"],
+                                 s["service"] or service_before, parsed.get("cmd"), parsed.get("source"),
+                                 elapsed, turn_stages(), s["data"])
+
+    def _observe_turn(self, user_id: str, s: dict, state_before: str, service_before, elapsed: float):
+        """Update per-turn counters and write the optional JSON turn log."""
+        state_after, service = s["state"], s["service"]
+        STAGE_SECONDS.observe(elapsed, stage="turn")
+        TURNS.inc(state=state_before)
+        if state_after != state_before:
+            TRANSITIONS.inc(from_state=state_before, to_state=state_after)
+            completed = state_after in (STATES.BIRTH_COMPLETE, STATES.ID_COMPLETE)
+            if completed:
+                SERVICE_EVENTS.inc(service=service, event="completed")
+            if self.analytics is not None:
+                self.analytics.transition(user_id, service or service_before, state_before, state_after, s["language"])
+                if completed:
+                    self.analytics.application(service, s["data"], s["language"])
+        if service and service != service_before:
+            SERVICE_EVENTS.inc(service=service, event="selected")
+        turn_log.write({
+            "ts": round(time.time(), 3),
+            "user": user_id,
+            "service": service,
+            "state_before": state_before,
+            "state_after": state_after,
+            "ms": round(elapsed * 1000, 2),
+            "stages_ms": {k: round(v * 1000, 2) for k, v in turn_stages().items()},
+            **turn_counts(),
+        })
+
+    def _flow(self, user_id: str, s: dict, message: str, language: str, files: list, parsed: dict):
         msg = (message or "").strip()
 
         # allow language switching mid-chat
         s["language"] = language
-        lang = RESPONSES.get(language, RESPONSES["en"])
+        lang = messages(language)
 
         state = s["state"]
-        service = s["service"]
         data = s["data"]
+        step = self.flows.step(state)
 
         # Handle file uploads deterministically (bypass NLU for files)
-        if files and state == STATES.BIRTH_DOCUMENTS:
-            if len(files) == 0:
-                return {"response": "Please upload at least 1 document (images or PDF) before continuing.", "nextAction": "file_upload", "fieldType": "file"}
+        if files and step is not None and step.files:
             if len(files) > 3:
-                return {"response": "Please upload maximum 3 documents.", "nextAction": "file_upload", "fieldType": "file"}
+                return {"response": lang[MSG.TOO_MANY_FILES], "nextAction": "file_upload", "fieldType": "file"}
             
-            saved_paths = save_uploads(user_id, files)
+            saved_paths, problem = yield (BLOCKING, (self._save_uploads, (user_id, files)))
+            if problem:
+                return {"response": problem.message(language), "nextAction": "file_upload", "fieldType": "file"}
             if not saved_paths:
-                return {"response": "Error saving files. Please try uploading again.", "nextAction": "file_upload", "fieldType": "file"}
+                return {"response": lang[MSG.UPLOAD_FAILED], "nextAction": "file_upload", "fieldType": "file"}
             
-            data["uploaded_files"] = saved_paths
+            data[step.field] = saved_paths
             data["documents_note"] = msg if msg else f"Documents uploaded ({len(saved_paths)} file(s))"
-            s["state"] = STATES.BIRTH_PAYMENT
-            return {"response": lang["birth_payment_amount"], "nextAction": "button_choice", "options": ["A", "B"]}
-
-        # Parse user message with NLU (unless it's a simple A/B/C/D choice)
-        if msg.upper() in ["A", "B", "C", "D", "DONE"]:
-            # Simple choice, handle directly
-            cmd = type('obj', (object,), {
-                'intent': 'choose_option',
-                'choice': msg.upper(),
-                'fields': {},
-                'service': None,
-                'language': None
-            })()
-        else:
-            cmd = parse_user_message(msg, state, language)
+            return (yield from self.flows.advance(s, lang))
+
+        # Parse user message: deterministic fast path first, LLM only when unsure
+        with stage("fastpath"):
+            cmd = fast_parse(msg, state, language)
+        parsed["source"] = "fastpath"
+        if cmd is None:
+            cmd = yield (NLU, (msg, state, language))
+            parsed["source"] = "nlu"
+        parsed["cmd"] = cmd
 
         # Handle reset intent
         if cmd.intent == "reset":
-            return self.start(user_id, language)
-
-        # Handle service selection
-        if cmd.intent == "choose_service" and cmd.service:
-            s["service"] = cmd.service
-            if cmd.service == "birth_certificate":
-                s["state"] = STATES.BIRTH_CHILD_NAME
-            else:
-                s["state"] = STATES.ID_AGE
-            # Apply any fields that were provided with service selection
-            self._apply_fields(data, cmd.fields, s["state"])
-            # Try auto-advance
-            if cmd.service == "birth_certificate":
-                auto_result = self._auto_advance_birth_certificate(s, data, lang)
-                if auto_result:
-                    return auto_result
-                return {"response": lang["birth_child_name"], "nextAction": "input_field", "fieldType": "text"}
-            else:
-                auto_result = self._auto_advance_id_appointment(s, data, lang)
-                if auto_result:
-                    return auto_result
-                return {"response": lang["id_age"], "nextAction": "input_field", "fieldType": "number"}
-
-        # Apply extracted fields to current state
+            # Reset in place; _turn saves the session when the turn ends
+            s.clear()
+            s.update(self._new_session(language))
+            return {"response": lang[MSG.GREETING], "nextAction": "button_choice", "options": ["A", "B"]}
+
+        # Handle service selection, skipping any steps answered in the same message
+        if cmd.intent == "choose_service" and cmd.service in self.flows.flows:
+            self._apply_fields(data, cmd.fields, self.flows.flows[cmd.service].first)
+            return (yield from self.flows.start(s, cmd.service, lang))
+
+        # Apply extracted fields, then let the current step take the reply.
+        # A reply that was understood as fields is not also a raw answer.
         if cmd.fields:
             self._apply_fields(data, cmd.fields, state)
-
-        # Handle choices
+            msg = ""
+        elif state in NAME_FIELDS and not looks_like_name(msg):
+            # "I want ID" or "go back" is not a name; ask again rather than store it
+            msg = ""
         if cmd.choice:
             msg = cmd.choice
-
-        # ---- Birth certificate flow
-        if service == "birth_certificate":
-            # Try auto-advance first
-            auto_result = self._auto_advance_birth_certificate(s, data, lang)
-            if auto_result:
-                return auto_result
-            
-            if state == STATES.BIRTH_CHILD_NAME:
-                # Use extracted field or message
-                child_name = data.get("child_name") or (msg if msg and not cmd.choice else None)
-                if not child_name:
-                    return {"response": lang["birth_child_name"], "nextAction": "input_field", "fieldType": "text"}
-                data["child_name"] = child_name
-                s["state"] = STATES.BIRTH_DOB
-                return {"response": lang["birth_dob"], "nextAction": "input_field", "fieldType": "text"}
-
-            if state == STATES.BIRTH_DOB:
-                dob = data.get("date_of_birth") or (msg if msg and not cmd.choice else None)
-                if not dob:
-                    return {"response": lang["birth_dob"], "nextAction": "input_field", "fieldType": "text"}
-                if not self._validate_date(dob):
-                    return {"response": "Invalid date format. Use DD/MM/YYYY (e.g., 15/03/2020).", "nextAction": "retry"}
-                data["date_of_birth"] = dob
-                s["state"] = STATES.BIRTH_SEX
-                return {"response": lang["birth_sex"], "nextAction": "button_choice", "options": ["A", "B"]}
-
-            if state == STATES.BIRTH_SEX:
-                sex = data.get("sex")
-                if not sex:
-                    if cmd.choice and cmd.choice in ["A", "B"]:
-                        sex = "Male" if cmd.choice == "A" else "Female"
-                    elif msg.upper() == "A":
-                        sex = "Male"
-                    elif msg.upper() == "B":
-                        sex = "Female"
-                    else:
-                        return {"response": lang["birth_sex"], "nextAction": "button_choice", "options": ["A", "B"]}
-                data["sex"] = sex
-                s["state"] = STATES.BIRTH_FATHER_NAME
-                return {"response": lang["birth_father_name"], "nextAction": "input_field", "fieldType": "text"}
-
-            if state == STATES.BIRTH_FATHER_NAME:
-                father_name = data.get("father_name") or (msg if msg and not cmd.choice else None)
-                if not father_name:
-                    return {"response": lang["birth_father_name"], "nextAction": "input_field", "fieldType": "text"}
-                data["father_name"] = father_name
-                s["state"] = STATES.BIRTH_MOTHER_NAME
-                return {"response": lang["birth_mother_name"], "nextAction": "input_field", "fieldType": "text"}
-
-            if state == STATES.BIRTH_MOTHER_NAME:
-                mother_name = data.get("mother_name") or (msg if msg and not cmd.choice else None)
-                if not mother_name:
-                    return {"response": lang["birth_mother_name"], "nextAction": "input_field", "fieldType": "text"}
-                data["mother_name"] = mother_name
-                s["state"] = STATES.BIRTH_DOCUMENTS
-                return {"response": lang["birth_documents"], "nextAction": "file_upload", "fieldType": "file"}
-
-            if state == STATES.BIRTH_PAYMENT:
-                payment_choice = cmd.choice or msg.upper() if msg else None
-                if payment_choice == "A":
-                    ref = f"BIRTH/{datetime.now().year}/{self._gen_ref()}"
-                    data["reference_number"] = ref
-                    s["state"] = STATES.BIRTH_PRINT_OPTION
-                    return {
-                        "response": f"Dial *144#\nAmount: 100 ETB\nReference: {ref}\n\nReply 'DONE' after payment (or just continue for demo).",
-                        "nextAction": "input_field",
-                        "fieldType": "text",
-                    }
-                s["state"] = STATES.BIRTH_PRINT_OPTION
-                return {"response": lang["birth_print_option"], "nextAction": "button_choice", "options": ["A", "B", "C"]}
-
-            if state == STATES.BIRTH_PRINT_OPTION:
-                print_choice = cmd.choice or msg.upper() if msg else None
-                if not print_choice or print_choice not in ["A", "B", "C"]:
-                    return {"response": lang["birth_print_option"], "nextAction": "button_choice", "options": ["A", "B", "C"]}
-                
-                ref = data.get("reference_number") or f"BIRTH/{datetime.now().year}/{self._gen_ref()}"
-                data["reference_number"] = ref
-                data["print_option"] = print_choice
-                
-                # Generate PDF
-                pdf_path = None
-                try:
-                    ensure_generated_dir()
-                    pdf_filename = f"{ref.replace('/', '_')}.pdf"
-                    pdf_path = Path("data/generated") / pdf_filename
-                    generate_birth_certificate_pdf(data, str(pdf_path))
-                    data["pdf_path"] = str(pdf_path)
-                except Exception as e:
-                    print(f"Warning: PDF generation failed: {e}")
-                    data["pdf_path"] = None
-                
-                s["state"] = STATES.BIRTH_COMPLETE
-                response_msg = f"✅ Birth Certificate Request Complete!\n\nReference: {ref}\n\nProcessing time: ~15 minutes (demo)\nThank you!"
-                if pdf_path:
-                    response_msg += f"\n\n📄 Your PDF is ready for download below."
-                
-                return {
-                    "response": response_msg,
-                    "nextAction": "complete",
-                    "data": data,
-                    "pdf_path": str(pdf_path) if pdf_path else None,
-                }
-
-        # ---- ID appointment flow
-        if service == "id_appointment":
-            # Try auto-advance first
-            auto_result = self._auto_advance_id_appointment(s, data, lang)
-            if auto_result:
-                return auto_result
-            
-            if state == STATES.ID_AGE:
-                age = data.get("age")
-                if not age:
-                    age_str = msg if msg and not cmd.choice else None
-                    if not age_str:
-                        return {"response": lang["id_age"], "nextAction": "input_field", "fieldType": "number"}
-                    try:
-                        age = int(age_str)
-                    except Exception:
-                        return {"response": "Please enter a number (age).", "nextAction": "retry"}
-                if age < 16:
-                    return {"response": "You must be at least 16 years old. Enter your age again.", "nextAction": "retry"}
-                data["age"] = age
-                s["state"] = STATES.ID_HAS_ID
-                return {"response": lang["id_has_id"], "nextAction": "button_choice", "options": ["A", "B"]}
-
-            if state == STATES.ID_HAS_ID:
-                has_id = data.get("has_previous_id")
-                if has_id is None:
-                    if cmd.choice:
-                        has_id = (cmd.choice == "A")
-                    elif msg.upper() == "A":
-                        has_id = True
-                    elif msg.upper() == "B":
-                        has_id = False
-                    else:
-                        return {"response": lang["id_has_id"], "nextAction": "button_choice", "options": ["A", "B"]}
-                data["has_previous_id"] = has_id
-                s["state"] = STATES.ID_SLOT_SELECTION
-                return {"response": lang["id_slot_selection"], "nextAction": "button_choice", "options": ["A", "B", "C", "D"]}
-
-            if state == STATES.ID_SLOT_SELECTION:
-                slot_choice = cmd.choice or msg.upper() if msg else None
-                slot_map = {
-                    "A": ("2025-12-27", "09:00"),
-                    "B": ("2025-12-27", "10:00"),
-                    "C": ("2025-12-28", "09:00"),
-                    "D": ("2025-12-28", "10:00"),
-                }
-                if not slot_choice or slot_choice not in slot_map:
-                    return {"response": lang["id_slot_selection"], "nextAction": "button_choice", "options": ["A", "B", "C", "D"]}
-                data["appointment_date"], data["appointment_time"] = slot_map[slot_choice]
-                s["state"] = STATES.ID_DOCUMENTS
-                return {"response": lang["id_documents"], "nextAction": "input_field", "fieldType": "text"}
-
-            if state == STATES.ID_DOCUMENTS:
-                data["documents_note"] = msg if msg else "Documents noted"
-                s["state"] = STATES.ID_PAYMENT
-                return {"response": lang["id_payment_amount"], "nextAction": "button_choice", "options": ["A", "B"]}
-
-            if state == STATES.ID_PAYMENT:
-                ref = f"ID/{datetime.now().year}/{self._gen_ref()}"
-                data["reference_number"] = ref
-                s["state"] = STATES.ID_COMPLETE
-                return {
-                    "response": f"✅ Appointment booked!\n\nReference: {ref}\nDate: {data['appointment_date']}\nTime: {data['appointment_time']}\nLocation: Kebele Office (demo)\n",
-                    "nextAction": "complete",
-                    "data": data,
-                }
+        result = yield from self.flows.handle(s, msg, cmd.choice, lang)
+        if result is not None:
+            return result
 
         # If we get here and intent is unknown, provide helpful context
         if cmd.intent == "unknown":
             if state == STATES.GREETING:
-                return {"response": lang["greeting"], "nextAction": "button_choice", "options": ["A", "B"]}
-            # Provide context-aware response
-            context_responses = {
-                STATES.BIRTH_CHILD_NAME: lang["birth_child_name"],
-                STATES.BIRTH_DOB: lang["birth_dob"],
-                STATES.BIRTH_SEX: lang["birth_sex"],
-                STATES.BIRTH_FATHER_NAME: lang["birth_father_name"],
-                STATES.BIRTH_MOTHER_NAME: lang["birth_mother_name"],
-                STATES.ID_AGE: lang["id_age"],
-            }
-            return {"response": context_responses.get(state, "Please provide the requested information."), "nextAction": "retry"}
+                return {"response": lang[MSG.GREETING], "nextAction": "button_choice", "options": ["A", "B"]}
+            return {"response": lang[MSG.NEED_INFORMATION], "nextAction": "retry"}
+
+        return {"response": lang[MSG.NOT_UNDERSTOOD], "nextAction": "retry"}
+
+    # ---- Flow actions (see src/agent/flows.py)
+
+    def _birth_payment(self, s: dict, step, msg: str, lang: dict):
+        """Telebirr (A) gets a reference and dialing instructions; anything else pays later."""
+        s["state"] = step.next
+        if msg.upper() != "A":
+            return (yield from self.flows.prompt(step.next, lang))
+        ref = self._reference(s["data"], "BIRTH")
+        return {
+            "response": lang[MSG.TELEBIRR_INSTRUCTIONS].format(ref=ref),
+            "nextAction": "input_field",
+            "fieldType": "text",
+        }
 
-        return {"response": "Sorry, I didn't understand. Please try again.", "nextAction": "retry"}
+    def _id_payment(self, s: dict, step, msg: str, lang: dict):
+        s["state"] = step.next
+        return (yield from self.flows.advance(s, lang))
+
+    def _complete_birth_certificate(self, s: dict, step, lang: dict):
+        data = s["data"]
+        ref = self._reference(data, "BIRTH")
+        yield (BLOCKING, (seal_uploads, (ref, data.get("uploaded_files"))))
+
+        # Generate PDF in the background; the UI polls pdf_status()
+        pdf_job, pdf_path = yield (BLOCKING, (self._queue_pdf, (data, ref)))
+        data["pdf_job"] = pdf_job
+        data["pdf_path"] = str(pdf_path) if pdf_path else None
+        yield (BLOCKING, (self._record, (s["service"], data)))
+
+        if pdf_path:
+            template = lang[MSG.BIRTH_COMPLETE_PDF_READY]
+        elif pdf_job:
+            template = lang[MSG.BIRTH_COMPLETE_PDF_QUEUED]
+        else:
+            template = lang[MSG.BIRTH_COMPLETE]
+
+        return {
+            "response": template.format(ref=ref),
+            "nextAction": "complete",
+            "data": data,
+            "pdf_path": str(pdf_path) if pdf_path else None,
+            "pdf_job": pdf_job,
+        }
+
+    def _complete_id_appointment(self, s: dict, step, lang: dict):
+        data = s["data"]
+        confirmed = yield (BLOCKING, (get_slot_inventory().confirm, (data.get("appointment_reservation"),)))
+        if not confirmed:
+            # The hold ran out before the booking was finished; the place may be gone
+            for key in ("appointment_slot", "appointment_reservation", "appointment_date", "appointment_time"):
+                data.pop(key, None)
+            s["state"] = STATES.ID_SLOT_SELECTION
+            response = yield from self.flows.prompt(s["state"], lang, data)
+            response["response"] = f"{lang[MSG.SLOT_RELEASED]}\n\n{response['response']}"
+            return response
+        ref = self._reference(data, "ID")
+        yield (BLOCKING, (self._record, (s["service"], data)))
+        return {
+            "response": lang[MSG.ID_COMPLETE].format(ref=ref, date=data["appointment_date"],
+                                                     time=data["appointment_time"]),
+            "nextAction": "complete",
+            "data": data,
+        }
 
 
 agent = KebeleAgent()
+
+_session_stats = {"at": 0.0, "stats": {}}
+
+
+def _session_stat(key: str) -> float:
+    """One stats() per scrape (it walks every session): the session gauges share a result for a second."""
+    now = time.monotonic()
+    if now - _session_stats["at"] > 1:
+        _session_stats.update(at=now, stats=agent.sessions.stats())
+    return _session_stats["stats"][key]
+
+
+REGISTRY.gauge("kebele_sessions", "Live conversation sessions.", lambda: _session_stat("sessions"))
+REGISTRY.gauge("kebele_session_bytes", "Approximate memory used by session data.",
+               lambda: _session_stat("bytes_total"))
+REGISTRY.gauge("kebele_fastpath_hit_ratio", "Share of turns answered without the LLM.", fastpath_stats.hit_rate)
+REGISTRY.gauge("kebele_pdf_jobs", "Background PDF jobs by status.",
+               lambda: {(("status", k),): v for k, v in get_render_queue().stats().items()})
@@ -0,0 +1,285 @@
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import Future
+from typing import AsyncIterator, Callable, List, Optional, Union
+
+from src.config.settings import (
+    NLU_BATCH_WINDOW_MS,
+    NLU_MAX_IN_FLIGHT,
+    NLU_RPM,
+    NLU_TPM,
+    NLU_SHORT_MESSAGE,
+    NLU_MAX_QUEUE_AGE,
+)
+from src.utils.metrics import REGISTRY, count
+
+
+NLU_QUEUE_SECONDS = REGISTRY.histogram("kebele_nlu_queue_seconds", "Time NLU requests wait before dispatch.")
+NLU_COALESCED = REGISTRY.counter("kebele_nlu_coalesced_total", "NLU requests answered by an identical in-flight call.")
+
+# Rough token cost of one call before it is made (prompt + tool schema + reply)
+CALL_OVERHEAD_TOKENS = 350
+
+
+class RateLimiter:
+    """
+    Token buckets for requests and tokens per minute; 0 disables a limit.
+
+    acquire() waits until both buckets can pay for the call. Buckets start
+    full, so a burst up to one minute's budget goes straight through.
+    """
+
+    def __init__(self, rpm: int = NLU_RPM, tpm: int = NLU_TPM):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed, self._updated = now - self._updated, now
+        if self.rpm:
+            self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    def delay(self, tokens: int) -> float:
+        """Seconds until a call of ``tokens`` fits; 0 means it fits now."""
+        self._refill()
+        wait = 0.0
+        if self.rpm and self._requests < 1:
+            wait = max(wait, (1 - self._requests) * 60 / self.rpm)
+        if self.tpm:
+            tokens = min(tokens, self.tpm)  # a call bigger than the budget waits for a full bucket
+            if self._tokens < tokens:
+                wait = max(wait, (tokens - self._tokens) * 60 / self.tpm)
+        return wait
+
+    def take(self, tokens: int):
+        if self.rpm:
+            self._requests -= 1
+        if self.tpm:
+            self._tokens -= min(tokens, self.tpm)
+
+    async def acquire(self, tokens: int):
+        while True:
+            wait = self.delay(tokens)
+            if wait <= 0:
+                self.take(tokens)
+                return
+            await asyncio.sleep(wait)
+
+
+class _Job:
+    """One upstream call, shared by every caller asking the same thing."""
+
+    def __init__(self, key: tuple, seq: int):
+        self.key = key
+        self.seq = seq
+        self.message, self.state, self.language = key
+        self.stream = False
+        self.enqueued = time.perf_counter()
+        self.started: Optional[float] = None
+        self.future: Future = Future()
+        self.listeners: List[Callable[[dict], None]] = []
+        self.tokens = CALL_OVERHEAD_TOKENS + len(self.message) // 4
+        # The first caller's context, so LLM stage time and tokens land in its turn log
+        self.context = contextvars.copy_context()
+
+    @property
+    def queue_seconds(self) -> float:
+        return (self.started or time.perf_counter()) - self.enqueued
+
+
+class NLUDispatcher:
+    """
+    Shared front door for LLM parses, wrapping a ProviderRouter.
+
+    Requests from every chat (sync threads and async handlers alike) go into
+    one queue served by a background event loop:
+
+    - identical requests (same message, state and language) that are queued
+      or in flight share one upstream call;
+    - when a request arrives while calls are in flight or others are queued,
+      it waits ``window_ms`` so the burst is gathered and ordered before
+      anything is sent; a request on an idle dispatcher is sent at once;
+    - short messages (button-like answers) go first; others keep arrival
+      order, and anything waiting longer than ``max_queue_age`` seconds is
+      treated as short so it cannot starve;
+    - at most ``max_in_flight`` calls run at once, and each waits for the
+      RPM/TPM budget before it is sent.
+
+    Queue wait is reported separately from model time (kebele_nlu_queue_seconds
+    and the turn log's nlu_queue_ms). Has the router's interface, so
+    UserMessageParser takes either.
+    """
+
+    def __init__(self, router, window_ms: float = NLU_BATCH_WINDOW_MS, max_in_flight: int = NLU_MAX_IN_FLIGHT,
+                 limiter: RateLimiter = None, short_message: int = NLU_SHORT_MESSAGE,
+                 max_queue_age: float = NLU_MAX_QUEUE_AGE):
+        self.router = router
+        self.window = window_ms / 1000
+        self.max_in_flight = max_in_flight
+        self.limiter = limiter or RateLimiter()
+        self.short_message = short_message
+        self.max_queue_age = max_queue_age
+        self._lock = threading.Lock()
+        self._queue: List[_Job] = []
+        self._jobs = {}  # key -> queued or running job
+        self._seq = 0
+        self.in_flight = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._started = threading.Event()
+        self._closed = False
+
+    # ---- Callers (any thread or event loop)
+
+    def parse(self, message: str, state: str, language: str) -> tuple:
+        job = self._submit(message, state, language)
+        result = job.future.result()
+        count("nlu_queue_ms", round(job.queue_seconds * 1000, 2))
+        return result
+
+    async def aparse(self, message: str, state: str, language: str) -> tuple:
+        job = self._submit(message, state, language)
+        result = await asyncio.wrap_future(job.future)
+        count("nlu_queue_ms", round(job.queue_seconds * 1000, 2))
+        return result
+
+    async def astream(self, message: str, state: str, language: str) -> AsyncIterator[Union[dict, tuple]]:
+        """Partial argument dicts while the call streams, then (command, provider)."""
+        loop = asyncio.get_running_loop()
+        items: asyncio.Queue = asyncio.Queue()
+
+        def listener(item: dict):
+            loop.call_soon_threadsafe(items.put_nowait, item)
+
+        job = self._submit(message, state, language, listener)
+        job.future.add_done_callback(lambda _: loop.call_soon_threadsafe(items.put_nowait, None))
+        while True:
+            item = await items.get()
+            if item is None:
+                break
+            yield item
+        count("nlu_queue_ms", round(job.queue_seconds * 1000, 2))
+        yield job.future.result()
+
+    def _submit(self, message: str, state: str, language: str, listener: Callable = None) -> _Job:
+        self._ensure_loop()
+        key = (message, state, language)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None:
+                NLU_COALESCED.inc()
+            else:
+                self._seq += 1
+                job = self._jobs[key] = _Job(key, self._seq)
+                self._queue.append(job)
+            if listener is not None:
+                job.stream = True
+                job.listeners.append(listener)
+        self._loop.call_soon_threadsafe(self._wakeup.set)
+        return job
+
+    # ---- Dispatcher loop (background thread)
+
+    def _ensure_loop(self):
+        if self._loop is not None:
+            return
+        with self._lock:
+            if self._loop is None:
+                thread = threading.Thread(target=self._run_loop, name="nlu-dispatcher", daemon=True)
+                thread.start()
+                self._started.wait()
+
+    def _run_loop(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._wakeup = asyncio.Event()
+        self._loop = loop
+        self._started.set()
+        loop.run_until_complete(self._serve())
+
+    def _next_job(self) -> Optional[_Job]:
+        """Pop the job to send next: short or overdue first, then arrival order."""
+        with self._lock:
+            if not self._queue:
+                return None
+            now = time.perf_counter()
+
+            def rank(job: _Job):
+                urgent = len(job.message) <= self.short_message or now - job.enqueued >= self.max_queue_age
+                return (0 if urgent else 1, job.seq)
+
+            job = min(self._queue, key=rank)
+            self._queue.remove(job)
+            return job
+
+    async def _serve(self):
+        slots = asyncio.Semaphore(self.max_in_flight)
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if self._closed:
+                return
+            with self._lock:
+                busy = self.in_flight > 0 or len(self._queue) > 1
+            if self.window and busy:
+                await asyncio.sleep(self.window)
+            while True:
+                await slots.acquire()
+                job = self._next_job()
+                if job is None:
+                    slots.release()
+                    break
+                await self.limiter.acquire(job.tokens)
+                job.started = time.perf_counter()
+                NLU_QUEUE_SECONDS.observe(job.queue_seconds)
+                self.in_flight += 1
+                asyncio.get_running_loop().create_task(self._execute(job, slots), context=job.context)
+
+    async def _execute(self, job: _Job, slots: asyncio.Semaphore):
+        try:
+            if job.stream:
+                result = None
+                async for item in self.router.astream(job.message, job.state, job.language):
+                    if isinstance(item, dict):
+                        with self._lock:
+                            listeners = list(job.listeners)
+                        for listener in listeners:
+                            listener(item)
+                    else:
+                        result = item
+            else:
+                result = await self.router.aparse(job.message, job.state, job.language)
+        except Exception as e:
+            self._finish(job, slots)
+            job.future.set_exception(e)
+            return
+        self._finish(job, slots)
+        job.future.set_result(result)
+
+    def _finish(self, job: _Job, slots: asyncio.Semaphore):
+        with self._lock:
+            self._jobs.pop(job.key, None)
+        self.in_flight -= 1
+        slots.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"queued": len(self._queue), "in_flight": self.in_flight}
+
+    def health(self) -> dict:
+        return self.router.health()
+
+    def close(self):
+        if self._loop is not None and not self._closed:
+            self._closed = True
+            # The async connections were opened on this loop, so they are closed on it
+            asyncio.run_coroutine_threadsafe(self.router.aclose(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        self.router.close()
@@ -0,0 +1,9 @@
+"""
+Effects yielded by KebeleAgent._turn and the flow engine.
+
+A turn is a generator; the sync and async drivers in src/agent/core.py
+decide how to run what it yields.
+"""
+
+NLU = "nlu"            # args: (message, state, language) -> UserCommand
+BLOCKING = "blocking"  # args: (func, func_args) -> func(*func_args), file/CPU/SQLite work
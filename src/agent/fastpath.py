@@ -0,0 +1,263 @@
+import re
+import threading
+from datetime import datetime
+from typing import Optional
+
+from src.agent.state import STATES
+from src.agent.nlu import UserCommand
+
+
+# Ethiopic (Ge'ez) script blocks used by Amharic
+ETHIOPIC_RE = re.compile(r"[ሀ-፿ᎀ-᎟ⶀ-⷟]")
+
+CHOICES = {"A", "B", "C", "D", "DONE"}
+
+# Button answers to the greeting menu
+GREETING_CHOICES = {"A": "birth_certificate", "B": "id_appointment"}
+
+RESET_WORDS = {"reset", "restart", "start over", "cancel", "እንደገና", "ሰርዝ"}
+
+SERVICE_KEYWORDS = {
+    "birth_certificate": ["birth", "born", "newborn", "baby", "ልደት", "ውልደት", "ልጅ"],
+    "id_appointment": ["id", "identity", "appointment", "መታወቂያ", "ቀጠሮ"],
+}
+
+SEX_WORDS = {
+    "male": "Male", "boy": "Male", "m": "Male", "son": "Male", "ወንድ": "Male",
+    "female": "Female", "girl": "Female", "f": "Female", "daughter": "Female", "ሴት": "Female",
+}
+
+YES_WORDS = {"yes", "y", "yeah", "yep", "i do", "i have", "አዎ", "አዎን", "አለኝ"}
+NO_WORDS = {"no", "n", "nope", "i don't", "i dont", "none", "የለም", "አይ", "የለኝም"}
+
+# Words that look like a name but are really chatter; send these to the LLM.
+NOT_NAMES = {
+    "hi", "hello", "hey", "help", "ok", "okay", "thanks", "thank you", "what", "why",
+    "how", "back", "skip", "later", "yes", "no", "ሰላም", "እሺ", "አመሰግናለሁ",
+}
+
+# Words that do not occur in names: verbs, pronouns and every keyword the rules
+# above know. A reply in a name state that contains one ("I want ID", "my
+# name is ...") is a request or a sentence, so it goes to the LLM.
+NON_NAME_WORDS = {
+    "i", "me", "my", "we", "you", "your", "he", "him", "his", "she", "her", "it", "its", "they", "their",
+    "the", "a", "an", "to", "of", "for", "and", "or", "not", "this", "that", "is", "am", "are", "was",
+    "be", "want", "need", "would", "like", "have", "has", "get", "go", "do", "can", "please", "name",
+    "start", "change", "new", "again", "instead", "menu", "service", "certificate", "register", "book",
+    "እፈልጋለሁ", "ስሜ", "ስሙ", "ስሟ",
+} | {
+    word
+    for phrases in (NOT_NAMES, RESET_WORDS, YES_WORDS, NO_WORDS, *SERVICE_KEYWORDS.values())
+    for phrase in phrases
+    for word in phrase.split()
+} | {word for word in SEX_WORDS if len(word) > 1}
+
+NAME_RE = re.compile(r"^[A-Za-zሀ-፿][A-Za-zሀ-፿'.\-]*(?:\s+[A-Za-zሀ-፿][A-Za-zሀ-፿'.\-]*){0,3}$")
+DATE_RE = re.compile(r"^(\d{1,2})[/.\-](\d{1,2})[/.\-](\d{4})$")
+AGE_RE = re.compile(r"^(\d{1,3})\s*(?:years?(?:\s+old)?|yrs?|ዓመት(?:ዬ|ነው)?)?$", re.IGNORECASE)
+
+# Looser patterns for rule_parse(), used only when no LLM is reachable
+DATE_IN_TEXT_RE = re.compile(r"\b\d{1,2}[/.\-]\d{1,2}[/.\-]\d{4}\b")
+NUMBER_IN_TEXT_RE = re.compile(r"\b(\d{1,3})\b")
+NAME_PREFIX_RE = re.compile(
+    r"^(?:(?:his|her|the|my)\s+)?(?:(?:child|baby|son|daughter|kid|father|mother|dad|mom)(?:'s)?\s+)?"
+    r"(?:full\s+)?name\s+is\s+|^(?:it'?s|i am|i'm|he is|she is|he's|she's)\s+",
+    re.IGNORECASE,
+)
+
+NAME_FIELDS = {
+    STATES.BIRTH_CHILD_NAME: "child_name",
+    STATES.BIRTH_FATHER_NAME: "father_name",
+    STATES.BIRTH_MOTHER_NAME: "mother_name",
+}
+
+
+class FastPathStats:
+    """Thread-safe hit/miss counters for the rule-based tier."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = {}
+        self.misses = {}
+
+    def record(self, state: str, hit: bool):
+        counter = self.hits if hit else self.misses
+        with self._lock:
+            counter[state] = counter.get(state, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            hits, misses = dict(self.hits), dict(self.misses)
+        total = sum(hits.values()) + sum(misses.values())
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": sum(hits.values()) / total if total else 0.0,
+        }
+
+    def hit_rate(self) -> float:
+        return self.snapshot()["hit_rate"]
+
+
+stats = FastPathStats()
+
+
+def detect_language(message: str) -> Optional[str]:
+    """Return "am" if the text contains Ethiopic script, "en" if Latin letters only."""
+    if ETHIOPIC_RE.search(message):
+        return "am"
+    if re.search(r"[A-Za-z]", message):
+        return "en"
+    return None
+
+
+def _normalize_date(message: str) -> Optional[str]:
+    m = DATE_RE.match(message)
+    if not m:
+        return None
+    d, mo, y = (int(g) for g in m.groups())
+    try:
+        datetime(y, mo, d)
+    except ValueError:
+        return None
+    return f"{d:02d}/{mo:02d}/{y}"
+
+
+def _match_service(text: str) -> Optional[str]:
+    words = set(re.findall(r"[a-z]+", text))
+    matched = [
+        service for service, keywords in SERVICE_KEYWORDS.items()
+        if any((k in text) if ETHIOPIC_RE.match(k) else (k in words) for k in keywords)
+    ]
+    return matched[0] if len(matched) == 1 else None
+
+
+def looks_like_name(message: str) -> bool:
+    """Whether a reply could be a person's name: no chatter, verbs or words the rules know."""
+    text = message.lower()
+    return not (text in NOT_NAMES or text in SEX_WORDS or NON_NAME_WORDS.intersection(text.split()))
+
+
+def _extract(msg: str, state: str) -> Optional[UserCommand]:
+    text = msg.lower()
+
+    if state == STATES.GREETING and msg.upper() in GREETING_CHOICES:
+        return UserCommand(intent="choose_service", service=GREETING_CHOICES[msg.upper()], fields={})
+
+    if msg.upper() in CHOICES:
+        return UserCommand(intent="choose_option", choice=msg.upper(), fields={})
+
+    if text in RESET_WORDS:
+        return UserCommand(intent="reset", fields={})
+
+    if state == STATES.GREETING:
+        # Short requests only; longer ones may carry fields the LLM should extract
+        if len(text.split()) > 6 or re.search(r"\d", text):
+            return None
+        service = _match_service(text)
+        if service:
+            return UserCommand(intent="choose_service", service=service, fields={})
+        return None
+
+    if state in NAME_FIELDS:
+        if not NAME_RE.match(msg) or not looks_like_name(msg):
+            return None
+        if not ETHIOPIC_RE.search(msg) and len(msg) < 2:
+            return None
+        return UserCommand(intent="provide_field", fields={NAME_FIELDS[state]: " ".join(msg.split())})
+
+    if state == STATES.BIRTH_DOB:
+        dob = _normalize_date(msg)
+        if dob:
+            return UserCommand(intent="provide_field", fields={"date_of_birth": dob})
+        return None
+
+    if state == STATES.BIRTH_SEX:
+        sex = SEX_WORDS.get(text)
+        if sex:
+            return UserCommand(intent="provide_field", fields={"sex": sex})
+        return None
+
+    if state == STATES.ID_AGE:
+        m = AGE_RE.match(text)
+        if m:
+            return UserCommand(intent="provide_field", fields={"age": int(m.group(1))})
+        return None
+
+    if state == STATES.ID_HAS_ID:
+        # Map to the button choices so a "no" answer is not dropped as a falsy field
+        if text in YES_WORDS:
+            return UserCommand(intent="choose_option", choice="A", fields={})
+        if text in NO_WORDS:
+            return UserCommand(intent="choose_option", choice="B", fields={})
+        return None
+
+    if state == STATES.ID_DOCUMENTS:
+        # Any text here is stored as the documents note by the flow
+        return UserCommand(intent="confirm_documents", fields={})
+
+    return None
+
+
+def fast_parse(message: str, state: str, language: str) -> Optional[UserCommand]:
+    """
+    Rule-based NLU tier that runs before the LLM.
+
+    Args:
+        message: User's input message (already stripped)
+        state: Current state in the workflow
+        language: Current language setting
+
+    Returns:
+        UserCommand when the input is unambiguous for this state, otherwise
+        None so the caller falls back to the LLM.
+    """
+    msg = " ".join((message or "").split())
+    cmd = _extract(msg, state) if msg else None
+    stats.record(state, cmd is not None)
+    if cmd is not None and cmd.language is None:
+        cmd.language = detect_language(msg)
+    return cmd
+
+
+def rule_parse(message: str, state: str, language: str) -> Optional[UserCommand]:
+    """
+    Recall-first rules for when no LLM provider is available.
+
+    Tries fast_parse's strict rules, then pulls a date, sex word, age or
+    "his name is ..." answer out of a longer sentence. Not counted in the
+    fast path statistics.
+
+    Returns:
+        UserCommand, or None if nothing could be recognised
+    """
+    msg = " ".join((message or "").split())
+    if not msg:
+        return None
+    cmd = _extract(msg, state)
+    if cmd is None:
+        text = msg.lower()
+        fields = {}
+        date = DATE_IN_TEXT_RE.search(msg)
+        if date and _normalize_date(date.group()):
+            fields["date_of_birth"] = _normalize_date(date.group())
+        for word in re.findall(r"[\wሀ-፿]+", text):
+            if word in SEX_WORDS and len(word) > 1:
+                fields["sex"] = SEX_WORDS[word]
+                break
+        if state == STATES.ID_AGE:
+            age = NUMBER_IN_TEXT_RE.search(text)
+            if age:
+                fields["age"] = int(age.group(1))
+        if state in NAME_FIELDS:
+            name = NAME_PREFIX_RE.sub("", msg).strip(" .")
+            if name != msg and NAME_RE.match(name) and looks_like_name(name):
+                fields[NAME_FIELDS[state]] = name
+        service = _match_service(text) if state == STATES.GREETING else None
+        if service:
+            cmd = UserCommand(intent="choose_service", service=service, fields=fields)
+        elif fields:
+            cmd = UserCommand(intent="provide_field", fields=fields)
+    if cmd is not None and cmd.language is None:
+        cmd.language = detect_language(msg)
+    return cmd
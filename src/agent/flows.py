@@ -0,0 +1,442 @@
+"""
+Declarative conversation flows.
+
+A service is an ordered list of steps, one per state in STATES. A step either
+collects one field (read from the reply, validated, then the flow moves on),
+runs a named action supplied by the agent (payment, completion), or accepts
+uploads. FlowEngine checks the flows and indexes every step by state once at
+startup, so a turn is one dict lookup plus one loop over the fields that are
+already filled.
+
+Adding a service means adding its states, prompts and a Flow here, and its
+name to UserCommand.service.
+"""
+from types import GeneratorType
+from typing import Any, Callable, Dict, Iterable, List, Literal, Optional, Sequence
+
+from src.agent.catalog import CATALOG
+from src.agent.effects import BLOCKING
+from src.agent.prompts import MSG
+from src.agent.slots import get_slot_inventory, slot_label
+from src.agent.state import STATES
+from src.agent.validation import normalize_sex, validate_date
+from src.utils.metrics import stage
+
+
+# NLU field names that mean the same thing as a step field
+FIELD_ALIASES = {"dob": "date_of_birth"}
+
+ALL_STATES = {v for k, v in vars(STATES).items() if k.isupper()}
+
+
+class Step:
+    """
+    One state of a flow.
+
+    Args:
+        state: The STATES value this step handles
+        prompt: MSG key asked when the flow reaches this step
+        kind: How the UI should answer: "text", "number", "file" or "buttons"
+        options: Button labels when kind is "buttons"
+        field: Session data key this step fills, if any
+        read: (message, choice) -> value or None; how a reply fills the field
+        validate: value -> normalized value; raises ValueError with the MSG
+            key (or text) to reply with, or an empty ValueError to ask again
+        derive: Called with the session data once the field is valid; may
+            raise ValueError like validate (e.g. the chosen slot is gone)
+        action: Name of an agent action run when a reply arrives at this step
+        enter: Name of an agent action run as soon as the flow reaches this step
+        from_nlu: Whether the LLM may fill the field out of turn
+        files: Whether uploads are accepted at this step
+        offer: data -> {option: label}; buttons decided when the step is asked
+            (filling "{options}" in the prompt), or ValueError if none
+        type: Type of the field in the LLM schema for this and earlier states
+        hint: Short description of the field for the LLM
+    """
+
+    def __init__(self, state: str, prompt: Optional[str] = None, kind: str = "text", options: Sequence[str] = (),
+                 field: Optional[str] = None, read: Optional[Callable] = None, validate: Optional[Callable] = None,
+                 derive: Optional[Callable] = None, action: Optional[str] = None, enter: Optional[str] = None,
+                 from_nlu: bool = True, files: bool = False, offer: Optional[Callable] = None,
+                 type: Any = str, hint: str = ""):
+        self.state = state
+        self.prompt = prompt
+        self.kind = kind
+        self.options = tuple(options)
+        self.field = field
+        self.read = read
+        self.validate = validate
+        self.derive = derive
+        self.action = action
+        self.enter = enter
+        self.from_nlu = from_nlu
+        self.files = files
+        self.offer = offer
+        self.type = type
+        self.hint = hint
+        self.next: Optional[str] = None  # set by Flow
+
+    def __repr__(self):
+        return f"Step({self.state!r})"
+
+
+class Flow:
+    """A service's steps in order; each step moves on to the one after it."""
+
+    def __init__(self, service: str, steps: Sequence[Step]):
+        self.service = service
+        self.steps = tuple(steps)
+        for step, following in zip(self.steps, self.steps[1:]):
+            step.next = following.state
+
+    @property
+    def first(self) -> str:
+        return self.steps[0].state
+
+
+# ---- Readers: (message, choice) -> value or None
+
+def text(message: str, choice: Optional[str]):
+    """Free text, unless the reply was a button press."""
+    return message if message and not choice else None
+
+
+def buttons(mapping: Dict[str, Any]) -> Callable:
+    """A button press (or the letter typed), mapped to a field value."""
+    def read(message: str, choice: Optional[str]):
+        return mapping.get((choice or message or "").strip().upper())
+    return read
+
+
+# ---- Validators: value -> normalized value, or ValueError
+
+def date(value) -> str:
+    value = str(value).strip()
+    if not validate_date(value):
+        raise ValueError(MSG.INVALID_DATE)
+    return value
+
+
+def sex(value) -> str:
+    normalized = normalize_sex(value)
+    if normalized is None:
+        raise ValueError()
+    return normalized
+
+
+def applicant_age(value) -> int:
+    try:
+        age = int(str(value).strip())
+    except ValueError:
+        raise ValueError(MSG.AGE_NOT_NUMBER)
+    if age < 16:
+        raise ValueError(MSG.AGE_TOO_YOUNG)
+    return age
+
+
+def one_of(options: Iterable[str]) -> Callable:
+    """A button letter; anything else asks again."""
+    options = set(options)
+
+    def validate(value) -> str:
+        value = str(value).strip().upper()
+        if value not in options:
+            raise ValueError()
+        return value
+    return validate
+
+
+def yes_no(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    answer = str(value).strip().lower()
+    if answer in ("a", "yes", "y", "true", "አዎ"):
+        return True
+    if answer in ("b", "no", "n", "false", "የለም"):
+        return False
+    raise ValueError()
+
+
+SLOT_OPTIONS = "ABCD"
+
+
+def offer_slots(data: dict) -> Dict[str, str]:
+    """The next free appointment slots as buttons; remembered so the reply can be booked."""
+    starts = get_slot_inventory().available(len(SLOT_OPTIONS))
+    if not starts:
+        raise ValueError(MSG.NO_SLOTS)
+    data["slot_offer"] = dict(zip(SLOT_OPTIONS, starts))
+    return {option: slot_label(start) for option, start in data["slot_offer"].items()}
+
+
+def book_slot(data: dict):
+    start = (data.get("slot_offer") or {}).get(data["appointment_slot"])
+    if start is None:
+        raise ValueError()
+    reservation = get_slot_inventory().reserve(start)
+    if reservation is None:
+        raise ValueError(MSG.SLOT_TAKEN)
+    del data["slot_offer"]
+    data["appointment_reservation"] = reservation
+    data["appointment_date"], data["appointment_time"] = start.split()
+
+
+BIRTH_FLOW = Flow("birth_certificate", [
+    Step(STATES.BIRTH_CHILD_NAME, MSG.BIRTH_CHILD_NAME, field="child_name", read=text,
+         hint="child's full name"),
+    Step(STATES.BIRTH_DOB, MSG.BIRTH_DOB, field="date_of_birth", read=text, validate=date,
+         hint="DD/MM/YYYY"),
+    Step(STATES.BIRTH_SEX, MSG.BIRTH_SEX, "buttons", "AB", field="sex",
+         read=buttons({"A": "Male", "B": "Female"}), validate=sex, type=Literal["Male", "Female"]),
+    Step(STATES.BIRTH_FATHER_NAME, MSG.BIRTH_FATHER_NAME, field="father_name", read=text),
+    Step(STATES.BIRTH_MOTHER_NAME, MSG.BIRTH_MOTHER_NAME, field="mother_name", read=text),
+    Step(STATES.BIRTH_DOCUMENTS, MSG.BIRTH_DOCUMENTS, "file", field="uploaded_files", from_nlu=False, files=True),
+    Step(STATES.BIRTH_PAYMENT, MSG.BIRTH_PAYMENT_AMOUNT, "buttons", "AB", action="birth_payment"),
+    Step(STATES.BIRTH_PRINT_OPTION, MSG.BIRTH_PRINT_OPTION, "buttons", "ABC", field="print_option",
+         read=buttons({"A": "A", "B": "B", "C": "C"}), validate=one_of("ABC"), type=Literal["A", "B", "C"]),
+    Step(STATES.BIRTH_COMPLETE, enter="complete_birth_certificate"),
+])
+
+ID_FLOW = Flow("id_appointment", [
+    Step(STATES.ID_AGE, MSG.ID_AGE, "number", field="age", read=text, validate=applicant_age, type=int,
+         hint="applicant's age in years"),
+    Step(STATES.ID_HAS_ID, MSG.ID_HAS_ID, "buttons", "AB", field="has_previous_id",
+         read=buttons({"A": True, "B": False}), validate=yes_no, type=bool),
+    Step(STATES.ID_SLOT_SELECTION, MSG.ID_SLOT_SELECTION, "buttons", SLOT_OPTIONS, field="appointment_slot",
+         read=buttons({k: k for k in SLOT_OPTIONS}), validate=one_of(SLOT_OPTIONS), derive=book_slot,
+         offer=offer_slots, type=Literal["A", "B", "C", "D"]),
+    Step(STATES.ID_DOCUMENTS, MSG.ID_DOCUMENTS, field="documents_note",
+         read=lambda message, choice: message or "Documents noted", from_nlu=False),
+    Step(STATES.ID_PAYMENT, MSG.ID_PAYMENT_AMOUNT, "buttons", "AB", action="id_payment"),
+    Step(STATES.ID_COMPLETE, enter="complete_id_appointment"),
+])
+
+FLOWS = (BIRTH_FLOW, ID_FLOW)
+
+
+def fields_from(state: str, flows: Iterable[Flow] = FLOWS) -> List[Step]:
+    """
+    Steps whose fields the LLM may fill when the conversation is at ``state``.
+
+    That is the current step and every later one in its flow; outside a flow
+    (greeting) any service can be chosen, so every flow's fields count.
+    """
+    for flow in flows:
+        for i, step in enumerate(flow.steps):
+            if step.state == state:
+                return [s for s in flow.steps[i:] if s.field and s.from_nlu]
+    if state == STATES.GREETING:
+        return [s for flow in flows for s in flow.steps if s.field and s.from_nlu]
+    return []
+
+
+def check_flows(flows: Iterable[Flow], actions: Iterable[str] = None) -> list:
+    """
+    Find mistakes in flow definitions.
+
+    Args:
+        flows: The flows to check
+        actions: Action names the agent provides; not checked if None
+
+    Returns:
+        List of problems (empty if the flows are usable)
+    """
+    problems = []
+    seen = {}
+    for flow in flows:
+        if not flow.steps:
+            problems.append(f"{flow.service}: no steps")
+            continue
+        for step in flow.steps:
+            where = f"{flow.service}/{step.state}"
+            if step.state not in ALL_STATES:
+                problems.append(f"{where}: not a STATES value")
+            if step.state in seen:
+                problems.append(f"{where}: state already used by {seen[step.state]}")
+            seen[step.state] = flow.service
+            if step.prompt:
+                for language, messages in CATALOG.tables.items():
+                    if step.prompt not in messages:
+                        problems.append(f"{where}: prompt {step.prompt!r} missing for {language!r}")
+            if step.kind not in ("text", "number", "file", "buttons"):
+                problems.append(f"{where}: unknown kind {step.kind!r}")
+            if step.kind == "buttons" and not step.options:
+                problems.append(f"{where}: buttons without options")
+            if step.field and step.next is None:
+                problems.append(f"{where}: collects {step.field!r} but is the last step")
+            if step.field and step.read is None and not step.files:
+                problems.append(f"{where}: no way to read {step.field!r} from a reply")
+            if step.field and (step.action or step.enter):
+                problems.append(f"{where}: a step either collects a field or runs an action")
+            if not (step.field or step.action or step.enter or step.files):
+                problems.append(f"{where}: does nothing")
+            for name in (step.action, step.enter):
+                if name and actions is not None and name not in actions:
+                    problems.append(f"{where}: unknown action {name!r}")
+        if flow.steps[-1].enter is None:
+            problems.append(f"{flow.service}: last step needs an enter action to finish the service")
+    return problems
+
+
+def _offer(step: Step, data: dict):
+    """step.offer(data) for a BLOCKING effect; a ValueError is returned rather than raised."""
+    try:
+        return step.offer(data)
+    except ValueError as e:
+        return e
+
+
+def _derive(step: Step, data: dict):
+    """step.derive(data) for a BLOCKING effect; a ValueError is returned rather than raised."""
+    try:
+        step.derive(data)
+    except ValueError as e:
+        return e
+
+
+def say(lang: dict, error: ValueError) -> str:
+    """The reply for a validation error: its MSG key translated, or its text as is."""
+    message = str(error)
+    return lang.get(message, message)
+
+
+class FlowEngine:
+    """
+    Runs the flows for one agent.
+
+    Actions are the agent's side effects (references, payments, PDFs). They
+    are called as action(session, step, message, language_dict) for replies
+    and enter(session, step, language_dict) on arrival, and may be generators
+    that yield the agent's effects.
+
+    Offers and derives (the slot inventory) are run as BLOCKING effects, so
+    prompt(), start(), advance() and handle() are generators too.
+    """
+
+    def __init__(self, flows: Iterable[Flow], actions: Dict[str, Callable]):
+        flows = tuple(flows)
+        problems = check_flows(flows, actions)
+        if problems:
+            raise ValueError("Invalid conversation flows:\n  " + "\n  ".join(problems))
+        self.flows = {flow.service: flow for flow in flows}
+        self.steps = {step.state: step for flow in flows for step in flow.steps}
+        self.actions = dict(actions)
+        self.field_steps = {step.field: step for step in self.steps.values() if step.field}
+        self.nlu_fields = {field for field, step in self.field_steps.items() if step.from_nlu}
+
+    def step(self, state: str) -> Optional[Step]:
+        return self.steps.get(state)
+
+    def prompt(self, state: str, lang: dict, data: Optional[dict] = None):
+        """The question for a step, with the reply widget the UI should show."""
+        step = self.steps[state]
+        options = step.options
+        if step.offer:
+            offered = yield (BLOCKING, (_offer, (step, data if data is not None else {})))
+            if isinstance(offered, ValueError):
+                return {"response": say(lang, offered), "nextAction": "retry"}
+            options = tuple(offered)
+            response = {"response": lang[step.prompt].format(
+                options="\n".join(f"{option}) {label}" for option, label in offered.items()))}
+        else:
+            response = {"response": lang[step.prompt]}
+        if step.kind == "buttons":
+            response.update(nextAction="button_choice", options=list(options))
+        elif step.kind == "file":
+            response.update(nextAction="file_upload", fieldType="file")
+        else:
+            response.update(nextAction="input_field", fieldType=step.kind)
+        return response
+
+    def apply_fields(self, data: dict, fields: dict, state: str = None):
+        """
+        Store NLU-extracted fields that some step collects.
+
+        Values for the current step are kept as given so advance() can explain
+        what is wrong with them; invalid values for any other step are dropped
+        rather than overwriting an earlier answer.
+        """
+        for name, value in (fields or {}).items():
+            name = FIELD_ALIASES.get(name, name)
+            if name not in self.nlu_fields or value is None or value == "":
+                continue
+            step = self.field_steps[name]
+            if step.validate and step.state != state:
+                try:
+                    value = step.validate(value)
+                except ValueError:
+                    continue
+            data[name] = value
+
+    def start(self, s: dict, service: str, lang: dict):
+        """Enter a service's first step and skip any steps already answered."""
+        s["service"] = service
+        s["state"] = self.flows[service].first
+        return (yield from self.advance(s, lang))
+
+    def advance(self, s: dict, lang: dict):
+        """
+        Move past every step whose field is already filled and valid.
+
+        Returns the prompt (or validation message) for the first step that
+        still needs an answer, or the result of the enter action it lands on.
+        """
+        data = s["data"]
+        step = self.steps[s["state"]]
+        with stage("auto_advance"):
+            while step.field:
+                value = data.get(step.field)
+                if value is None or value == "":
+                    return (yield from self.prompt(step.state, lang, data))
+                try:
+                    if step.validate:
+                        value = step.validate(value)
+                    data[step.field] = value
+                    if step.derive:
+                        problem = yield (BLOCKING, (_derive, (step, data)))
+                        if problem is not None:
+                            raise problem
+                except ValueError as e:
+                    data.pop(step.field, None)
+                    if not str(e):
+                        return (yield from self.prompt(step.state, lang, data))
+                    if step.offer:
+                        # Offered options may have changed; show the fresh ones with the message
+                        response = yield from self.prompt(step.state, lang, data)
+                        response["response"] = f"{say(lang, e)}\n\n{response['response']}"
+                        return response
+                    return {"response": say(lang, e), "nextAction": "retry"}
+                s["state"] = step.next
+                step = self.steps[step.next]
+        if step.enter:
+            return (yield from self._run(step.enter, s, step, lang))
+        return (yield from self.prompt(step.state, lang, data))
+
+    def handle(self, s: dict, message: str, choice: Optional[str], lang: dict):
+        """
+        Apply one reply to the current step.
+
+        Returns the response dict, or None when the current state has nothing
+        to collect (greeting, completed services) and the caller should answer.
+        """
+        step = self.steps.get(s["state"])
+        if step is None:
+            return None
+        if step.action:
+            return (yield from self._run(step.action, s, step, message, lang))
+        if not step.field:
+            return None
+        data = s["data"]
+        if data.get(step.field) is None or data.get(step.field) == "":
+            value = step.read(message, choice) if step.read else None
+            if value is None:
+                return (yield from self.prompt(step.state, lang, data))
+            data[step.field] = value
+        return (yield from self.advance(s, lang))
+
+    def _run(self, name: str, *args):
+        result = self.actions[name](*args)
+        if isinstance(result, GeneratorType):
+            result = yield from result
+        return result
+
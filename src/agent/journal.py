@@ -0,0 +1,251 @@
+"""
+Append-only journal of session state and completed applications.
+
+Every saved session, every session deletion (reset or eviction) and every
+completed request is appended to <dir>/journal.log as one JSON line; a
+session store that persists on its own (SQLite) only journals records.
+A single writer thread group-commits: whatever has queued up while the
+previous fsync ran is written and synced together, so many turns share
+one fsync and a chat turn never waits for the disk. Completed records are
+appended with wait=True and are on disk before the user is told the
+request is complete.
+
+When the log grows past compact_bytes it is rotated and folded in the
+background into <dir>/snapshot.jsonl (the latest state per user plus the
+latest record per reference). Startup replays snapshot, then any rotated
+log, then the live log.
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+from src.config.settings import (
+    JOURNAL_DIR,
+    JOURNAL_FLUSH_MS,
+    JOURNAL_COMPACT_BYTES,
+    SESSION_IDLE_TTL,
+)
+from src.utils.metrics import LATENCY_BUCKETS, REGISTRY
+
+
+JOURNAL_FSYNC_SECONDS = REGISTRY.histogram("kebele_journal_fsync_seconds", "Time to write and fsync one journal batch.",
+                                           LATENCY_BUCKETS)
+JOURNAL_BATCH = REGISTRY.histogram("kebele_journal_batch_entries", "Entries written per journal fsync.",
+                                   (1, 2, 5, 10, 20, 50, 100, 200, 500))
+JOURNAL_ENTRIES = REGISTRY.counter("kebele_journal_entries_total", "Journal entries written.")
+
+
+def read_entries(path: Path) -> Iterator[dict]:
+    """Entries of one journal or snapshot file; a torn last line (crash mid-write) is skipped."""
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return
+    with f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+class JournalState:
+    """Latest session per user and latest record per reference, folded from journal entries."""
+
+    def __init__(self, records_since: float = 0):
+        self.sessions: Dict[str, tuple] = {}  # user_id -> (t, session)
+        self.records: Dict[str, dict] = {}  # ref -> entry
+        self.records_since = records_since  # older records are not kept (already indexed)
+
+    def apply(self, entry: dict):
+        op = entry.get("op")
+        if op == "session":
+            self.sessions[entry["user"]] = (entry["t"], entry["session"])
+        elif op == "delete":
+            self.sessions.pop(entry["user"], None)
+        elif op == "record" and entry.get("t", 0) >= self.records_since:
+            self.records[entry.get("ref") or f"#{len(self.records)}"] = entry
+
+    def entries(self, idle_ttl: float) -> Iterator[dict]:
+        cutoff = time.time() - idle_ttl
+        for entry in self.records.values():
+            yield entry
+        for user_id, (t, session) in self.sessions.items():
+            if t >= cutoff:
+                yield {"op": "session", "t": t, "user": user_id, "session": session}
+
+
+class Journal:
+    def __init__(self, directory: str = JOURNAL_DIR, flush_ms: float = JOURNAL_FLUSH_MS,
+                 compact_bytes: int = JOURNAL_COMPACT_BYTES, idle_ttl: float = SESSION_IDLE_TTL):
+        self.dir = Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.log_path = self.dir / "journal.log"
+        self.rotated_path = self.dir / "journal.1.log"
+        self.snapshot_path = self.dir / "snapshot.jsonl"
+        self.flush_interval = flush_ms / 1000
+        self.compact_bytes = compact_bytes
+        self.idle_ttl = idle_ttl
+        self._cond = threading.Condition()
+        self._pending: list = []  # [(line, future or None), ...]
+        self._compact_waiters: list = []  # futures for compact() calls
+        self._closed = False
+        self._compacting: Optional[threading.Thread] = None
+        self._file = open(self.log_path, "ab")
+        self._size = self._file.tell()
+        self._writer = threading.Thread(target=self._write_loop, name="journal-writer", daemon=True)
+        self._writer.start()
+
+    # ---- Writing
+
+    def append(self, entry: dict, wait: bool = False):
+        """
+        Queue an entry for the next group commit.
+
+        Args:
+            entry: JSON-serializable dict with an "op" key
+            wait: Block until the entry is fsynced
+        """
+        entry.setdefault("t", time.time())
+        line = (json.dumps(entry, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        future = Future() if wait else None
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("journal is closed")
+            self._pending.append((line, future))
+            self._cond.notify()
+        if future is not None:
+            future.result()
+
+    def session(self, user_id: str, session: dict):
+        """Record a user's current session state (not waited for)."""
+        self.append({"op": "session", "user": user_id, "session": session})
+
+    def delete(self, user_id: str):
+        """Record that a user's session is gone, so a restart does not bring it back (not waited for)."""
+        self.append({"op": "delete", "user": user_id})
+
+    def record(self, kind: str, data: dict):
+        """Record a completed request durably before returning."""
+        self.append({"op": "record", "kind": kind, "ref": data.get("reference_number"), "data": data}, wait=True)
+
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                while not (self._pending or self._compact_waiters or self._closed):
+                    self._cond.wait()
+                if not self._pending and self._closed:
+                    return
+                batch, self._pending = self._pending, []
+                waiters, self._compact_waiters = self._compact_waiters, []
+            elapsed = self._write(batch) if batch else None
+            if waiters or self._size >= self.compact_bytes:
+                self._rotate(waiters)
+            if elapsed is not None and elapsed < self.flush_interval:
+                # Leave room for more entries to gather, capping the fsync rate
+                time.sleep(self.flush_interval - elapsed)
+
+    def _write(self, batch: list) -> float:
+        """Write and fsync one group of entries, release whoever waits on them; returns seconds taken."""
+        started = time.perf_counter()
+        error = None
+        try:
+            self._file.write(b"".join(line for line, _ in batch))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._size += sum(len(line) for line, _ in batch)
+        except OSError as e:
+            print(f"Warning: journal write failed: {e}")
+            error = e
+        elapsed = time.perf_counter() - started
+        JOURNAL_FSYNC_SECONDS.observe(elapsed)
+        JOURNAL_BATCH.observe(len(batch))
+        JOURNAL_ENTRIES.inc(len(batch))
+        for _, future in batch:
+            if future is None:
+                continue
+            if error:
+                future.set_exception(error)
+            else:
+                future.set_result(None)
+        return elapsed
+
+    # ---- Compaction
+
+    def _rotate(self, waiters: list = ()):
+        """
+        Start a fresh log and fold the old one into the snapshot in the background.
+
+        Runs on the writer thread, the only one that touches the open log.
+        """
+        if self._compacting is not None and self._compacting.is_alive():
+            if waiters:
+                self._compacting.join()  # explicit compact(): let the running one finish, then go again
+            else:
+                return
+        if not self.rotated_path.exists():
+            # (if it does exist, a compaction was interrupted; finish that one first)
+            self._file.close()
+            os.replace(self.log_path, self.rotated_path)
+            self._file = open(self.log_path, "ab")
+            self._size = 0
+        self._compacting = threading.Thread(target=self._compact, args=(list(waiters),),
+                                            name="journal-compact", daemon=True)
+        self._compacting.start()
+
+    def _compact(self, waiters: list):
+        try:
+            state = JournalState()
+            for path in (self.snapshot_path, self.rotated_path):
+                for entry in read_entries(path):
+                    state.apply(entry)
+            tmp = self.snapshot_path.with_suffix(".tmp")
+            with open(tmp, "wb") as f:
+                for entry in state.entries(self.idle_ttl):
+                    f.write((json.dumps(entry, ensure_ascii=False, default=str) + "\n").encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.snapshot_path)
+            self.rotated_path.unlink(missing_ok=True)
+        except Exception as e:
+            print(f"Warning: journal compaction failed: {e}")
+        for future in waiters:
+            future.set_result(None)
+
+    def compact(self):
+        """Rotate and compact now (after entries already queued), waiting for it to finish."""
+        done = Future()
+        with self._cond:
+            self._compact_waiters.append(done)
+            self._cond.notify()
+        done.result()
+
+    # ---- Reading
+
+    def replay(self, records_since: float = 0) -> JournalState:
+        """
+        Fold snapshot and logs into the latest state (sessions idle past idle_ttl are dropped).
+
+        Args:
+            records_since: Leave out records journaled before this time
+        """
+        state = JournalState(records_since)
+        for path in (self.snapshot_path, self.rotated_path, self.log_path):
+            for entry in read_entries(path):
+                state.apply(entry)
+        cutoff = time.time() - self.idle_ttl
+        state.sessions = {u: v for u, v in state.sessions.items() if v[0] >= cutoff}
+        return state
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._writer.join()
+        if self._compacting is not None:
+            self._compacting.join()
+        self._file.close()
@@ -1,8 +1,18 @@
-from typing import Literal, Optional
-from pydantic import BaseModel, Field
+import threading
+from typing import AsyncIterator, Literal, Optional, Type, Union
+from pydantic import BaseModel, Field, create_model
 
-from langchain_openai import ChatOpenAI
-from src.config.settings import OPENAI_API_KEY, OPENAI_MODEL
+from src.config.settings import (
+    NLU_PROVIDERS,
+    NLU_DISPATCH,
+    NLU_CACHE_SIZE,
+    NLU_CACHE_TTL,
+    NLU_CACHE_PATH,
+)
+from src.agent.flows import FLOWS, fields_from
+from src.agent.prompts import LANGUAGES
+from src.agent.nlu_cache import NLUCache, create_cache, make_key
+from src.utils.metrics import LLM_CALL_TOKENS, LLM_TOKENS, REGISTRY, count
 
 
 class UserCommand(BaseModel):
@@ -24,7 +34,7 @@ class UserCommand(BaseModel):
     
     fields: dict = Field(
         default_factory=dict,
-        description="Extracted field values. Keys can include: child_name, date_of_birth, sex, father_name, mother_name, age, has_previous_id, appointment_slot, print_option, etc. Only include fields that user explicitly provided."
+        description="Extracted field values, typed as in the flows (e.g. age is an int). The LLM only sees the fields of the current state onward; see command_model()."
     )
     
     choice: Optional[str] = Field(
@@ -32,12 +42,228 @@ class UserCommand(BaseModel):
         description="User's choice (A, B, C, D, DONE, etc.)"
     )
     
-    language: Optional[Literal["am", "en"]] = Field(
+    language: Optional[Literal[tuple(LANGUAGES)]] = Field(
         default=None,
         description="Detected language preference"
     )
 
 
+SYSTEM_PROMPT = """Extract the citizen's request for a kebele service (birth certificate or ID appointment) by calling UserCommand.
+Only fill what the message clearly states; never guess. A lone A/B/C/D/DONE is intent "choose_option" with that choice.
+Current state: {state}
+Current language: {language}"""
+
+SERVICES = tuple(flow.service for flow in FLOWS)
+
+
+def command_model(state: str) -> Type[BaseModel]:
+    """
+    UserCommand schema for one state.
+
+    ``fields`` only has the fields that can still be filled from this state
+    onward, typed as the flow stores them (age is an int, sex is Male/Female,
+    slots are letters), so the tool schema is small and the reply needs no
+    re-parsing.
+    """
+    steps = fields_from(state)
+    fields_model = create_model(
+        "Fields",
+        **{step.field: (Optional[step.type], Field(None, description=step.hint or None)) for step in steps},
+    )
+    return create_model(
+        UserCommand.__name__,
+        __doc__=UserCommand.__doc__,
+        intent=(UserCommand.model_fields["intent"].annotation, ...),
+        service=(Optional[Literal[SERVICES]], None),
+        fields=(fields_model, Field(default_factory=fields_model)),
+        choice=(Optional[str], Field(None, description="A/B/C/D or DONE")),
+        language=(Optional[Literal[tuple(LANGUAGES)]], None),
+    )
+
+
+def compact_schema(schema: dict) -> dict:
+    """Inline $refs and drop titles, null defaults and Optional wrappers to save prompt tokens."""
+    defs = schema.get("$defs", {})
+
+    def walk(node):
+        if isinstance(node, list):
+            return [walk(item) for item in node]
+        if not isinstance(node, dict):
+            return node
+        if "$ref" in node:
+            return walk(defs[node["$ref"].rsplit("/", 1)[-1]])
+        options = node.get("anyOf")
+        if options and len(options) == 2 and {"type": "null"} in options:
+            inner = next(o for o in options if o != {"type": "null"})
+            node = {**{k: v for k, v in node.items() if k != "anyOf"}, **inner}
+        return {
+            k: walk(v) for k, v in node.items()
+            if k not in ("title", "$defs") and not (k == "default" and v is None)
+        }
+
+    return walk(schema)
+
+
+def command_tool(model) -> dict:
+    """OpenAI tool definition for a pydantic model."""
+    return {
+        "type": "function",
+        "function": {
+            "name": model.__name__,
+            "description": (model.__doc__ or "").strip(),
+            "parameters": {k: v for k, v in compact_schema(model.model_json_schema()).items() if k != "description"},
+        },
+    }
+
+
+def tool_arguments(message) -> str:
+    """Raw JSON arguments of the first tool call in an (streamed) AI message."""
+    calls = (message.additional_kwargs or {}).get("tool_calls") or []
+    return calls[0]["function"].get("arguments", "") if calls else ""
+
+
+def record_usage(state: str, prompt_tokens: int, completion_tokens: int):
+    """Report one call's tokens: totals, per-call histogram and the current turn."""
+    for kind, tokens in (("prompt", prompt_tokens), ("completion", completion_tokens)):
+        if tokens:
+            LLM_TOKENS.inc(tokens, kind=kind)
+            LLM_CALL_TOKENS.observe(tokens, kind=kind, state=state)
+            count(f"llm_{kind}_tokens", tokens)
+
+
+def fallback_command(message: str) -> UserCommand:
+    """Best-effort command used when no provider can parse the message."""
+    msg_upper = message.strip().upper()
+    if msg_upper in ["A", "B", "C", "D", "DONE"]:
+        return UserCommand(intent="choose_option", choice=msg_upper, fields={})
+    return UserCommand(intent="unknown", fields={})
+
+
+class UserMessageParser:
+    """
+    Process-wide parser: the shared NLU cache in front of the provider router
+    (or the NLUDispatcher wrapping it).
+
+    Only results from cacheable providers (the LLMs) are cached, so an answer
+    from the offline rules during an outage is not replayed later.
+    """
+
+    def __init__(self, router, cache: Optional[NLUCache] = None):
+        self.router = router
+        self.cache = cache
+
+    def _from_cache(self, key) -> Optional[UserCommand]:
+        if self.cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return UserCommand(**cached)
+        return None
+
+    def _to_cache(self, key, result: UserCommand, provider):
+        if self.cache and provider is not None and provider.cacheable:
+            self.cache.put(key, result.model_dump())
+
+    def parse(self, message: str, state: str, language: str) -> UserCommand:
+        key = make_key(message, state, language)
+        cached = self._from_cache(key)
+        if cached is not None:
+            return cached
+        result, provider = self.router.parse(message, state, language)
+        self._to_cache(key, result, provider)
+        return result
+
+    async def aparse(self, message: str, state: str, language: str) -> UserCommand:
+        key = make_key(message, state, language)
+        cached = self._from_cache(key)
+        if cached is not None:
+            return cached
+        result, provider = await self.router.aparse(message, state, language)
+        self._to_cache(key, result, provider)
+        return result
+
+    async def astream(self, message: str, state: str, language: str) -> AsyncIterator[Union[dict, UserCommand]]:
+        """
+        Stream the parse as it is generated.
+
+        Yields partial argument dicts (e.g. {"intent": "provide_field",
+        "fields": {"child_name": "Abe"}}) whenever they change, then the final
+        UserCommand as the last item.
+        """
+        key = make_key(message, state, language)
+        cached = self._from_cache(key)
+        if cached is not None:
+            yield cached
+            return
+        async for item in self.router.astream(message, state, language):
+            if isinstance(item, dict):
+                yield item
+            else:
+                result, provider = item
+                self._to_cache(key, result, provider)
+                yield result
+
+    def close(self):
+        self.router.close()
+
+
+_parser: Optional[UserMessageParser] = None
+_parser_lock = threading.Lock()
+
+
+def get_parser() -> UserMessageParser:
+    """Return the shared parser, creating it on first use."""
+    global _parser
+    if _parser is None:
+        with _parser_lock:
+            if _parser is None:
+                from src.agent.providers import ProviderRouter, create_providers
+
+                router = ProviderRouter(create_providers(NLU_PROVIDERS))
+                if NLU_DISPATCH:
+                    from src.agent.dispatcher import NLUDispatcher
+
+                    router = NLUDispatcher(router)
+                _parser = UserMessageParser(
+                    router,
+                    cache=create_cache(NLU_CACHE_SIZE, NLU_CACHE_TTL, NLU_CACHE_PATH),
+                )
+    return _parser
+
+
+def _cache_stats() -> dict:
+    cache = _parser.cache if _parser is not None else None
+    stats = cache.stats() if cache else {}
+    return {(("kind", k),): stats.get(k, 0) for k in ("size", "hits", "misses", "evictions")}
+
+
+REGISTRY.gauge("kebele_nlu_cache", "NLU result cache size and counters.", _cache_stats)
+
+
+def _dispatch_stats() -> dict:
+    stats = getattr(_parser.router, "stats", dict)() if _parser is not None else {}
+    return {(("kind", k),): v for k, v in stats.items()}
+
+
+REGISTRY.gauge("kebele_nlu_dispatch", "NLU calls waiting in the dispatcher queue and in flight.", _dispatch_stats)
+
+
+def _provider_health(key: str) -> dict:
+    health = _parser.router.health() if _parser is not None else {}
+    values = {}
+    for name, h in health.items():
+        if key == "circuit":
+            values[(("provider", name),)] = 0 if h["circuit"] == "closed" else 1
+        elif h["latency_ms"] is not None:
+            values[(("provider", name),)] = h["latency_ms"] / 1000
+    return values
+
+
+REGISTRY.gauge("kebele_nlu_circuit_open", "1 while an NLU provider is being skipped after failures.",
+               lambda: _provider_health("circuit"))
+REGISTRY.gauge("kebele_nlu_provider_latency_seconds", "Moving average latency per NLU provider.",
+               lambda: _provider_health("latency"))
+
+
 def parse_user_message(message: str, state: str, language: str) -> UserCommand:
     """
     Parse user message using LLM to extract structured information.
@@ -50,45 +276,15 @@ def parse_user_message(message: str, state: str, language: str) -> UserCommand:
     Returns:
         UserCommand with extracted information
     """
-    llm = ChatOpenAI(
-        model=OPENAI_MODEL,
-        temperature=0.2,
-        api_key=OPENAI_API_KEY
-    )
-    
-    structured_llm = llm.with_structured_output(UserCommand, method="function_calling")
-    
-    system_prompt = f"""You are a clerk assistant for Ethiopian kebele services. 
-Your job is to extract information from user messages accurately.
-
-Rules:
-1. Extract ONLY what the user explicitly provided. Never invent or guess missing information.
-2. If user answers with A/B/C/D, treat it as a choice and set intent to "choose_option".
-3. Keep dates in DD/MM/YYYY format when possible.
-4. For sex/gender, normalize to "Male" or "Female" (or "Boy"/"Girl").
-5. If user provides multiple fields at once (e.g., "My child is Tadesse Taffa born 12/10/2020, boy"), extract all fields into the fields dict.
-6. If intent is unclear, use "unknown".
-7. For service selection, detect if user wants birth certificate or ID appointment and set intent to "choose_service".
-8. Current state: {state}
-9. Current language: {language}
-
-Field names to use:
-- child_name, date_of_birth (or dob), sex, father_name, mother_name
-- age, has_previous_id, appointment_slot (A/B/C/D), print_option
-
-Be precise and only extract what is clearly stated."""
-    
-    try:
-        # Format prompt with system and user messages
-        prompt = f"{system_prompt}\n\nUser message: {message}"
-        result = structured_llm.invoke(prompt)
-        return result
-    except Exception as e:
-        print(f"Error parsing user message: {e}")
-        # Fallback: check for simple choices
-        msg_upper = message.strip().upper()
-        if msg_upper in ["A", "B", "C", "D", "DONE"]:
-            return UserCommand(intent="choose_option", choice=msg_upper, fields={})
-        # Return a safe default
-        return UserCommand(intent="unknown", fields={})
+    return get_parser().parse(message, state, language)
+
+
+async def aparse_user_message(message: str, state: str, language: str) -> UserCommand:
+    """Async variant of parse_user_message (uses ainvoke on the shared client)."""
+    return await get_parser().aparse(message, state, language)
+
 
+async def astream_user_message(message: str, state: str, language: str) -> AsyncIterator[Union[dict, UserCommand]]:
+    """Streaming variant: partial argument dicts, then the final UserCommand."""
+    async for item in get_parser().astream(message, state, language):
+        yield item
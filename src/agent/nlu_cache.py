@@ -0,0 +1,140 @@
+import atexit
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple
+
+
+CacheKey = Tuple[str, str, str]
+
+
+def normalize_message(message: str) -> str:
+    """Lower-case, collapse whitespace and drop trailing punctuation."""
+    text = " ".join((message or "").lower().split())
+    return re.sub(r"[\s.!?,;:።፣]+$", "", text)
+
+
+def make_key(message: str, state: str, language: str) -> CacheKey:
+    return (state, language, normalize_message(message))
+
+
+def is_shareable(result: dict) -> bool:
+    """
+    Only intent-only parses may be shared between users.
+
+    Anything that carries extracted fields (names, dates, ages...) is personal
+    data and is never cached.
+    """
+    return not result.get("fields")
+
+
+class NLUCache:
+    """
+    Bounded LRU cache with TTL for parsed UserCommand results.
+
+    Values are stored as plain dicts (UserCommand.model_dump()) so every hit
+    hands back a fresh object and the cache can be written to disk as JSON.
+    """
+
+    def __init__(self, max_size: int = 1000, ttl: float = 3600, path: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = Path(path) if path else None
+        self._entries: "OrderedDict[CacheKey, Tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if self.path:
+            self.load()
+
+    def get(self, key: CacheKey) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(value)
+
+    def put(self, key: CacheKey, value: dict) -> bool:
+        """Store value if the sharing policy allows it. Returns True if stored."""
+        if not is_shareable(value):
+            return False
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, dict(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def load(self):
+        """Load unexpired entries from disk (warm restart)."""
+        if not self.path or not self.path.exists():
+            return
+        try:
+            rows = json.loads(self.path.read_text(encoding="utf-8"))
+        except Exception as e:
+            print(f"Warning: could not load NLU cache from {self.path}: {e}")
+            return
+        now = time.time()
+        with self._lock:
+            for state, language, message, expires_at, value in rows[-self.max_size:]:
+                if expires_at > now and is_shareable(value):
+                    self._entries[(state, language, message)] = (expires_at, value)
+
+    def save(self):
+        """Write unexpired entries to disk, oldest first."""
+        if not self.path:
+            return
+        now = time.time()
+        with self._lock:
+            rows = [
+                [state, language, message, expires_at, value]
+                for (state, language, message), (expires_at, value) in self._entries.items()
+                if expires_at > now
+            ]
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(f"{self.path.suffix}.{os.getpid()}.tmp")  # workers may save at once
+            tmp.write_text(json.dumps(rows, ensure_ascii=False), encoding="utf-8")
+            tmp.replace(self.path)
+        except Exception as e:
+            print(f"Warning: could not save NLU cache to {self.path}: {e}")
+
+
+def create_cache(max_size: int, ttl: float, path: str = "") -> Optional[NLUCache]:
+    """Build the process cache from settings; max_size 0 disables caching."""
+    if max_size <= 0:
+        return None
+    cache = NLUCache(max_size=max_size, ttl=ttl, path=path or None)
+    if cache.path:
+        atexit.register(cache.save)
+    return cache
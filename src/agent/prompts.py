@@ -1,3 +1,76 @@
+"""
+Translations of everything the agent says.
+
+Keys are the MSG constants. A language listed in FALLBACKS may be partial:
+whatever it leaves out is shown in the language it falls back to. Every
+other language must translate every key. src/agent/catalog.py checks and
+compiles these tables once at startup.
+
+Adding a language (e.g. Afaan Oromo) means adding its name to LANGUAGES,
+its table to RESPONSES and, while the translation is incomplete, an entry
+to FALLBACKS such as "om": "en".
+"""
+
+
+class MSG:
+    # Step prompts (see Step.prompt in src/agent/flows.py)
+    GREETING = "greeting"
+    BIRTH_CHILD_NAME = "birth_child_name"
+    BIRTH_DOB = "birth_dob"
+    BIRTH_SEX = "birth_sex"
+    BIRTH_FATHER_NAME = "birth_father_name"
+    BIRTH_MOTHER_NAME = "birth_mother_name"
+    BIRTH_DOCUMENTS = "birth_documents"
+    BIRTH_PAYMENT_AMOUNT = "birth_payment_amount"
+    BIRTH_PRINT_OPTION = "birth_print_option"
+    ID_AGE = "id_age"
+    ID_HAS_ID = "id_has_id"
+    ID_SLOT_SELECTION = "id_slot_selection"
+    ID_DOCUMENTS = "id_documents"
+    ID_PAYMENT_AMOUNT = "id_payment_amount"
+
+    ACK = "ack"
+
+    # Validation messages (raised as ValueError(MSG.X) by the flow validators)
+    INVALID_DATE = "invalid_date"
+    AGE_NOT_NUMBER = "age_not_number"
+    AGE_TOO_YOUNG = "age_too_young"
+    NO_SLOTS = "no_slots"
+    SLOT_TAKEN = "slot_taken"
+    SLOT_RELEASED = "slot_released"
+    NEED_INFORMATION = "need_information"
+    NOT_UNDERSTOOD = "not_understood"
+
+    # Uploads; {name} is the file name
+    TOO_MANY_FILES = "too_many_files"
+    UPLOAD_FAILED = "upload_failed"
+    UPLOAD_TOO_LARGE = "upload_too_large"
+    UPLOAD_NOT_ACCEPTED = "upload_not_accepted"
+    UPLOAD_UNREADABLE = "upload_unreadable"
+
+    # Summaries
+    TELEBIRR_INSTRUCTIONS = "telebirr_instructions"
+    BIRTH_COMPLETE = "birth_complete"
+    PDF_READY = "pdf_ready"
+    PDF_QUEUED = "pdf_queued"
+    ID_COMPLETE = "id_complete"
+
+    # Composed by the catalog from the keys above
+    BIRTH_COMPLETE_PDF_READY = "birth_complete_pdf_ready"
+    BIRTH_COMPLETE_PDF_QUEUED = "birth_complete_pdf_queued"
+
+
+# Language code -> name shown in the language picker
+LANGUAGES = {
+    "am": "አማርኛ (Amharic)",
+    "en": "English",
+}
+
+# Partially translated language -> language used for its missing messages
+FALLBACKS = {}
+
+DEFAULT_LANGUAGE = "en"  # for language codes that are not in LANGUAGES
+
 RESPONSES = {
   "am": {
     "greeting": "ሰላም! የኩባሌ ሞያ ወደ ነኝ! \n\nምን ሞያ ይወዳደር?\nA) ልጅ መመዝገብ (Birth Certificate)\nB) ኢጂ ቀጠሪ (ID Appointment)\n\nA ወይስ B ይንገርን",
@@ -13,9 +86,32 @@ RESPONSES = {
 
     "id_age": "ስንት ዓመት ነበሩ?",
     "id_has_id": "ከዚህ ቀደም ID አለዎ?\nA) አዎ (Yes)\nB) የለም (No)",
-    "id_slot_selection": "ተዳቅሩ ጊዜ ምን ይወዳደር?\n\nA) ታህሳስ 27 - 9:00 ጠዋት\nB) ታህሳስ 27 - 10:00 ጠዋት\nC) ታህሳስ 28 - 9:00 ጠዋት\nD) ታህሳስ 28 - 10:00 ጠዋት",
+    "id_slot_selection": "ተዳቅሩ ጊዜ ምን ይወዳደር?\n\n{options}",
     "id_documents": "ሰነዶች ይስቋ:\n1. ከቀበሌው የመኖሪያ ደብዳቤ\n2. ልደት ሰርቲፊኬት\n3. ፎቶ (4x6)",
     "id_payment_amount": "✅ ተተኪ ተቀመጠ!\n\n💰 ዋጋ: 200 ETB\n\nየከፈሉ?\nA) Telebirr\nB) ፊት ለፊት",
+
+    "ack": "⏳ እሺ፣ ትንሽ ይጠብቁ...",
+
+    "invalid_date": "የቀን አጻጻፍ ትክክል አይደለም። ቀን/ወር/ዓመት ይጠቀሙ (ምሳሌ: 15/03/2020)።",
+    "age_not_number": "እባክዎ ዕድሜዎን በቁጥር ያስገቡ።",
+    "age_too_young": "ዕድሜዎ ቢያንስ 16 ዓመት መሆን አለበት። ዕድሜዎን እንደገና ያስገቡ።",
+    "no_slots": "አሁን ክፍት የቀጠሮ ጊዜ የለም። እባክዎ ቆይተው ይሞክሩ።",
+    "slot_taken": "ይቅርታ፣ ያ ጊዜ አሁን ተይዟል።",
+    "slot_released": "ቀጠሮው ለረጅም ጊዜ ስላልተጠናቀቀ የመረጡት ጊዜ ተለቋል።",
+    "need_information": "እባክዎ የተጠየቀውን መረጃ ያስገቡ።",
+    "not_understood": "ይቅርታ፣ አልገባኝም። እባክዎ እንደገና ይሞክሩ።",
+
+    "too_many_files": "እባክዎ ቢበዛ 3 ሰነዶች ይስቀሉ።",
+    "upload_failed": "ፋይሎቹን ማስቀመጥ አልተቻለም። እባክዎ እንደገና ይስቀሉ።",
+    "upload_too_large": "{name} በጣም ትልቅ ነው (ከፍተኛ {max_mb} MB)።",
+    "upload_not_accepted": "{name} PDF ወይም ፎቶ አይደለም። እባክዎ PDF፣ JPG ወይም PNG ፋይሎችን ይስቀሉ።",
+    "upload_unreadable": "{name} እንደ ፎቶ ሊነበብ አልቻለም።",
+
+    "telebirr_instructions": "*144# ይደውሉ\nመጠን: 100 ብር\nማጣቀሻ: {ref}\n\nከከፈሉ በኋላ 'DONE' ብለው ይመልሱ (ወይም ለሙከራ ይቀጥሉ)።",
+    "birth_complete": "✅ የልደት ሰርቲፊኬት ጥያቄ ተጠናቋል!\n\nማጣቀሻ: {ref}\n\nየሚፈጀው ጊዜ: ~15 ደቂቃ (ሙከራ)\nእናመሰግናለን!",
+    "pdf_ready": "📄 PDFዎ ከታች ለመውረድ ዝግጁ ነው።",
+    "pdf_queued": "📄 PDFዎ እየተዘጋጀ ነው፤ በቅርቡ ከታች ይታያል።",
+    "id_complete": "✅ ቀጠሮ ተይዟል!\n\nማጣቀሻ: {ref}\nቀን: {date}\nሰዓት: {time}\nቦታ: የቀበሌ ጽ/ቤት (ሙከራ)\n",
   },
 
   "en": {
@@ -32,8 +128,31 @@ RESPONSES = {
 
     "id_age": "How old are you?",
     "id_has_id": "Do you already have an ID?\nA) Yes\nB) No",
-    "id_slot_selection": "When would you like to visit?\n\nA) Dec 27 - 9:00 AM\nB) Dec 27 - 10:00 AM\nC) Dec 28 - 9:00 AM\nD) Dec 28 - 10:00 AM",
+    "id_slot_selection": "When would you like to visit?\n\n{options}",
     "id_documents": "Please upload these documents:\n1. Kebele Residence Letter\n2. Birth Certificate\n3. Passport Photo (4x6)",
     "id_payment_amount": "✅ Appointment booked!\n\n💰 Cost: 200 ETB\n\nHow to pay?\nA) Telebirr\nB) Later",
+
+    "ack": "⏳ Got it, one moment...",
+
+    "invalid_date": "Invalid date format. Use DD/MM/YYYY (e.g., 15/03/2020).",
+    "age_not_number": "Please enter a number (age).",
+    "age_too_young": "You must be at least 16 years old. Enter your age again.",
+    "no_slots": "No appointment times are free right now. Please try again later.",
+    "slot_taken": "Sorry, that time was just taken.",
+    "slot_released": "Your chosen time was released because the booking took too long.",
+    "need_information": "Please provide the requested information.",
+    "not_understood": "Sorry, I didn't understand. Please try again.",
+
+    "too_many_files": "Please upload maximum 3 documents.",
+    "upload_failed": "Error saving files. Please try uploading again.",
+    "upload_too_large": "{name} is too large (max {max_mb} MB).",
+    "upload_not_accepted": "{name} is not a PDF or photo. Please upload PDF, JPG or PNG files.",
+    "upload_unreadable": "{name} could not be read as an image.",
+
+    "telebirr_instructions": "Dial *144#\nAmount: 100 ETB\nReference: {ref}\n\nReply 'DONE' after payment (or just continue for demo).",
+    "birth_complete": "✅ Birth Certificate Request Complete!\n\nReference: {ref}\n\nProcessing time: ~15 minutes (demo)\nThank you!",
+    "pdf_ready": "📄 Your PDF is ready for download below.",
+    "pdf_queued": "📄 Your PDF is being prepared and will appear below shortly.",
+    "id_complete": "✅ Appointment booked!\n\nReference: {ref}\nDate: {date}\nTime: {time}\nLocation: Kebele Office (demo)\n",
   }
 }
@@ -0,0 +1,470 @@
+"""
+NLU providers and the router that picks between them.
+
+A provider turns a message into a UserCommand or raises. Three kinds exist:
+
+- OpenAIProvider: any OpenAI-compatible chat endpoint. Used for OpenAI
+  itself and for a local model server (llama.cpp's server, Ollama, vLLM...)
+  via LOCAL_LLM_BASE_URL.
+- RuleProvider: the fast path's rules plus the A/B/C/D fallback; never fails
+  and needs no network.
+
+ProviderRouter tries providers in order. Each has a circuit breaker, so a
+provider that keeps failing is skipped outright instead of costing every turn
+a timeout, and a running latency average, so a provider that has become
+slower than the latency budget is tried after faster ones (with an occasional
+probe so it can win its place back).
+"""
+import asyncio
+import json
+import threading
+import time
+from typing import AsyncIterator, List, Optional, Tuple, Type, Union
+
+import httpx
+import openai
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.output_parsers.json import parse_partial_json
+from langchain_openai import ChatOpenAI
+from pydantic import BaseModel
+
+from src.agent.fastpath import rule_parse
+from src.agent.flows import ALL_STATES
+from src.agent.nlu import (
+    SYSTEM_PROMPT,
+    UserCommand,
+    command_model,
+    command_tool,
+    fallback_command,
+    record_usage,
+    tool_arguments,
+)
+from src.agent.state import STATES
+from src.config.settings import (
+    OPENAI_API_KEY,
+    OPENAI_MODEL,
+    OPENAI_BASE_URL,
+    LOCAL_LLM_API_KEY,
+    LOCAL_LLM_BASE_URL,
+    LOCAL_LLM_MODEL,
+    LOCAL_LLM_TIMEOUT,
+    NLU_POOL_SIZE,
+    NLU_TIMEOUT,
+    NLU_MAX_RETRIES,
+    NLU_BREAKER_FAILURES,
+    NLU_BREAKER_RESET,
+    NLU_LATENCY_BUDGET,
+)
+from src.utils.metrics import LLM_SECONDS, REGISTRY
+
+
+NLU_CALLS = REGISTRY.counter("kebele_nlu_provider_calls_total", "NLU provider calls, by provider and outcome.")
+
+
+class TokenUsageHandler(BaseCallbackHandler):
+    """Captures the prompt/completion tokens the OpenAI API reports for one call."""
+
+    def __init__(self):
+        self.usage = {}
+
+    def on_llm_end(self, response, **kwargs):
+        self.usage = (response.llm_output or {}).get("token_usage") or {}
+
+
+class Provider:
+    """Base class: parse() raises on any failure so the router can fail over."""
+
+    name = "provider"
+    cacheable = True  # whether results may go into the shared NLU cache
+
+    def parse(self, message: str, state: str, language: str) -> UserCommand:
+        raise NotImplementedError
+
+    async def aparse(self, message: str, state: str, language: str) -> UserCommand:
+        return await asyncio.to_thread(self.parse, message, state, language)
+
+    async def astream(self, message: str, state: str, language: str) -> AsyncIterator[Union[dict, UserCommand]]:
+        """Partial argument dicts while generating, then the UserCommand."""
+        yield await self.aparse(message, state, language)
+
+    async def aclose(self):
+        """Release async resources on the event loop that used them."""
+
+    def close(self):
+        pass
+
+
+class OpenAIProvider(Provider):
+    """
+    An OpenAI-compatible chat endpoint with a forced UserCommand tool call.
+
+    Holds one ChatOpenAI client backed by a keep-alive connection pool and a
+    tool binding per state, so each chat turn only pays for the request
+    itself. The underlying httpx/OpenAI clients are thread-safe, so a single
+    instance is shared by all Gradio worker threads.
+    """
+
+    def __init__(self, name: str = "openai", model: str = OPENAI_MODEL, api_key: str = OPENAI_API_KEY,
+                 base_url: str = OPENAI_BASE_URL, pool_size: int = NLU_POOL_SIZE, timeout: float = NLU_TIMEOUT,
+                 max_retries: int = NLU_MAX_RETRIES):
+        self.name = name
+        limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self.http_client = httpx.Client(limits=limits, timeout=timeout)
+        self.async_http_client = httpx.AsyncClient(limits=limits, timeout=timeout)
+        self._async_loop: Optional[asyncio.AbstractEventLoop] = None  # where its connections were opened
+        self._closing: Optional[asyncio.Task] = None  # aclose() scheduled by close() on a running loop
+        client_params = {"api_key": api_key, "base_url": base_url, "timeout": timeout, "max_retries": max_retries}
+        client = openai.OpenAI(http_client=self.http_client, **client_params)
+        async_client = openai.AsyncOpenAI(http_client=self.async_http_client, **client_params)
+        self.llm = ChatOpenAI(
+            model=model,
+            temperature=0.2,
+            api_key=api_key,
+            request_timeout=timeout,
+            max_retries=max_retries,
+            client=client.chat.completions,
+            async_client=async_client.chat.completions,
+        )
+        # Forced function call with a schema per state; with_structured_output
+        # is not available in the pinned langchain-openai, and the raw
+        # tool-call chunks are what streaming needs anyway.
+        self.models = {}
+        self.tool_llms = {}
+        self.schema_chars = {}
+        for state in sorted(ALL_STATES):
+            command = command_model(state)
+            tool = command_tool(command)
+            self.models[state] = command
+            self.tool_llms[state] = self.llm.bind_tools([tool], tool_choice=command.__name__)
+            self.schema_chars[state] = len(json.dumps(tool))
+
+    def build_prompt(self, message: str, state: str, language: str) -> str:
+        system_prompt = SYSTEM_PROMPT.format(state=state, language=language)
+        return f"{system_prompt}\n\nUser message: {message}"
+
+    def _for_state(self, state: str):
+        if state not in self.models:
+            state = STATES.GREETING
+        return self.models[state], self.tool_llms[state]
+
+    @staticmethod
+    def _to_command(model: Type[BaseModel], arguments: str) -> UserCommand:
+        parsed = model.model_validate_json(arguments)
+        return UserCommand(
+            intent=parsed.intent,
+            service=parsed.service,
+            fields=parsed.fields.model_dump(exclude_none=True),
+            choice=parsed.choice,
+            language=parsed.language,
+        )
+
+    def parse(self, message: str, state: str, language: str) -> UserCommand:
+        model, tool_llm = self._for_state(state)
+        usage = TokenUsageHandler()
+        start = time.perf_counter()
+        try:
+            reply = tool_llm.invoke(self.build_prompt(message, state, language), config={"callbacks": [usage]})
+            result = self._to_command(model, tool_arguments(reply))
+        except Exception:
+            LLM_SECONDS.observe(time.perf_counter() - start, op="invoke", outcome="error", provider=self.name)
+            raise
+        LLM_SECONDS.observe(time.perf_counter() - start, op="invoke", outcome="ok", provider=self.name)
+        record_usage(state, usage.usage.get("prompt_tokens", 0), usage.usage.get("completion_tokens", 0))
+        return result
+
+    async def aparse(self, message: str, state: str, language: str) -> UserCommand:
+        self._async_loop = asyncio.get_running_loop()
+        model, tool_llm = self._for_state(state)
+        usage = TokenUsageHandler()
+        start = time.perf_counter()
+        try:
+            reply = await tool_llm.ainvoke(self.build_prompt(message, state, language), config={"callbacks": [usage]})
+            result = self._to_command(model, tool_arguments(reply))
+        except Exception:
+            LLM_SECONDS.observe(time.perf_counter() - start, op="ainvoke", outcome="error", provider=self.name)
+            raise
+        LLM_SECONDS.observe(time.perf_counter() - start, op="ainvoke", outcome="ok", provider=self.name)
+        record_usage(state, usage.usage.get("prompt_tokens", 0), usage.usage.get("completion_tokens", 0))
+        return result
+
+    async def astream(self, message: str, state: str, language: str) -> AsyncIterator[Union[dict, UserCommand]]:
+        """
+        Stream the parse as it is generated.
+
+        Yields partial argument dicts (e.g. {"intent": "provide_field",
+        "fields": {"child_name": "Abe"}}) whenever they change, then the final
+        UserCommand as the last item.
+        """
+        self._async_loop = asyncio.get_running_loop()
+        model, tool_llm = self._for_state(state)
+        prompt = self.build_prompt(message, state, language)
+        start = time.perf_counter()
+        first_chunk = None
+        try:
+            reply = None
+            last = None
+            async for chunk in tool_llm.astream(prompt):
+                if first_chunk is None:
+                    first_chunk = time.perf_counter() - start
+                    LLM_SECONDS.observe(first_chunk, op="astream_first_chunk", outcome="ok", provider=self.name)
+                reply = chunk if reply is None else reply + chunk
+                partial = parse_partial_json(tool_arguments(reply) or "{}")
+                if partial and partial != last:
+                    last = partial
+                    yield partial
+            arguments = tool_arguments(reply)
+            result = self._to_command(model, arguments)
+        except Exception:
+            LLM_SECONDS.observe(time.perf_counter() - start, op="astream", outcome="error", provider=self.name)
+            raise
+        LLM_SECONDS.observe(time.perf_counter() - start, op="astream", outcome="ok", provider=self.name)
+        # Streamed responses carry no usage in the pinned client; estimate ~4 chars per token
+        record_usage(state, (len(prompt) + self.schema_chars[state]) // 4, len(arguments) // 4)
+        yield result
+
+    async def aclose(self):
+        await self.async_http_client.aclose()
+
+    def close(self):
+        self.http_client.close()
+        if self.async_http_client.is_closed:
+            return
+        # Async connections can only be closed on the loop that opened them
+        loop = self._async_loop
+        try:
+            current = asyncio.get_running_loop()
+        except RuntimeError:
+            current = None
+        if loop is not None and loop is not current and loop.is_running():
+            asyncio.run_coroutine_threadsafe(self.aclose(), loop).result(timeout=10)
+        elif current is not None:
+            # A loop is running in this thread, so nothing may block on or start another one
+            self._closing = current.create_task(self.aclose())
+        elif loop is None:
+            asyncio.run(self.aclose())  # never used, so nothing is bound to a loop yet
+        elif not loop.is_closed():
+            loop.run_until_complete(self.aclose())
+        # (a closed loop has already dropped its connections)
+
+
+class RuleProvider(Provider):
+    """Deterministic parsing only: looser fast-path rules, then button letters."""
+
+    name = "rules"
+    cacheable = False  # an "unknown" here must not hide a later LLM answer
+
+    def parse(self, message: str, state: str, language: str) -> UserCommand:
+        return rule_parse(message, state, language) or fallback_command(message)
+
+    async def aparse(self, message: str, state: str, language: str) -> UserCommand:
+        return self.parse(message, state, language)
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after ``failure_threshold`` consecutive failures; after
+    ``reset_timeout`` seconds one trial call is let through (half-open) and
+    its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = NLU_BREAKER_FAILURES, reset_timeout: float = NLU_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        """Whether a call could be allowed now (does not claim the half-open trial)."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            return self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self) -> bool:
+        """Count a failure; returns True if this opened the circuit."""
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                opened = self.state != self.OPEN
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                return opened
+            return False
+
+
+class Route:
+    """A provider with its breaker and latency estimate."""
+
+    ALPHA = 0.3  # weight of the newest sample in the moving average
+
+    def __init__(self, provider: Provider, breaker: CircuitBreaker):
+        self.provider = provider
+        self.breaker = breaker
+        self.latency: Optional[float] = None  # exponentially weighted, seconds
+        self.last_attempt = 0.0
+
+    def observe(self, seconds: float):
+        self.latency = seconds if self.latency is None else self.ALPHA * seconds + (1 - self.ALPHA) * self.latency
+
+
+class ProviderRouter:
+    """
+    Ordered failover across providers.
+
+    Providers whose circuit is open are skipped. Providers slower than
+    ``latency_budget`` move behind the others, except for one probe call
+    every ``probe_interval`` seconds. If every provider fails the A/B/C/D
+    fallback is used.
+    """
+
+    def __init__(self, providers: List[Provider], latency_budget: float = NLU_LATENCY_BUDGET,
+                 probe_interval: float = NLU_BREAKER_RESET, failure_threshold: int = NLU_BREAKER_FAILURES,
+                 reset_timeout: float = NLU_BREAKER_RESET):
+        self.routes = [Route(p, CircuitBreaker(failure_threshold, reset_timeout)) for p in providers]
+        self.latency_budget = latency_budget
+        self.probe_interval = probe_interval
+
+    def _candidates(self) -> List[Route]:
+        now = time.monotonic()
+        fast, slow = [], []
+        for route in self.routes:
+            if not route.breaker.available():
+                continue
+            is_slow = route.latency is not None and route.latency > self.latency_budget
+            if is_slow and now - route.last_attempt < self.probe_interval:
+                slow.append(route)
+            else:
+                fast.append(route)
+        return fast + slow
+
+    def _claim(self, route: Route) -> bool:
+        if not route.breaker.allow():
+            return False
+        route.last_attempt = time.monotonic()
+        return True
+
+    def _succeeded(self, route: Route, start: float):
+        route.observe(time.perf_counter() - start)
+        route.breaker.record_success()
+        NLU_CALLS.inc(provider=route.provider.name, outcome="ok")
+
+    def _failed(self, route: Route, start: float, error: Exception):
+        route.observe(time.perf_counter() - start)
+        NLU_CALLS.inc(provider=route.provider.name, outcome="error")
+        print(f"Warning: NLU provider {route.provider.name} failed: {error}")
+        if route.breaker.record_failure():
+            print(f"Warning: NLU provider {route.provider.name} disabled for {route.breaker.reset_timeout:g}s")
+
+    def parse(self, message: str, state: str, language: str) -> Tuple[UserCommand, Optional[Provider]]:
+        for route in self._candidates():
+            if not self._claim(route):
+                continue
+            start = time.perf_counter()
+            try:
+                result = route.provider.parse(message, state, language)
+            except Exception as e:
+                self._failed(route, start, e)
+                continue
+            self._succeeded(route, start)
+            return result, route.provider
+        return fallback_command(message), None
+
+    async def aparse(self, message: str, state: str, language: str) -> Tuple[UserCommand, Optional[Provider]]:
+        for route in self._candidates():
+            if not self._claim(route):
+                continue
+            start = time.perf_counter()
+            try:
+                result = await route.provider.aparse(message, state, language)
+            except Exception as e:
+                self._failed(route, start, e)
+                continue
+            self._succeeded(route, start)
+            return result, route.provider
+        return fallback_command(message), None
+
+    async def astream(self, message: str, state: str, language: str):
+        """Partial dicts from whichever provider answers, then (UserCommand, provider)."""
+        for route in self._candidates():
+            if not self._claim(route):
+                continue
+            start = time.perf_counter()
+            result = None
+            try:
+                async for item in route.provider.astream(message, state, language):
+                    if isinstance(item, dict):
+                        yield item
+                    else:
+                        result = item
+                if result is None:
+                    raise ValueError("stream ended without a result")
+            except Exception as e:
+                self._failed(route, start, e)
+                continue
+            self._succeeded(route, start)
+            yield result, route.provider
+            return
+        yield fallback_command(message), None
+
+    def health(self) -> dict:
+        return {
+            route.provider.name: {
+                "circuit": route.breaker.state,
+                "latency_ms": round(route.latency * 1000, 1) if route.latency is not None else None,
+            }
+            for route in self.routes
+        }
+
+    async def aclose(self):
+        for route in self.routes:
+            await route.provider.aclose()
+
+    def close(self):
+        for route in self.routes:
+            route.provider.close()
+
+
+def create_providers(names: str) -> List[Provider]:
+    """
+    Build providers from a comma-separated list (NLU_PROVIDERS).
+
+    Providers that are not configured are skipped; the rule-based provider is
+    always last so the router has an answer that needs no network.
+    """
+    providers = []
+    for name in (n.strip().lower() for n in names.split(",")):
+        if not name or name == "rules":
+            continue
+        if name == "openai":
+            if not OPENAI_API_KEY:
+                print("Warning: OPENAI_API_KEY not set; the OpenAI NLU provider is disabled")
+                continue
+            providers.append(OpenAIProvider())
+        elif name == "local":
+            if LOCAL_LLM_BASE_URL:
+                providers.append(OpenAIProvider(
+                    "local", LOCAL_LLM_MODEL, LOCAL_LLM_API_KEY, LOCAL_LLM_BASE_URL,
+                    timeout=LOCAL_LLM_TIMEOUT, max_retries=0,
+                ))
+        else:
+            print(f"Warning: unknown NLU provider {name!r} ignored")
+    providers.append(RuleProvider())
+    return providers
@@ -0,0 +1,199 @@
+"""
+Reference numbers for requests: BIRTH/<year>/<serial><check>, ID/<year>/<serial><check>.
+
+The serial is a per-prefix sequence written in Crockford base32 (no I, L,
+O or U) and zero-padded, so references are unique and sort in issue
+order. The last character is a Luhn mod 32 check over the serial, which
+catches any single mistyped character and most swapped neighbours.
+
+Each process reserves a block of REFERENCE_BLOCK numbers at a time from a
+counter in SQLite, so several workers never hand out the same number and
+only touch the database once per block. Numbers left in a block when a
+process exits are skipped, which keeps references unique but not gapless.
+
+Completed requests are filed under their reference in the same database,
+so a lookup finds a request whichever worker process completed it.
+"""
+import itertools
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from src.config.settings import REFERENCE_DB_PATH, REFERENCE_BLOCK
+
+
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+DIGITS = {c: i for i, c in enumerate(ALPHABET)}
+# Characters people type for the ones the alphabet leaves out
+CONFUSABLE = str.maketrans({"O": "0", "I": "1", "L": "1"})
+SERIAL_WIDTH = 7  # 32**7: about 34 billion references per prefix
+
+
+def check_char(serial: str) -> str:
+    """Luhn mod 32 check character for a base32 serial."""
+    total = 0
+    for i, c in enumerate(reversed(serial)):
+        value = DIGITS[c]
+        if i % 2 == 0:
+            value *= 2
+            value = value // 32 + value % 32
+        total += value
+    return ALPHABET[-total % 32]
+
+
+def encode(number: int, width: int = SERIAL_WIDTH) -> str:
+    digits = []
+    while number:
+        number, r = divmod(number, 32)
+        digits.append(ALPHABET[r])
+    return "".join(reversed(digits)).rjust(width, "0")
+
+
+def normalize(reference: str) -> str:
+    """Upper-case and undo common misreadings (O/0, I/L/1) in the serial."""
+    reference = reference.strip().upper()
+    prefix, _, code = reference.rpartition("/")
+    return f"{prefix}/{code.translate(CONFUSABLE)}" if prefix else reference
+
+
+def is_valid(reference: str) -> bool:
+    """Whether a reference is well formed and its check character matches."""
+    code = normalize(reference).rpartition("/")[2]
+    if len(code) != SERIAL_WIDTH + 1 or any(c not in DIGITS for c in code):
+        return False
+    return check_char(code[:-1]) == code[-1]
+
+
+class ReferenceService:
+    """
+    Issues references and finds the record filed under one.
+
+    index() and lookup() use a table keyed by reference, filled from the
+    journal at startup and as requests complete. The journal is the durable
+    copy, so the table is written without waiting for fsync.
+    """
+
+    def __init__(self, path: str = REFERENCE_DB_PATH, block: int = REFERENCE_BLOCK):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.block = block
+        self._lock = threading.Lock()
+        self._blocks: Dict[str, tuple] = {}  # prefix -> (itertools.count, end)
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS counters ("
+            " prefix TEXT PRIMARY KEY,"
+            " next INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS records ("
+            " ref TEXT PRIMARY KEY,"
+            " record TEXT NOT NULL)"
+        )
+        # How far each journal's records have been indexed at startup (see KebeleAgent._restore)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS marks ("
+            " name TEXT PRIMARY KEY,"
+            " value REAL NOT NULL)"
+        )
+
+    def _allocate(self, prefix: str) -> tuple:
+        """Reserve the next block of numbers for a prefix; returns (first, end)."""
+        (end,) = self._conn.execute(
+            "INSERT INTO counters(prefix, next) VALUES (?, 1 + ?) "
+            "ON CONFLICT(prefix) DO UPDATE SET next = next + ? RETURNING next",
+            (prefix, self.block, self.block),
+        ).fetchone()
+        return end - self.block, end
+
+    def _next_number(self, prefix: str) -> int:
+        # next() on itertools.count is atomic, so threads only take the lock to refill a block
+        while True:
+            block = self._blocks.get(prefix)
+            if block is not None:
+                number = next(block[0])
+                if number < block[1]:
+                    return number
+            with self._lock:
+                if self._blocks.get(prefix) is block:
+                    first, end = self._allocate(prefix)
+                    self._blocks[prefix] = (itertools.count(first), end)
+
+    def issue(self, kind: str, year: Optional[int] = None) -> str:
+        """
+        A new reference, e.g. the first issue("BIRTH") in 2026 -> "BIRTH/2026/0000001Y".
+
+        Args:
+            kind: "BIRTH" or "ID"
+            year: Defaults to the current year
+        """
+        prefix = f"{kind}/{year or datetime.now().year}"
+        serial = encode(self._next_number(prefix))
+        return f"{prefix}/{serial}{check_char(serial)}"
+
+    def index(self, reference: str, record: dict):
+        """File a completed request under its reference."""
+        self.index_many([(reference, record)])
+
+    def index_many(self, records: Iterable[tuple]):
+        """File many (reference, record) pairs in one transaction (journal replay)."""
+        rows = [(normalize(reference), json.dumps(record, ensure_ascii=False, default=str))
+                for reference, record in records]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany("INSERT OR REPLACE INTO records(ref, record) VALUES (?, ?)", rows)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def file_requests(self, kind: str, requests: Iterable[dict]):
+        """File completed requests (service kind, request data) under their references, as the journal has them."""
+        self.index_many((data["reference_number"], {"op": "record", "kind": kind, "ref": data["reference_number"],
+                                                    "data": data}) for data in requests)
+
+    def lookup(self, reference: str) -> Optional[dict]:
+        """The record for a reference, or None (also for mistyped ones)."""
+        if not is_valid(reference):
+            return None
+        with self._lock:
+            row = self._conn.execute("SELECT record FROM records WHERE ref = ?", (normalize(reference),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def mark(self, name: str) -> float:
+        """A stored position, 0 if never set."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM marks WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0.0
+
+    def set_mark(self, name: str, value: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO marks(name, value) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+                (name, value),
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM records").fetchone()[0]
+
+
+_service: Optional[ReferenceService] = None
+_service_lock = threading.Lock()
+
+
+def get_reference_service() -> ReferenceService:
+    """Return the shared reference service, opening it on first use."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = ReferenceService()
+    return _service
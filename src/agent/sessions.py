@@ -0,0 +1,267 @@
+import json
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+
+def deep_sizeof(obj, _seen: Optional[set] = None) -> int:
+    """Approximate memory footprint of a session dict in bytes."""
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(deep_sizeof(v, seen) for v in obj)
+    return size
+
+
+class SessionStore:
+    """
+    Storage for conversation sessions (user_id -> session dict).
+
+    Backends implement get/save/delete/__iter__/stats; the dict-style helpers
+    below let the agent and UI keep using ``store[user_id]`` syntax. Sessions
+    returned by get() may be copies, so callers must save() after mutating.
+
+    on_delete, if set, is called with the user_id whenever delete() removes a
+    session or the store evicts one (persistent stores, which drop idle rows
+    in bulk, only call it from delete()).
+    """
+
+    persistent = False  # True if saved sessions survive a restart without the journal
+    on_delete: Optional[Callable[[str], None]] = None
+
+    def _deleted(self, user_ids):
+        if self.on_delete is not None:
+            for user_id in user_ids:
+                self.on_delete(user_id)
+
+    def get(self, user_id: str, default=None) -> Optional[dict]:
+        raise NotImplementedError
+
+    def save(self, user_id: str, session: dict):
+        raise NotImplementedError
+
+    def delete(self, user_id: str):
+        raise NotImplementedError
+
+    def __iter__(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        raise NotImplementedError
+
+    def __contains__(self, user_id: str) -> bool:
+        return self.get(user_id) is not None
+
+    def __getitem__(self, user_id: str) -> dict:
+        session = self.get(user_id)
+        if session is None:
+            raise KeyError(user_id)
+        return session
+
+    def __setitem__(self, user_id: str, session: dict):
+        self.save(user_id, session)
+
+    def __delitem__(self, user_id: str):
+        self.delete(user_id)
+
+    def __len__(self) -> int:
+        return self.stats()["sessions"]
+
+
+class MemorySessionStore(SessionStore):
+    """In-process store with LRU eviction and an idle timeout."""
+
+    def __init__(self, max_sessions: int = 10000, idle_ttl: float = 6 * 3600):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()  # user_id -> (last_seen, session)
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, user_id: str, default=None) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            entry = self._sessions.get(user_id)
+            if entry is None:
+                return default
+            expired = now - entry[0] > self.idle_ttl
+            if expired:
+                del self._sessions[user_id]
+                self.evictions += 1
+            else:
+                self._sessions[user_id] = (now, entry[1])
+                self._sessions.move_to_end(user_id)
+                return entry[1]
+        self._deleted([user_id])
+        return default
+
+    def save(self, user_id: str, session: dict):
+        now = time.time()
+        with self._lock:
+            self._sessions[user_id] = (now, session)
+            self._sessions.move_to_end(user_id)
+            evicted = self._evict(now)
+        self._deleted(evicted)
+
+    def delete(self, user_id: str):
+        with self._lock:
+            self._sessions.pop(user_id, None)
+        self._deleted([user_id])
+
+    def _evict(self, now: float) -> list:
+        # Oldest entries sit at the front: drop idle ones, then trim to size
+        evicted = []
+        while self._sessions:
+            user_id, (last_seen, _) = next(iter(self._sessions.items()))
+            if now - last_seen <= self.idle_ttl and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[user_id]
+            evicted.append(user_id)
+        self.evictions += len(evicted)
+        return evicted
+
+    def sweep(self):
+        """Drop idle sessions now instead of waiting for the next save()."""
+        with self._lock:
+            evicted = self._evict(time.time())
+        self._deleted(evicted)
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            return iter(list(self._sessions))
+
+    def session_bytes(self, user_id: str) -> int:
+        with self._lock:
+            entry = self._sessions.get(user_id)
+            return deep_sizeof(entry[1]) if entry else 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def stats(self) -> dict:
+        # Sizes are measured outside the lock so a scrape does not stall turns
+        with self._lock:
+            sessions = [session for _, session in self._sessions.values()]
+            evictions = self.evictions
+        sizes = [deep_sizeof(session) for session in sessions]
+        return {
+            "backend": "memory",
+            "sessions": len(sizes),
+            "bytes_total": sum(sizes),
+            "bytes_per_session": sum(sizes) / len(sizes) if sizes else 0,
+            "bytes_max_session": max(sizes, default=0),
+            "evictions": evictions,
+        }
+
+
+class SqliteSessionStore(SessionStore):
+    """
+    SQLite-backed store that several worker processes can share.
+
+    Sessions are stored as JSON; idle rows are purged every
+    ``purge_every`` saves.
+    """
+
+    persistent = True
+
+    def __init__(self, path: str = "data/sessions.db", idle_ttl: float = 6 * 3600,
+                 purge_every: int = 500):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.idle_ttl = idle_ttl
+        self.purge_every = purge_every
+        self._saves = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " user_id TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions(updated_at)")
+
+    def get(self, user_id: str, default=None) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, updated_at FROM sessions WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.idle_ttl:
+            return default
+        return json.loads(row[0])
+
+    def save(self, user_id: str, session: dict):
+        payload = json.dumps(session, ensure_ascii=False, default=str)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO sessions(user_id, data, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                (user_id, payload, time.time()),
+            )
+            self._saves += 1
+            if self._saves % self.purge_every == 0:
+                self._purge()
+
+    def delete(self, user_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
+        self._deleted([user_id])
+
+    def _purge(self):
+        cur = self._conn.execute(
+            "DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.idle_ttl,)
+        )
+        self.evictions += cur.rowcount
+
+    def sweep(self):
+        with self._lock:
+            self._purge()
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT user_id FROM sessions").fetchall()
+        return iter([r[0] for r in rows])
+
+    def session_bytes(self, user_id: str) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT length(data) FROM sessions WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, total, largest = self._conn.execute(
+                "SELECT count(*), coalesce(sum(length(data)), 0), coalesce(max(length(data)), 0) FROM sessions"
+            ).fetchone()
+            evictions = self.evictions
+        return {
+            "backend": "sqlite",
+            "sessions": count,
+            "bytes_total": total,
+            "bytes_per_session": total / count if count else 0,
+            "bytes_max_session": largest,
+            "evictions": evictions,
+        }
+
+
+def create_session_store(backend: str, max_sessions: int, idle_ttl: float, db_path: str) -> SessionStore:
+    """Build the session store selected in settings ("memory" or "sqlite")."""
+    if backend == "sqlite":
+        return SqliteSessionStore(db_path, idle_ttl=idle_ttl)
+    if backend == "memory":
+        return MemorySessionStore(max_sessions=max_sessions, idle_ttl=idle_ttl)
+    raise ValueError(f"Unknown SESSION_BACKEND: {backend!r} (use 'memory' or 'sqlite')")
@@ -0,0 +1,240 @@
+"""
+Appointment slot inventory.
+
+Slots are generated from office hours (SLOT_OFFICE_DAYS, SLOT_OFFICE_HOURS,
+SLOT_MINUTES) for the next SLOT_DAYS_AHEAD days, each with SLOT_CAPACITY
+places, and kept in SQLite so several worker processes share one inventory.
+
+A booking is a hold until the appointment is completed: reserve() takes a
+place with one conditional UPDATE (so concurrent bookings cannot overbook),
+confirm() makes it permanent, and holds left unconfirmed for
+SLOT_HOLD_SECONDS (abandoned chats) give their place back.
+"""
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import List, Optional
+
+from src.config.settings import (
+    SLOT_DB_PATH,
+    SLOT_OFFICE_DAYS,
+    SLOT_OFFICE_HOURS,
+    SLOT_MINUTES,
+    SLOT_CAPACITY,
+    SLOT_DAYS_AHEAD,
+    SLOT_HOLD_SECONDS,
+    SLOT_CACHE_TTL,
+)
+from src.utils.metrics import REGISTRY
+
+
+SLOT_BOOKINGS = REGISTRY.counter("kebele_slot_bookings_total", "Appointment slot reservations by outcome.")
+
+START_FORMAT = "%Y-%m-%d %H:%M"  # sorts in time order as text
+CACHE_ROWS = 32  # open slots kept in the read cache
+
+
+def parse_office_hours(spec: str) -> List[tuple]:
+    """"08:30-12:30,13:30-17:00" -> [((8, 30), (12, 30)), ((13, 30), (17, 0))]."""
+    periods = []
+    for part in spec.split(","):
+        opens, closes = part.strip().split("-")
+        periods.append(tuple(tuple(int(x) for x in t.split(":")) for t in (opens, closes)))
+    return periods
+
+
+def slot_starts(day: date, office_hours: str = SLOT_OFFICE_HOURS, minutes: int = SLOT_MINUTES) -> List[str]:
+    """Start times of the slots that fit in a day's office hours."""
+    starts = []
+    step = timedelta(minutes=minutes)
+    for (oh, om), (ch, cm) in parse_office_hours(office_hours):
+        t = datetime(day.year, day.month, day.day, oh, om)
+        closes = datetime(day.year, day.month, day.day, ch, cm)
+        while t + step <= closes:
+            starts.append(t.strftime(START_FORMAT))
+            t += step
+    return starts
+
+
+def slot_label(start: str) -> str:
+    """How a slot is shown to users, e.g. "20/10/2026 09:00"."""
+    return datetime.strptime(start, START_FORMAT).strftime("%d/%m/%Y %H:%M")
+
+
+class SlotInventory:
+    def __init__(self, path: str = SLOT_DB_PATH, capacity: int = SLOT_CAPACITY, days_ahead: int = SLOT_DAYS_AHEAD,
+                 office_days: str = SLOT_OFFICE_DAYS, office_hours: str = SLOT_OFFICE_HOURS,
+                 minutes: int = SLOT_MINUTES, hold_seconds: float = SLOT_HOLD_SECONDS,
+                 cache_ttl: float = SLOT_CACHE_TTL):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.capacity = capacity
+        self.days_ahead = days_ahead
+        self.office_days = {int(d) for d in office_days.split(",") if d.strip()}
+        self.office_hours = office_hours
+        self.minutes = minutes
+        self.hold_seconds = hold_seconds
+        self.cache_ttl = cache_ttl
+        self._lock = threading.Lock()
+        self._generated_through: Optional[date] = None
+        self._last_expiry = 0.0
+        self._cache: list = []  # [[start, free], ...] in time order
+        self._cache_expires = 0.0
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS slots ("
+            " start TEXT PRIMARY KEY,"
+            " capacity INTEGER NOT NULL,"
+            " booked INTEGER NOT NULL DEFAULT 0)"
+        )
+        # Only slots with room are indexed, so "next N free" reads N index entries
+        self._conn.execute("CREATE INDEX IF NOT EXISTS slots_open ON slots(start) WHERE booked < capacity")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS reservations ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"  # ids of expired holds are never handed out again
+            " slot TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " confirmed INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS reservations_holds ON reservations(created) WHERE confirmed = 0")
+
+    def _ensure_generated(self):
+        """Add slots up to days_ahead days from today (idempotent, once a day per process)."""
+        today = date.today()
+        through = today + timedelta(days=self.days_ahead)
+        if self._generated_through is not None and self._generated_through >= through:
+            return
+        rows = []
+        day = today
+        while day <= through:
+            if day.weekday() in self.office_days:
+                rows.extend((start, self.capacity) for start in slot_starts(day, self.office_hours, self.minutes))
+            day += timedelta(days=1)
+        self._conn.executemany("INSERT OR IGNORE INTO slots(start, capacity) VALUES (?, ?)", rows)
+        self._generated_through = through
+
+    def _expire_holds(self):
+        """Give back places held by bookings that were never completed (at most once a minute)."""
+        now = time.time()
+        if now - self._last_expiry < min(60.0, self.hold_seconds):
+            return
+        self._last_expiry = now
+        cutoff = now - self.hold_seconds
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.execute(
+                "UPDATE slots SET booked = booked - ("
+                " SELECT count(*) FROM reservations r WHERE r.slot = slots.start AND r.confirmed = 0 AND r.created < ?)"
+                " WHERE start IN (SELECT slot FROM reservations WHERE confirmed = 0 AND created < ?)",
+                (cutoff, cutoff),
+            )
+            cur = self._conn.execute("DELETE FROM reservations WHERE confirmed = 0 AND created < ?", (cutoff,))
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        if cur.rowcount:
+            SLOT_BOOKINGS.inc(cur.rowcount, outcome="expired")
+            self._cache_expires = 0
+
+    def available(self, n: int, after: Optional[datetime] = None) -> List[str]:
+        """
+        The next ``n`` slots with room, earliest first.
+
+        Served from an in-memory copy of the first open slots, refreshed every
+        cache_ttl seconds; reserve() checks the database, so a stale entry
+        costs at most one re-offer.
+        """
+        after = (after or datetime.now()).strftime(START_FORMAT)
+        with self._lock:
+            now = time.monotonic()
+            if now < self._cache_expires:
+                cached = self._from_cache(n, after)
+                if len(cached) == n:
+                    return cached
+            self._ensure_generated()
+            self._expire_holds()
+            self._cache = [list(row) for row in self._conn.execute(
+                "SELECT start, capacity - booked FROM slots WHERE booked < capacity AND start > ?"
+                " ORDER BY start LIMIT ?", (after, max(n, CACHE_ROWS)),
+            )]
+            self._cache_expires = now + self.cache_ttl
+            return self._from_cache(n, after)
+
+    def _from_cache(self, n: int, after: str) -> List[str]:
+        return [start for start, free in self._cache if start > after and free > 0][:n]
+
+    def reserve(self, start: str) -> Optional[int]:
+        """
+        Hold a place in a slot.
+
+        Returns:
+            The reservation id, or None if the slot is full, past or unknown
+        """
+        with self._lock:
+            self._expire_holds()
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cur = self._conn.execute(
+                    "UPDATE slots SET booked = booked + 1 WHERE start = ? AND booked < capacity AND start > ?",
+                    (start, datetime.now().strftime(START_FORMAT)),
+                )
+                if cur.rowcount != 1:
+                    self._conn.execute("ROLLBACK")
+                    self._drop_cached(start)
+                    SLOT_BOOKINGS.inc(outcome="full")
+                    return None
+                cur = self._conn.execute(
+                    "INSERT INTO reservations(slot, created) VALUES (?, ?)", (start, time.time())
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            for row in self._cache:
+                if row[0] == start:
+                    row[1] -= 1
+            SLOT_BOOKINGS.inc(outcome="held")
+            return cur.lastrowid
+
+    def _drop_cached(self, start: str):
+        self._cache = [row for row in self._cache if row[0] != start]
+
+    def confirm(self, reservation_id: Optional[int]) -> bool:
+        """Make a hold permanent; False if it expired (or never existed)."""
+        if reservation_id is None:
+            return False
+        with self._lock:
+            cur = self._conn.execute("UPDATE reservations SET confirmed = 1 WHERE id = ?", (reservation_id,))
+        if cur.rowcount:
+            SLOT_BOOKINGS.inc(outcome="confirmed")
+        return cur.rowcount == 1
+
+    def stats(self) -> dict:
+        after = datetime.now().strftime(START_FORMAT)
+        with self._lock:
+            slots, free, held = self._conn.execute(
+                "SELECT count(*), coalesce(sum(capacity - booked), 0),"
+                " (SELECT count(*) FROM reservations WHERE confirmed = 0)"
+                " FROM slots WHERE start > ?", (after,)
+            ).fetchone()
+        return {"slots": slots, "free": free, "held": held}
+
+
+_inventory: Optional[SlotInventory] = None
+_inventory_lock = threading.Lock()
+
+
+def get_slot_inventory() -> SlotInventory:
+    """Return the shared slot inventory, opening it on first use."""
+    global _inventory
+    if _inventory is None:
+        with _inventory_lock:
+            if _inventory is None:
+                _inventory = SlotInventory()
+    return _inventory
@@ -0,0 +1,197 @@
+"""
+Conversation traces: every turn's input, parsed command, states and timings.
+
+With TRACE_PATH set the agent writes one JSON line per turn (gzip-compressed
+when the path ends in .gz):
+
+    {"op": "start", "t": ..., "user": "...", "lang": "am"}
+    {"op": "turn", "t": ..., "user": "...", "lang": "am", "msg": "...", "files": 0,
+     "before": "id_age", "after": "id_has_id", "service": "id_appointment",
+     "cmd": {"intent": "provide_field", "fields": {"age": 30}}, "src": "fastpath",
+     "ms": 0.41, "stages": {"fastpath": 0.02, ...}}
+
+benchmarks/replay_traces.py feeds a trace back through KebeleAgent.process
+with the recorded commands standing in for the LLM, so a day of traffic
+replays offline in seconds.
+
+With TRACE_REDACT (the default) names, birth dates and document notes are
+masked in the message and the command: "Abebe Kebede, born 1.2.2020"
+becomes "Xxxxx Xxxxxx, born 01.01.2000". Masking keeps what the fast path
+and the flows look at (a name still reads as a name, a real date stays a
+real date, keywords and other answers are untouched), so a redacted trace
+replays to the same states. Everything else users typed is still there:
+keep traces where the journal is kept and turn tracing off when not needed.
+"""
+import atexit
+import gzip
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional
+
+from src.agent.fastpath import CHOICES, NAME_RE, fast_parse, looks_like_name
+from src.config.settings import TRACE_PATH, TRACE_REDACT
+
+
+# Fields that identify someone; masked in traces with TRACE_REDACT
+PERSONAL_FIELDS = {"child_name", "father_name", "mother_name", "date_of_birth", "dob", "documents_note"}
+
+MASK_RE = re.compile(r"(?P<date>\b\d{1,2}[/.\-]\d{1,2}[/.\-]\d{4}\b)|\w")
+DATE_PARTS_RE = re.compile(r"(\d+)([/.\-])(\d+)([/.\-])(\d+)")
+ETHIOPIC_RE = re.compile(r"[\u1200-\u137f\u1380-\u139f\u2d80-\u2ddf]")
+
+
+def _mask_date(date: str) -> str:
+    """01/01/2000 for a real date and 00/00/0000 otherwise, keeping the separators."""
+    d, first, m, second, y = DATE_PARTS_RE.match(date).groups()
+    try:
+        datetime(int(y), int(m), int(d))
+    except ValueError:
+        return f"00{first}00{second}0000"
+    return f"01{first}01{second}2000"
+
+
+def _mask_char(match: re.Match) -> str:
+    if match.group("date"):
+        return _mask_date(match.group("date"))
+    c = match.group()
+    if ETHIOPIC_RE.match(c):
+        return "\u1200"
+    if c.isdigit():
+        return "0"
+    return "X" if c.isupper() else "x"
+
+
+def mask(text: str) -> str:
+    """Hide a value but keep its shape: letters become x/X (ሀ for Ethiopic), digits 0, dates as above."""
+    return MASK_RE.sub(_mask_char, text)
+
+
+def redact(message: str, command: Optional[dict], data: Optional[dict], state: str, language: str) -> tuple:
+    """
+    Mask personal values in a turn's message and command.
+
+    Values come from the command's fields and from the session data (the
+    flows may store a reply as it was typed), except button answers such as
+    "done" kept as a documents note. A message that reads as a name
+    but that the fast path would not act on in this state (a name typed at
+    the wrong step) is masked whole, and every date in the message as well.
+
+    Returns:
+        (message, command)
+    """
+    if NAME_RE.match(message) and looks_like_name(message) and fast_parse(message, state, language) is None:
+        message = mask(message)
+    fields = (command or {}).get("fields") or {}
+    values = {str(value) for source in (fields, data or {}) for key, value in source.items()
+              if key in PERSONAL_FIELDS and value and str(value).upper() not in CHOICES}
+    for value in sorted(values, key=len, reverse=True):
+        words = r"\s+".join(re.escape(word) for word in value.split())
+        if words:
+            message = re.sub(rf"(?<!\w){words}(?!\w)", lambda m: mask(m.group()), message, flags=re.IGNORECASE)
+    message = MASK_RE.sub(lambda m: _mask_date(m.group("date")) if m.group("date") else m.group(), message)
+    if fields:
+        command = {**command, "fields": {key: mask(str(value)) if key in PERSONAL_FIELDS and value else value
+                                         for key, value in fields.items()}}
+    return message, command
+
+
+class TraceWriter:
+    """
+    Appends trace records to a JSONL file (gzip if the name ends in .gz).
+
+    "{pid}" in the path is replaced by the process id, so worker processes
+    each write their own file.
+    """
+
+    def __init__(self, path: str, redact: bool = TRACE_REDACT):
+        self.path = Path(path.replace("{pid}", str(os.getpid())))
+        self.redact = redact
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        if self.path.suffix == ".gz":
+            self._file = gzip.open(self.path, "at", encoding="utf-8", compresslevel=6)
+        else:
+            self._file = open(self.path, "a", encoding="utf-8")
+
+    def _write(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str)
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line + "\n")
+
+    def start(self, user_id: str, language: str):
+        self._write({"op": "start", "t": round(time.time(), 3), "user": user_id, "lang": language})
+
+    def turn(self, user_id: str, language: str, message: str, files: Optional[list], state_before: str,
+             state_after: str, service: Optional[str], cmd, source: Optional[str], elapsed: float, stages: dict,
+             data: Optional[dict] = None):
+        """
+        Record one turn.
+
+        Args:
+            cmd: The UserCommand the turn acted on, or None (uploads are not parsed)
+            source: "fastpath" or "nlu"
+            elapsed: Seconds the turn took
+            stages: Seconds per stage (turn_stages())
+            data: The session data after the turn; its personal values are redacted too
+        """
+        command = cmd.model_dump(exclude_defaults=True) if cmd is not None else None
+        if self.redact:
+            message, command = redact(message or "", command, data, state_before, language)
+        self._write({
+            "op": "turn",
+            "t": round(time.time(), 3),
+            "user": user_id,
+            "lang": language,
+            "msg": message,
+            "files": len(files or ()),
+            "before": state_before,
+            "after": state_after,
+            "service": service,
+            "cmd": command,
+            "src": source,
+            "ms": round(elapsed * 1000, 3),
+            "stages": {k: round(v * 1000, 3) for k, v in stages.items()},
+        })
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_traces(path: str) -> Iterator[dict]:
+    """Records of a trace file in order; a torn last line is skipped."""
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        while True:
+            try:
+                line = f.readline()
+            except EOFError:  # gzip stream cut off mid-member (process killed)
+                return
+            if not line:
+                return
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def create_trace_writer(path: str = TRACE_PATH) -> Optional[TraceWriter]:
+    """The process's trace writer, or None when TRACE_PATH is not set."""
+    if not path:
+        return None
+    writer = TraceWriter(path)
+    atexit.register(writer.close)
+    return writer
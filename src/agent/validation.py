@@ -0,0 +1,26 @@
+from datetime import datetime
+from typing import Optional
+
+
+MALE_WORDS = ["male", "boy", "m", "ወንድ"]
+FEMALE_WORDS = ["female", "girl", "f", "ሴት"]
+
+
+def validate_date(s: str) -> bool:
+    """True if s is a real calendar date in DD/MM/YYYY form."""
+    try:
+        d, m, y = s.strip().split("/")
+        dt = datetime(int(y), int(m), int(d))
+        return dt.year == int(y) and dt.month == int(m) and dt.day == int(d)
+    except Exception:
+        return False
+
+
+def normalize_sex(value) -> Optional[str]:
+    """Map boy/girl/m/f/ወንድ/ሴት... to "Male"/"Female"; None if unclear."""
+    sex_lower = str(value).strip().lower()
+    if sex_lower in MALE_WORDS:
+        return "Male"
+    if sex_lower in FEMALE_WORDS:
+        return "Female"
+    return None
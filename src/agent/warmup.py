@@ -0,0 +1,83 @@
+"""
+Start-up warm-up and readiness.
+
+Heavy dependencies (the LangChain/OpenAI stack, ReportLab) are imported on
+first use so the web server can bind quickly. warm_up() then loads them in
+the background, together with the stores a first turn would open, and
+readiness() reports when that is done so a load balancer (or Spaces) only
+sends traffic to a replica that will answer its first turn at full speed.
+"""
+import threading
+import time
+from typing import Optional
+
+from src.config.settings import PDF_BACKGROUND
+from src.utils.metrics import REGISTRY
+
+
+_state = {"ready": False, "started_at": None, "seconds": {}, "errors": {}}
+_thread: Optional[threading.Thread] = None
+_lock = threading.Lock()
+
+
+def _nlu():
+    from src.agent.nlu import get_parser
+
+    get_parser()  # providers, HTTP pools and per-state tool schemas
+
+
+def _pdf():
+    if PDF_BACKGROUND:
+        from src.utils.render_queue import get_render_queue
+
+        get_render_queue().warm_up()
+    else:
+        import src.utils.pdf_generator  # noqa: F401
+
+
+def _slots():
+    from src.agent.slots import get_slot_inventory
+
+    get_slot_inventory().available(4)
+
+
+STEPS = (("nlu", _nlu), ("pdf", _pdf), ("slots", _slots))
+
+
+def warm_up() -> dict:
+    """
+    Load everything a first turn would otherwise wait for.
+
+    A failing step is recorded and skipped; the replica still becomes ready
+    because each dependency is loaded again on first use anyway.
+
+    Returns:
+        The readiness state (seconds per step, errors)
+    """
+    _state["started_at"] = time.time()
+    for name, step in STEPS:
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            print(f"Warning: warm-up step {name} failed: {e}")
+            _state["errors"][name] = str(e)
+        _state["seconds"][name] = round(time.perf_counter() - started, 3)
+    _state["ready"] = True
+    return readiness()
+
+
+def start_warm_up():
+    """Run warm_up() on a background thread (once per process)."""
+    global _thread
+    with _lock:
+        if _thread is None:
+            _thread = threading.Thread(target=warm_up, name="warm-up", daemon=True)
+            _thread.start()
+
+
+def readiness() -> dict:
+    return {"ready": _state["ready"], "seconds": dict(_state["seconds"]), "errors": dict(_state["errors"])}
+
+
+REGISTRY.gauge("kebele_ready", "1 once start-up warm-up has finished.", lambda: 1 if _state["ready"] else 0)
@@ -0,0 +1,105 @@
+import json
+from typing import Optional
+
+import typer
+
+app = typer.Typer(help="Kebele service agent command line tools.")
+
+
+@app.callback()
+def main():
+    """Run `python -m src.cli COMMAND --help` for command options."""
+
+
+@app.command("batch-certificates")
+def batch_certificates(
+    input_path: str = typer.Argument(..., help="Registrations as .csv (with header) or .jsonl"),
+    output: str = typer.Argument(..., help="Output directory, or a .pdf path with --single-file"),
+    single_file: bool = typer.Option(False, "--single-file", help="Write one multi-page PDF (held in memory until saved, about 6 KB a page)"),
+    workers: Optional[int] = typer.Option(None, help="Render processes (default: all cores)"),
+    chunk_size: int = typer.Option(50, help="Records per worker task"),
+    errors: Optional[str] = typer.Option(None, help="Where to write rejected records (JSONL)"),
+):
+    """Generate birth certificates for an offline backlog of paper registrations."""
+    from src.utils.batch import batch_generate
+
+    summary = batch_generate(input_path, output, single_file=single_file, workers=workers,
+                             chunk_size=chunk_size, errors_path=errors)
+    typer.echo(json.dumps(summary, indent=2))
+
+
+
+@app.command("gc-uploads")
+def gc_uploads(
+    grace: Optional[float] = typer.Option(None, help="Seconds an unsubmitted upload is kept (default: UPLOAD_GC_GRACE)"),
+):
+    """Delete uploads from abandoned sessions that no submitted application uses."""
+    from src.config.settings import SESSION_BACKEND, SESSION_DB_PATH, SESSION_IDLE_TTL, SESSION_MAX, UPLOAD_GC_GRACE
+    from src.utils.file_store import get_upload_store
+
+    # Only the sqlite backend is visible from another process; otherwise the grace period decides
+    live = None
+    if SESSION_BACKEND == "sqlite":
+        from src.agent.sessions import create_session_store
+
+        live = list(create_session_store(SESSION_BACKEND, SESSION_MAX, SESSION_IDLE_TTL, SESSION_DB_PATH))
+    store = get_upload_store()
+    summary = store.collect_garbage(live, UPLOAD_GC_GRACE if grace is None else grace)
+    summary["remaining"] = store.stats()
+    typer.echo(json.dumps(summary, indent=2))
+
+
+@app.command("analytics-report")
+def analytics_report(
+    since: Optional[str] = typer.Option(None, help="First day, YYYY-MM-DD"),
+    until: Optional[str] = typer.Option(None, help="Last day, YYYY-MM-DD"),
+    directory: Optional[str] = typer.Option(None, "--dir", help="Export directory (default: ANALYTICS_DIR)"),
+):
+    """Volumes, service mix, drop-off per state and slot utilisation from the analytics export."""
+    from datetime import date, timedelta
+
+    from src.agent.flows import FLOWS
+    from src.agent.slots import slot_starts
+    from src.config.settings import ANALYTICS_DIR, SLOT_CAPACITY, SLOT_OFFICE_DAYS
+    from src.utils.analytics_query import daily_volume, funnel, load, service_mix, slot_utilisation
+
+    directory = directory or ANALYTICS_DIR
+    apps = load("applications", since, until, directory=directory)
+    transitions = load("transitions", since, until, directory=directory)
+
+    office_days = {int(d) for d in SLOT_OFFICE_DAYS.split(",") if d.strip()}
+    days = sorted(apps["appointment"].dropna().str.slice(0, 10).unique())
+    places = {}
+    if days:
+        day, last = date.fromisoformat(days[0]), date.fromisoformat(days[-1])
+        while day <= last:
+            places[day.isoformat()] = len(slot_starts(day)) * SLOT_CAPACITY if day.weekday() in office_days else 0
+            day += timedelta(days=1)
+
+    def table(frame):
+        return json.loads(frame.to_json(orient="index"))
+
+    report = {
+        "applications": len(apps),
+        "daily_volume": table(daily_volume(apps)),
+        "service_mix": table(service_mix(apps)),
+        "funnels": {flow.service: table(funnel(transitions, [step.state for step in flow.steps]))
+                    for flow in FLOWS},
+        "slot_utilisation": table(slot_utilisation(apps, places)),
+    }
+    typer.echo(json.dumps(report, indent=2))
+
+
+@app.command("analytics-compact")
+def analytics_compact(
+    directory: Optional[str] = typer.Option(None, "--dir", help="Export directory (default: ANALYTICS_DIR)"),
+):
+    """Merge each past day's analytics part files into one file."""
+    from src.config.settings import ANALYTICS_DIR
+    from src.utils.analytics import compact
+
+    typer.echo(json.dumps(compact(directory or ANALYTICS_DIR), indent=2))
+
+
+if __name__ == "__main__":
+    app()
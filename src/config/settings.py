@@ -1,21 +1,118 @@
 import os
-from dotenv import load_dotenv
+from pathlib import Path
+from typing import Optional
 
-# Load .env file if it exists (for local development)
-load_dotenv()
 
-# Get OpenAI API key from environment (works with Hugging Face Spaces secrets)
+def find_env_file(start: str = os.path.dirname(os.path.abspath(__file__))) -> Optional[Path]:
+    """The nearest .env in ``start`` or above it, as load_dotenv() looks for it; None if there is none."""
+    for directory in (Path(start), *Path(start).parents):
+        if (directory / ".env").is_file():
+            return directory / ".env"
+    return None
+
+
+# Load .env file if it exists (for local development). python-dotenv is only
+# imported then: deployments set real environment variables and skip it.
+_env_file = find_env_file()
+if _env_file is not None:
+    from dotenv import load_dotenv
+
+    load_dotenv(_env_file)
+
+# Get OpenAI API key from environment (works with Hugging Face Spaces secrets).
+# Without it the agent still runs on the local/rule-based NLU providers.
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4-turbo")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "") or None  # e.g. a local mock or proxy
+
+# NLU client settings (one shared client per process)
+NLU_POOL_SIZE = int(os.getenv("NLU_POOL_SIZE", "20"))  # max open connections to OpenAI
+NLU_TIMEOUT = float(os.getenv("NLU_TIMEOUT", "10"))  # seconds per request
+NLU_MAX_RETRIES = int(os.getenv("NLU_MAX_RETRIES", "1"))
+
+# NLU providers, tried in order: "openai", "local" (an OpenAI-compatible server
+# such as llama.cpp's server or Ollama) and "rules" (offline, always last)
+NLU_PROVIDERS = os.getenv("NLU_PROVIDERS", "openai,local,rules")
+LOCAL_LLM_BASE_URL = os.getenv("LOCAL_LLM_BASE_URL", "")  # e.g. http://127.0.0.1:8080/v1; "" disables it
+LOCAL_LLM_MODEL = os.getenv("LOCAL_LLM_MODEL", "local")
+LOCAL_LLM_API_KEY = os.getenv("LOCAL_LLM_API_KEY", "not-needed")
+LOCAL_LLM_TIMEOUT = float(os.getenv("LOCAL_LLM_TIMEOUT", "5"))
+NLU_BREAKER_FAILURES = int(os.getenv("NLU_BREAKER_FAILURES", "3"))  # consecutive failures before skipping
+NLU_BREAKER_RESET = float(os.getenv("NLU_BREAKER_RESET", "30"))  # seconds before trying again
+NLU_LATENCY_BUDGET = float(os.getenv("NLU_LATENCY_BUDGET", "4"))  # slower providers go behind faster ones
+
+# NLU dispatcher: one queue for every chat's LLM calls (identical calls are merged)
+NLU_DISPATCH = os.getenv("NLU_DISPATCH", "True") == "True"
+NLU_BATCH_WINDOW_MS = float(os.getenv("NLU_BATCH_WINDOW_MS", "5"))  # gather a burst before dispatching it
+NLU_MAX_IN_FLIGHT = int(os.getenv("NLU_MAX_IN_FLIGHT", str(NLU_POOL_SIZE)))  # concurrent LLM calls
+NLU_RPM = int(os.getenv("NLU_RPM", "0"))  # requests per minute budget; 0 = unlimited
+NLU_TPM = int(os.getenv("NLU_TPM", "0"))  # tokens per minute budget; 0 = unlimited
+NLU_SHORT_MESSAGE = int(os.getenv("NLU_SHORT_MESSAGE", "40"))  # messages up to this length jump the queue
+NLU_MAX_QUEUE_AGE = float(os.getenv("NLU_MAX_QUEUE_AGE", "2"))  # seconds before a long message is promoted too
+
+# NLU result cache (intent-only parses are shared across users)
+NLU_CACHE_SIZE = int(os.getenv("NLU_CACHE_SIZE", "5000"))  # 0 disables the cache
+NLU_CACHE_TTL = float(os.getenv("NLU_CACHE_TTL", "86400"))  # seconds
+NLU_CACHE_PATH = os.getenv("NLU_CACHE_PATH", "")  # e.g. data/nlu_cache.json to persist across restarts
+
+# Session storage: "memory" (single process) or "sqlite" (shared by several workers)
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+SESSION_MAX = int(os.getenv("SESSION_MAX", "10000"))  # memory backend LRU bound
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", str(6 * 3600)))  # seconds
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "data/sessions.db")
+
+# Write-ahead journal of sessions and completed requests (replayed on startup)
+JOURNAL_ENABLED = os.getenv("JOURNAL_ENABLED", "True") == "True"
+JOURNAL_DIR = os.getenv("JOURNAL_DIR", "data/journal")
+JOURNAL_FLUSH_MS = float(os.getenv("JOURNAL_FLUSH_MS", "5"))  # min time between fsyncs; entries in between share one
+JOURNAL_COMPACT_BYTES = int(os.getenv("JOURNAL_COMPACT_BYTES", str(64 * 1024 * 1024)))  # log size that triggers a snapshot
+
+# Reference numbers: numbers are reserved from a shared counter in blocks per process
+REFERENCE_DB_PATH = os.getenv("REFERENCE_DB_PATH", "data/references.db")
+REFERENCE_BLOCK = int(os.getenv("REFERENCE_BLOCK", "100"))
+
+# Columnar export of completed requests and state transitions for reporting (needs pandas + pyarrow)
+ANALYTICS_ENABLED = os.getenv("ANALYTICS_ENABLED", "False") == "True"
+ANALYTICS_DIR = os.getenv("ANALYTICS_DIR", "data/analytics")
+ANALYTICS_FLUSH_ROWS = int(os.getenv("ANALYTICS_FLUSH_ROWS", "5000"))  # buffered rows that trigger a write
+ANALYTICS_FLUSH_SECONDS = float(os.getenv("ANALYTICS_FLUSH_SECONDS", "60"))  # longest a row waits in memory
+
+# Upload storage (content-addressed; see src/utils/file_store.py)
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "data/uploads")
+UPLOAD_GC_GRACE = float(os.getenv("UPLOAD_GC_GRACE", str(SESSION_IDLE_TTL)))  # seconds before unsubmitted uploads can go
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(15 * 1024 * 1024)))  # per file
+UPLOAD_IMAGE_MAX_SIDE = int(os.getenv("UPLOAD_IMAGE_MAX_SIDE", "2000"))  # photos are shrunk to fit this many pixels
+UPLOAD_IMAGE_QUALITY = int(os.getenv("UPLOAD_IMAGE_QUALITY", "80"))  # JPEG quality of shrunk photos
+UPLOAD_REENCODE_BYTES = int(os.getenv("UPLOAD_REENCODE_BYTES", str(1024 * 1024)))  # smaller photos that fit are kept as is
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "4"))  # threads shrinking photos
+
+# ID appointment slots, generated from office hours
+SLOT_DB_PATH = os.getenv("SLOT_DB_PATH", "data/slots.db")
+SLOT_OFFICE_DAYS = os.getenv("SLOT_OFFICE_DAYS", "0,1,2,3,4")  # weekdays, Monday = 0
+SLOT_OFFICE_HOURS = os.getenv("SLOT_OFFICE_HOURS", "08:30-12:30,13:30-17:00")
+SLOT_MINUTES = int(os.getenv("SLOT_MINUTES", "30"))
+SLOT_CAPACITY = int(os.getenv("SLOT_CAPACITY", "4"))  # applicants served per slot
+SLOT_DAYS_AHEAD = int(os.getenv("SLOT_DAYS_AHEAD", "14"))
+SLOT_HOLD_SECONDS = float(os.getenv("SLOT_HOLD_SECONDS", "1800"))  # a chosen slot is freed if not completed by then
+SLOT_CACHE_TTL = float(os.getenv("SLOT_CACHE_TTL", "2"))  # seconds open slots are served from memory
+
+# Certificate PDF rendering
+PDF_BACKGROUND = os.getenv("PDF_BACKGROUND", "True") == "True"  # render on a process pool
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+PDF_QUEUE_MAX = int(os.getenv("PDF_QUEUE_MAX", "100"))  # queued + running jobs
+PDF_MAX_RETRIES = int(os.getenv("PDF_MAX_RETRIES", "2"))
+PDF_SUBMIT_TIMEOUT = float(os.getenv("PDF_SUBMIT_TIMEOUT", "2"))  # seconds to wait for a queue slot
+
+# Observability: JSON line per chat turn ("" = off, "-" = stdout, or a file path)
+METRICS_LOG_PATH = os.getenv("METRICS_LOG_PATH", "")
+TRACE_PATH = os.getenv("TRACE_PATH", "")  # record turns for replay, e.g. data/traces/{pid}.jsonl.gz
+TRACE_REDACT = os.getenv("TRACE_REDACT", "True") == "True"  # mask names, birth dates and notes in traces
 
 # Gradio settings
 GRADIO_SHARE = os.getenv("GRADIO_SHARE", "False") == "True"  # Default False for HF Spaces
 GRADIO_SERVER_NAME = os.getenv("GRADIO_SERVER_NAME", "0.0.0.0")
 GRADIO_SERVER_PORT = int(os.getenv("GRADIO_SERVER_PORT", "7860"))
 
-if not OPENAI_API_KEY:
-    raise ValueError(
-        "OPENAI_API_KEY not set. "
-        "For local: Put it in .env file. "
-        "For Hugging Face Spaces: Add it as a secret in Space settings."
-    )
+# Web server processes: N > 1 runs N app workers behind one port (src/ui/workers.py); 0 = one per CPU core
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", "1"))
+WEB_DRAIN_SECONDS = float(os.getenv("WEB_DRAIN_SECONDS", "30"))  # in-flight requests finish this long on restart/stop
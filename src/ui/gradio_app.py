@@ -1,26 +1,96 @@
+import asyncio
+import json
+
 import gradio as gr
 
 from src.agent.core import agent
+from src.agent.prompts import DEFAULT_LANGUAGE, LANGUAGES
 from src.agent.state import STATES
+from src.agent.warmup import readiness, start_warm_up
 from src.config.settings import GRADIO_SHARE, GRADIO_SERVER_NAME, GRADIO_SERVER_PORT
+from src.utils.metrics import REGISTRY
+
+
+# Fallback id when a handler is called outside a browser request (e.g. scripts)
+DEFAULT_USER_ID = "demo_user"
+
+# Language picker label -> language code
+LANGUAGE_CODES = {name: code for code, name in LANGUAGES.items()}
+
+# Set by SessionHashHeader from the session_hash in the body of a queued call
+SESSION_HEADER = "x-session-hash"
+
+
+def get_user_id(request: gr.Request = None) -> str:
+    """One conversation per browser session."""
+    if request is not None:
+        session_hash = getattr(request, "session_hash", None) or request.headers.get(SESSION_HEADER)
+        if session_hash:
+            return session_hash
+    return DEFAULT_USER_ID
+
 
+class SessionHashHeader:
+    """
+    ASGI middleware copying the session_hash of a JSON POST (/queue/join) into
+    an x-session-hash request header.
 
-USER_ID = "demo_user"
+    gr.Request in Gradio 4.26 has no session_hash, but handlers see the
+    headers of the request that queued them, so get_user_id() reads it there.
+    """
 
+    def __init__(self, app):
+        self.app = app
 
-def ensure_started(language_code: str):
-    if USER_ID not in agent.sessions:
-        return agent.start(USER_ID, language_code)
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        if not headers.get(b"content-type", b"").startswith(b"application/json"):
+            await self.app(scope, receive, send)
+            return
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        body = b"".join(chunks)
+        try:
+            session_hash = json.loads(body).get("session_hash")
+        except (ValueError, AttributeError):
+            session_hash = None
+        header = SESSION_HEADER.encode("latin-1")
+        scope = dict(scope, headers=[(k, v) for k, v in scope["headers"] if k != header])
+        if isinstance(session_hash, str):
+            scope["headers"].append((header, session_hash.encode("latin-1", "replace")))
+        replayed = False
+
+        async def replay():
+            nonlocal replayed
+            if replayed:
+                return await receive()
+            replayed = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        await self.app(scope, replay, send)
+
+
+def ensure_started(user_id: str, language_code: str):
+    if user_id not in agent.sessions:
+        return agent.start(user_id, language_code)
     return None
 
 
-def send(message, history, lang_choice, uploaded_files):
-    language_code = "am" if "አማርኛ" in lang_choice else "en"
+async def send(message, history, lang_choice, uploaded_files, request: gr.Request = None):
+    user_id = get_user_id(request)
+    language_code = LANGUAGE_CODES.get(lang_choice, DEFAULT_LANGUAGE)
 
     if history is None:
         history = []
 
-    ensure_started(language_code)
+    ensure_started(user_id, language_code)
 
     # Convert Gradio file list to list of file paths
     # Gradio Files component returns list of file paths (strings)
@@ -28,36 +98,66 @@ def send(message, history, lang_choice, uploaded_files):
     if uploaded_files:
         files = [str(f) for f in uploaded_files if f]
 
-    # Check current state before processing
-    session = agent.sessions.get(USER_ID, {})
-    state_before = session.get("state")
-    
-    result = agent.process(USER_ID, message, language_code, files=files)
-    
-    # Only append to history if there's a message or response
-    if message or result.get("response"):
-        history.append((message or "(uploaded files)", result["response"]))
+    # Stream the turn: show an acknowledgement (and any fields parsed so far)
+    # while the LLM is working, then replace it with the real reply.
+    label = message or "(uploaded files)"
+    ack = None
+    result = None
+    async for event in agent.process_stream(user_id, message, language_code, files=files):
+        if event["event"] == "result":
+            result = event["result"]
+        elif event["event"] == "ack":
+            ack = event["response"]
+            history.append((label, ack))
+            yield history, "", gr.update(), gr.update()
+        elif event["event"] == "partial" and ack:
+            noted = ", ".join(str(v) for v in event["fields"].values() if v not in (None, "", {}))
+            if noted:
+                history[-1] = (label, f"{ack}\n📝 {noted}")
+                yield history, "", gr.update(), gr.update()
+
+    # Replace the placeholder, or add the reply if the turn never hit the LLM
+    if ack:
+        history[-1] = (label, result["response"])
+    elif message or result.get("response"):
+        history.append((label, result["response"]))
     
     # Get PDF path if available
     pdf_path = result.get("pdf_path")
     
     # Determine if file upload should be visible
-    session_after = agent.sessions.get(USER_ID, {})
+    session_after = agent.sessions.get(user_id, {})
     show_upload = session_after.get("state") == STATES.BIRTH_DOCUMENTS
     
     # Show PDF download if available
     pdf_update = gr.update(value=pdf_path, visible=pdf_path is not None) if pdf_path else gr.update(visible=False)
     
-    return history, "", gr.update(visible=show_upload), pdf_update
+    yield history, "", gr.update(visible=show_upload), pdf_update
 
 
-def quick(choice, history, lang_choice, uploaded_files):
-    return send(choice, history, lang_choice, uploaded_files)
+async def quick(choice, history, lang_choice, uploaded_files, request: gr.Request = None):
+    async for update in send(choice, history, lang_choice, uploaded_files, request):
+        yield update
 
 
-def reset(lang_choice):
-    if USER_ID in agent.sessions:
-        del agent.sessions[USER_ID]
+async def wait_for_pdf(request: gr.Request = None, timeout: float = 60, interval: float = 0.5):
+    """Poll the render queue after a turn and reveal the PDF once it is ready."""
+    user_id = get_user_id(request)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        status = agent.pdf_status(user_id)
+        if status["status"] == "done" and status["pdf_path"]:
+            return gr.update(value=status["pdf_path"], visible=True)
+        if status["status"] != "queued" or loop.time() > deadline:
+            return gr.update()
+        await asyncio.sleep(interval)
+
+
+def reset(lang_choice, request: gr.Request = None):
+    user_id = get_user_id(request)
+    if user_id in agent.sessions:
+        del agent.sessions[user_id]
     return [], "", gr.update(visible=False), gr.update(visible=False)
 
 
@@ -66,7 +166,7 @@ def build_app():
         gr.Markdown("# 🇪🇹 Kebele Service Agent MVP")
         gr.Markdown("Birth Certificate Registration + Digital ID Appointment Booking (Hackathon demo).")
 
-        lang = gr.Radio(["አማርኛ (Amharic)", "English"], value="አማርኛ (Amharic)", label="Language")
+        lang = gr.Radio(list(LANGUAGES.values()), value=LANGUAGES["am"], label="Language")
 
         chatbot = gr.Chatbot(height=480, label="Chat")
         msg = gr.Textbox(placeholder="Type here (or click A/B/C/D)...", label="Message")
@@ -98,33 +198,33 @@ def build_app():
             send, 
             inputs=[msg, chatbot, lang, file_upload], 
             outputs=[chatbot, msg, file_upload, pdf_download]
-        )
+        ).then(wait_for_pdf, outputs=[pdf_download])
         msg.submit(
             send, 
             inputs=[msg, chatbot, lang, file_upload], 
             outputs=[chatbot, msg, file_upload, pdf_download]
-        )
+        ).then(wait_for_pdf, outputs=[pdf_download])
 
         a.click(
             quick, 
             inputs=[gr.State("A"), chatbot, lang, file_upload], 
             outputs=[chatbot, msg, file_upload, pdf_download]
-        )
+        ).then(wait_for_pdf, outputs=[pdf_download])
         b.click(
             quick, 
             inputs=[gr.State("B"), chatbot, lang, file_upload], 
             outputs=[chatbot, msg, file_upload, pdf_download]
-        )
+        ).then(wait_for_pdf, outputs=[pdf_download])
         c.click(
             quick, 
             inputs=[gr.State("C"), chatbot, lang, file_upload], 
             outputs=[chatbot, msg, file_upload, pdf_download]
-        )
+        ).then(wait_for_pdf, outputs=[pdf_download])
         d.click(
             quick, 
             inputs=[gr.State("D"), chatbot, lang, file_upload], 
             outputs=[chatbot, msg, file_upload, pdf_download]
-        )
+        ).then(wait_for_pdf, outputs=[pdf_download])
 
         btn_reset.click(
             reset, 
@@ -135,10 +235,44 @@ def build_app():
         return demo
 
 
+def create_app():
+    """
+    FastAPI app serving the Gradio UI at /, Prometheus metrics at /metrics and
+    readiness at /ready (503 until the background warm-up has finished).
+    """
+    from fastapi import FastAPI
+    from fastapi.responses import JSONResponse, PlainTextResponse
+
+    app = FastAPI()
+    start_warm_up()
+    # On SIGTERM uvicorn finishes open requests, then this runs (see src/ui/workers.py)
+    app.add_event_handler("shutdown", agent.close)
+
+    @app.get("/metrics")
+    def metrics():
+        return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+    @app.get("/ready")
+    def ready():
+        state = readiness()
+        return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
+    app = gr.mount_gradio_app(app, build_app(), path="/")
+    app.add_middleware(SessionHashHeader)
+    return app
+
+
 def launch():
-    demo = build_app()
+    if GRADIO_SHARE:
+        # Share links need Gradio's own server; /metrics and /ready are not available there
+        start_warm_up()
+        demo = build_app()
+        demo.launch(share=GRADIO_SHARE, server_name=GRADIO_SERVER_NAME, server_port=GRADIO_SERVER_PORT)
+        return
+    import uvicorn
+
     # server_name="0.0.0.0" makes it reachable on your LAN; server_port controls the port. [web:27]
-    demo.launch(share=GRADIO_SHARE, server_name=GRADIO_SERVER_NAME, server_port=GRADIO_SERVER_PORT)
+    uvicorn.run(create_app(), host=GRADIO_SERVER_NAME, port=GRADIO_SERVER_PORT)
 
 
 if __name__ == "__main__":
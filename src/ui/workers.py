@@ -0,0 +1,576 @@
+"""
+Multi-process serving: WEB_WORKERS app processes behind one port.
+
+Gradio keeps a browser session's queue, event stream and upload progress in
+the memory of the process serving it, so pre-forked uvicorn workers sharing
+a socket would hand a session's requests to processes that never saw it.
+serve() instead starts the app processes on Unix sockets and runs a small
+proxy on GRADIO_SERVER_PORT that keeps each session on one of them:
+
+- requests carrying a Gradio session_hash (query, JSON body or
+  /heartbeat/<hash>), an upload_id or a known event_id go to the worker the
+  key hashes to, or to the one holding the session's queued events until
+  their stream has been read;
+- everything else (page, assets, /file=) is spread round-robin; uploaded and
+  generated files live in the shared GRADIO_TEMP_DIR, so any worker serves them.
+
+Conversations do not depend on that affinity: workers use the SQLite
+session store, and reference numbers, completed requests and appointment
+slots are shared SQLite databases, so a session whose worker is draining or
+has crashed carries on at the next one.
+
+    kill -HUP <pid>   rolling restart: one worker at a time stops taking new
+                      requests, finishes the ones in flight (up to
+                      WEB_DRAIN_SECONDS), is replaced and answers again
+                      before the next one goes
+    kill <pid>        stop accepting, drain, stop the workers
+
+A worker that exits on its own is restarted. /metrics merges the workers'
+metrics under a worker="<i>" label, and /ready is 200 once every worker has
+warmed up.
+"""
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+
+import httpx
+
+from src.config.settings import (
+    GRADIO_SERVER_NAME,
+    GRADIO_SERVER_PORT,
+    GRADIO_SHARE,
+    JOURNAL_DIR,
+    TRACE_PATH,
+    WEB_DRAIN_SECONDS,
+    WEB_WORKERS,
+)
+from src.utils.metrics import LATENCY_BUCKETS, Registry
+
+
+# The proxy's own metrics; worker metrics are scraped and merged into /metrics
+FRONT = Registry()
+FRONT_REQUESTS = FRONT.counter("kebele_front_requests_total", "Requests proxied, by worker and routing.")
+FRONT_ERRORS = FRONT.counter("kebele_front_errors_total", "Requests that could not reach a worker.")
+FRONT_SECONDS = FRONT.histogram("kebele_front_seconds", "Time until a worker's response headers.", LATENCY_BUCKETS)
+WORKER_RESTARTS = FRONT.counter("kebele_worker_restarts_total", "Worker processes replaced, by reason.")
+
+HOP_BY_HOP = {b"connection", b"keep-alive", b"proxy-authenticate", b"proxy-authorization", b"te", b"trailers",
+              b"transfer-encoding", b"upgrade"}
+START_TIMEOUT = 120  # seconds for a worker to answer on its socket
+EVENTS_MAX = 10000  # event_id -> worker (and session -> worker) entries kept
+
+
+class Worker:
+    """One app process, listening on a Unix socket."""
+
+    def __init__(self, index: int, socket_path: str):
+        self.index = index
+        self.name = str(index)
+        self.socket = socket_path
+        self.proc: Optional[subprocess.Popen] = None
+        self.client: Optional[httpx.AsyncClient] = None
+        self.up = False  # answering on its socket
+        self.draining = False  # finishing in-flight requests, gets no new ones
+        self.restarting = False
+        self.active = 0  # requests in flight through the proxy
+        self.started_at = 0.0
+        self.failures = 0  # exits soon after starting, for backoff
+
+    @property
+    def serving(self) -> bool:
+        return self.up and not self.draining
+
+
+def worker_env(index: int, count: int) -> dict:
+    """
+    Environment of one worker process.
+
+    Sessions go to the shared SQLite store unless SESSION_BACKEND is set, each
+    worker journals to its own directory, the render pool is split between
+    workers unless PDF_WORKERS is set, and a TRACE_PATH without {pid} gets a
+    per-worker file name.
+    """
+    env = dict(os.environ)
+    env.setdefault("SESSION_BACKEND", "sqlite")
+    env["JOURNAL_DIR"] = str(Path(JOURNAL_DIR) / f"worker-{index}")
+    env.setdefault("PDF_WORKERS", str(max(1, ((os.cpu_count() or 2) - count) // count)))
+    if TRACE_PATH and "{pid}" not in TRACE_PATH:
+        trace = Path(TRACE_PATH)
+        env["TRACE_PATH"] = str(trace.with_name(f"worker-{index}-{trace.name}"))
+    root = str(Path(__file__).resolve().parent.parent.parent)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (root, env.get("PYTHONPATH")) if p)
+    return env
+
+
+def session_key(scope: dict, body: Optional[bytes] = None) -> Optional[str]:
+    """The Gradio session (or upload) a request belongs to, or None."""
+    path = scope["path"]
+    if path.startswith("/heartbeat/"):
+        return path[len("/heartbeat/"):]
+    if path.startswith("/stream/"):
+        return path.split("/")[2]
+    if scope["query_string"]:
+        query = parse_qs(scope["query_string"].decode("latin-1"))
+        for name in ("session_hash", "upload_id"):
+            if query.get(name):
+                return query[name][0]
+    if body:
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return None
+        if isinstance(data, dict) and isinstance(data.get("session_hash"), str):
+            return data["session_hash"]
+    return None
+
+
+def event_key(scope: dict, body: Optional[bytes] = None) -> Optional[str]:
+    """The event a /call/<api>/<event_id> poll or a /reset refers to."""
+    parts = scope["path"].strip("/").split("/")
+    if parts[0] == "call" and len(parts) == 3 and scope["method"] == "GET":
+        return parts[2]
+    if parts[0] == "reset" and body:
+        try:
+            return json.loads(body).get("event_id")
+        except (ValueError, AttributeError):
+            return None
+    return None
+
+
+def merge_metrics(scrapes: List[tuple]) -> str:
+    """
+    Merge Prometheus text from several workers into one exposition.
+
+    Args:
+        scrapes: (worker name, metrics text) pairs
+
+    Returns:
+        Each metric family once, its samples from every worker labelled worker="<name>"
+    """
+    families: Dict[str, tuple] = {}  # name -> (HELP/TYPE lines, samples)
+    for worker, text in scrapes:
+        family = None
+        for line in text.splitlines():
+            if not line:
+                continue
+            if line.startswith("#"):
+                parts = line.split(" ", 3)
+                if len(parts) >= 3 and parts[1] in ("HELP", "TYPE"):
+                    family = families.setdefault(parts[2], ([], []))
+                    if line not in family[0]:
+                        family[0].append(line)
+                continue
+            name, brace, rest = line.partition("{")
+            if brace:
+                sample = f'{name}{{worker="{worker}",{rest}'
+            else:
+                name, _, value = line.partition(" ")
+                sample = f'{name}{{worker="{worker}"}} {value}'
+            (family or families.setdefault(name, ([], [])))[1].append(sample)
+    lines = []
+    for header, samples in families.values():
+        lines.extend(header)
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
+
+
+class Front:
+    """
+    ASGI app in the main process: supervises the workers and proxies to them.
+    """
+
+    def __init__(self, count: int, socket_dir: Optional[str] = None):
+        self.socket_dir = socket_dir or tempfile.mkdtemp(prefix="kebele-web-")
+        self.workers = [Worker(i, os.path.join(self.socket_dir, f"worker-{i}.sock")) for i in range(count)]
+        self._round_robin = 0
+        self._pinned: "OrderedDict[str, Worker]" = OrderedDict()  # session -> worker holding its queued events
+        self._events: "OrderedDict[str, Worker]" = OrderedDict()
+        self._monitor: Optional[asyncio.Task] = None
+        self._rolling: Optional[asyncio.Task] = None
+        FRONT.gauge("kebele_front_active", "Requests in flight per worker.",
+                    lambda: {(("worker", w.name),): w.active for w in self.workers})
+        FRONT.gauge("kebele_worker_up", "1 while a worker takes new requests.",
+                    lambda: {(("worker", w.name),): int(w.serving) for w in self.workers})
+
+    # ---- Worker processes
+
+    async def _start(self, worker: Worker):
+        """Spawn a worker and wait until it answers on its socket."""
+        if os.path.exists(worker.socket):
+            os.unlink(worker.socket)
+        if worker.client is not None:
+            await worker.client.aclose()
+        worker.client = httpx.AsyncClient(
+            transport=httpx.AsyncHTTPTransport(uds=worker.socket),
+            base_url="http://worker",
+            timeout=httpx.Timeout(None, connect=5),  # event streams stay open for as long as a turn runs
+        )
+        worker.proc = subprocess.Popen([sys.executable, "-m", "src.ui.workers", worker.socket],
+                                       env=worker_env(worker.index, len(self.workers)))
+        worker.started_at = time.monotonic()
+        deadline = worker.started_at + START_TIMEOUT
+        while time.monotonic() < deadline:
+            if worker.proc.poll() is not None:
+                raise RuntimeError(f"web worker {worker.index} exited with {worker.proc.returncode} on start")
+            if os.path.exists(worker.socket):
+                try:
+                    await worker.client.get("/ready")
+                except httpx.TransportError:
+                    pass
+                else:
+                    worker.up = True
+                    return
+            await asyncio.sleep(0.2)
+        raise RuntimeError(f"web worker {worker.index} did not start in {START_TIMEOUT}s")
+
+    async def _stop(self, worker: Worker):
+        """SIGTERM a worker (uvicorn finishes its requests first) and wait for it to exit."""
+        worker.up = False
+        proc = worker.proc
+        if proc is None or proc.poll() is not None:
+            return
+        proc.terminate()
+        try:
+            await asyncio.to_thread(proc.wait, WEB_DRAIN_SECONDS + 10)
+        except subprocess.TimeoutExpired:
+            print(f"Warning: web worker {worker.index} did not stop in time; killing it")
+            proc.kill()
+            await asyncio.to_thread(proc.wait)
+
+    async def _drain(self, worker: Worker):
+        """
+        Stop routing new sessions to a worker and wait (up to WEB_DRAIN_SECONDS)
+        until its requests are done and its sessions' queued events were read.
+        """
+        worker.draining = True
+        deadline = time.monotonic() + WEB_DRAIN_SECONDS
+        while (worker.active or worker in self._pinned.values()) and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+
+    async def _replace(self, worker: Worker, reason: str, delay: float = 0):
+        worker.restarting = True
+        try:
+            await asyncio.sleep(delay)
+            if reason == "rolling":
+                await self._drain(worker)
+            await self._stop(worker)
+            await self._start(worker)
+            WORKER_RESTARTS.inc(reason=reason)
+        except RuntimeError as e:
+            print(f"Warning: {e}")  # still down; _watch tries again
+        finally:
+            worker.draining = False
+            worker.restarting = False
+
+    async def _watch(self):
+        """Restart workers that exit on their own, backing off if one keeps failing at start."""
+        while True:
+            await asyncio.sleep(1)
+            for worker in self.workers:
+                if worker.restarting or worker.proc is None or worker.proc.poll() is None:
+                    continue
+                worker.up = False
+                worker.failures = worker.failures + 1 if time.monotonic() - worker.started_at < 10 else 0
+                delay = min(60, 2 ** worker.failures) if worker.failures else 0
+                print(f"Warning: web worker {worker.index} exited with {worker.proc.returncode}; "
+                      f"restarting in {delay}s")
+                worker.restarting = True
+                asyncio.ensure_future(self._replace(worker, "exit", delay))
+
+    def rolling_restart(self):
+        """Replace every worker in turn (SIGHUP); ignored while one is already running."""
+        if self._rolling is not None and not self._rolling.done():
+            return
+
+        async def roll():
+            print(f"Rolling restart of {len(self.workers)} web workers")
+            for worker in self.workers:
+                await self._replace(worker, "rolling")
+            print("Rolling restart done")
+
+        self._rolling = asyncio.ensure_future(roll())
+
+    async def startup(self):
+        await asyncio.gather(*(self._start(worker) for worker in self.workers))
+        self._monitor = asyncio.ensure_future(self._watch())
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, self.rolling_restart)
+
+    async def shutdown(self):
+        asyncio.get_running_loop().remove_signal_handler(signal.SIGHUP)
+        for task in (self._monitor, self._rolling):
+            if task is not None:
+                task.cancel()
+        # The proxy has drained already; the workers finish what they still run
+        await asyncio.gather(*(self._stop(worker) for worker in self.workers))
+        for worker in self.workers:
+            if worker.client is not None:
+                await worker.client.aclose()
+        for worker in self.workers:
+            if os.path.exists(worker.socket):
+                os.unlink(worker.socket)
+        try:
+            os.rmdir(self.socket_dir)
+        except OSError:
+            pass
+
+    # ---- Routing
+
+    def pick(self, key: Optional[str]) -> Optional[Worker]:
+        """
+        The worker for a session key (None: round-robin).
+
+        A session that joined the queue stays on that worker, even a draining
+        one, until its event stream has been read, so its events arrive where
+        it listens; otherwise a key maps to a fixed worker, or the next one
+        taking requests.
+        """
+        if key is not None:
+            pinned = self._pinned.get(key)
+            if pinned is not None and pinned.up:
+                return pinned
+            start = zlib.crc32(key.encode("utf-8")) % len(self.workers)
+            for step in range(len(self.workers)):
+                worker = self.workers[(start + step) % len(self.workers)]
+                if worker.serving:
+                    return worker
+            return None
+        serving = [worker for worker in self.workers if worker.serving]
+        if not serving:
+            return None
+        self._round_robin = (self._round_robin + 1) % len(serving)
+        return serving[self._round_robin]
+
+    def _pin(self, session: str, worker: Worker):
+        self._pinned[session] = worker
+        self._pinned.move_to_end(session)
+        if len(self._pinned) > EVENTS_MAX:
+            self._pinned.popitem(last=False)
+
+    def _remember_event(self, body: bytes, worker: Worker):
+        try:
+            event_id = json.loads(body).get("event_id")
+        except (ValueError, AttributeError):
+            return
+        if event_id:
+            self._events[event_id] = worker
+            if len(self._events) > EVENTS_MAX:
+                self._events.popitem(last=False)
+
+    # ---- ASGI
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            if scope["path"] == "/metrics":
+                await self._metrics(send)
+            elif scope["path"] == "/ready":
+                await self._ready(send)
+            else:
+                await self._proxy(scope, receive, send)
+        else:
+            await send({"type": "websocket.close", "code": 1003})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self.startup()
+                except Exception as e:
+                    await self.shutdown()
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _respond(self, send, status: int, body: bytes, content_type: bytes):
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", content_type), (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+    async def _metrics(self, send):
+        async def scrape(worker: Worker):
+            try:
+                return worker.name, (await worker.client.get("/metrics", timeout=5)).text
+            except httpx.HTTPError:
+                return worker.name, ""
+
+        scrapes = await asyncio.gather(*(scrape(worker) for worker in self.workers if worker.up))
+        body = merge_metrics(scrapes) + FRONT.render()
+        await self._respond(send, 200, body.encode("utf-8"), b"text/plain; version=0.0.4")
+
+    async def _ready(self, send):
+        async def state(worker: Worker):
+            ready = False
+            if worker.up:
+                try:
+                    ready = (await worker.client.get("/ready", timeout=5)).status_code == 200
+                except httpx.HTTPError:
+                    pass
+            return {"worker": worker.index, "up": worker.up, "draining": worker.draining, "ready": ready}
+
+        workers = await asyncio.gather(*(state(worker) for worker in self.workers))
+        ready = all(w["ready"] for w in workers)
+        body = json.dumps({"ready": ready, "workers": workers}).encode("utf-8")
+        await self._respond(send, 200 if ready else 503, body, b"application/json")
+
+    async def _proxy(self, scope, receive, send):
+        headers = [(k, v) for k, v in scope["headers"] if k not in HOP_BY_HOP and k != b"x-forwarded-for"]
+        forwarded = [v for k, v in scope["headers"] if k == b"x-forwarded-for"]
+        if scope.get("client"):
+            forwarded.append(scope["client"][0].encode("latin-1"))
+        headers.append((b"x-forwarded-for", b", ".join(forwarded)))
+        headers.append((b"x-forwarded-proto", scope["scheme"].encode("latin-1")))
+
+        # JSON bodies are small and may name the session; anything else (uploads) streams through
+        content_type = next((v for k, v in scope["headers"] if k == b"content-type"), b"")
+        body = None
+        if scope["method"] == "POST" and content_type.startswith(b"application/json"):
+            chunks = []
+            while True:
+                message = await receive()
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body"):
+                    break
+            body = b"".join(chunks)
+
+        key = session_key(scope, body)
+        event = event_key(scope, body)
+        worker = self._events.get(event) if event else None
+        if worker is not None and worker.up:
+            routing = "event"
+        else:
+            worker = self.pick(key)
+            routing = "session" if key else "round_robin"
+        if worker is None:
+            FRONT_ERRORS.inc(reason="no_worker")
+            await self._respond(send, 503, b"no worker available", b"text/plain")
+            return
+        FRONT_REQUESTS.inc(worker=worker.name, routing=routing)
+
+        async def stream_body():
+            while True:
+                message = await receive()
+                yield message.get("body", b"")
+                if not message.get("more_body"):
+                    return
+
+        path = scope.get("raw_path") or scope["path"].encode("utf-8")
+        if scope["query_string"]:
+            path += b"?" + scope["query_string"]
+        request = worker.client.build_request(
+            scope["method"], path.decode("latin-1"), headers=headers,
+            content=body if body is not None else (stream_body() if scope["method"] not in ("GET", "HEAD") else None),
+        )
+        streaming = key if scope["path"] == "/queue/data" else None
+        if key and scope["path"] in ("/queue/join", "/queue/data"):
+            self._pin(key, worker)
+        worker.active += 1
+        started = time.perf_counter()
+        try:
+            try:
+                response = await worker.client.send(request, stream=True)
+            except httpx.TransportError as e:
+                FRONT_ERRORS.inc(reason="connect")
+                print(f"Warning: web worker {worker.index} unreachable: {e}")
+                await self._respond(send, 502, b"worker unavailable", b"text/plain")
+                return
+            FRONT_SECONDS.observe(time.perf_counter() - started)
+            try:
+                await self._relay(scope, receive, send, response, worker)
+            finally:
+                await response.aclose()
+        finally:
+            worker.active -= 1
+            if streaming and self._pinned.get(streaming) is worker:
+                del self._pinned[streaming]
+
+    async def _relay(self, scope, receive, send, response: httpx.Response, worker: Worker):
+        """Pass a worker's response through as it arrives; stop if the client goes away."""
+        headers = [(k.lower(), v) for k, v in response.headers.raw if k.lower() not in HOP_BY_HOP]
+        parts = scope["path"].strip("/").split("/")
+        if scope["method"] == "POST" and parts[0] in ("queue", "call"):
+            # {"event_id": ...}: remembered so /call polls and /reset find the worker holding the event
+            body = await response.aread()
+            self._remember_event(body, worker)
+            await send({"type": "http.response.start", "status": response.status_code, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        async def disconnected():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+
+        gone = asyncio.ensure_future(disconnected())
+        try:
+            await send({"type": "http.response.start", "status": response.status_code, "headers": headers})
+            try:
+                async for chunk in response.aiter_raw():
+                    if gone.done():
+                        return
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            except httpx.TransportError as e:
+                # The worker went away mid-response (crash or drain timeout); end what was sent
+                print(f"Warning: response from web worker {worker.index} cut off: {e}")
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            gone.cancel()
+
+
+def serve(workers: int = WEB_WORKERS):
+    """
+    Run `workers` app processes behind the proxy on GRADIO_SERVER_PORT (0: one per CPU core).
+    """
+    import uvicorn
+
+    if GRADIO_SHARE:
+        print("Warning: GRADIO_SHARE needs Gradio's own server; running a single process")
+        from src.ui.gradio_app import launch
+
+        launch()
+        return
+    count = workers or os.cpu_count() or 1
+    if os.getenv("SESSION_BACKEND", "sqlite") == "memory":
+        print("Warning: SESSION_BACKEND=memory with several web workers: a conversation is lost "
+              "when its worker restarts")
+    uvicorn.run(Front(count), host=GRADIO_SERVER_NAME, port=GRADIO_SERVER_PORT, lifespan="on",
+                timeout_graceful_shutdown=WEB_DRAIN_SECONDS)
+
+
+def _exit_with_parent(parent: int):
+    """SIGTERM this worker (a graceful stop) once the proxy process is gone, e.g. after a forced exit."""
+    while os.getppid() == parent:
+        time.sleep(1)
+    os.kill(os.getpid(), signal.SIGTERM)
+
+
+def run_worker(socket_path: str):
+    """One app process: the usual FastAPI/Gradio app on a Unix socket, trusting the proxy's headers."""
+    import threading
+
+    import uvicorn
+    from src.ui.gradio_app import create_app
+
+    # SIGHUP is the proxy's (rolling restart); a hangup of the terminal must not take workers down with it
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    threading.Thread(target=_exit_with_parent, args=(os.getppid(),), name="parent-watch", daemon=True).start()
+    uvicorn.run(create_app(), uds=socket_path, proxy_headers=True, forwarded_allow_ips="*",
+                timeout_graceful_shutdown=WEB_DRAIN_SECONDS, log_level="warning")
+
+
+if __name__ == "__main__":
+    run_worker(sys.argv[1])
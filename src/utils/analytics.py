@@ -0,0 +1,268 @@
+"""
+Columnar export of completed requests and state transitions for reporting.
+
+The agent hands each completed request and each state change to the
+exporter, which only appends a tuple to an in-memory buffer. A background
+thread writes the buffer every ANALYTICS_FLUSH_SECONDS (or
+ANALYTICS_FLUSH_ROWS rows) as Parquet, partitioned by day:
+
+    <ANALYTICS_DIR>/applications/day=2026-10-18/part-<ms>-<pid>-<n>.parquet
+    <ANALYTICS_DIR>/transitions/day=2026-10-18/part-<ms>-<pid>-<n>.parquet
+
+so reports read column files with pandas (src/utils/analytics_query.py)
+and never touch the running app. File names carry the process id, so
+several workers can share one directory. Past days are merged into one
+file each by `python -m src.cli analytics-compact`.
+
+Rows hold no names: users are a 64-bit hash of the session id and only the
+fields reports group by are kept. The journal stays the record of what was
+submitted; if a write fails the batch is dropped with a warning.
+"""
+import atexit
+import hashlib
+import itertools
+import os
+import threading
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from src.config.settings import (
+    ANALYTICS_ENABLED,
+    ANALYTICS_DIR,
+    ANALYTICS_FLUSH_ROWS,
+    ANALYTICS_FLUSH_SECONDS,
+)
+from src.utils.metrics import LATENCY_BUCKETS, REGISTRY
+
+
+ANALYTICS_ROWS = REGISTRY.counter("kebele_analytics_rows_total", "Rows written to the analytics export.")
+ANALYTICS_DROPPED = REGISTRY.counter("kebele_analytics_dropped_total", "Analytics rows lost to failed writes.")
+ANALYTICS_WRITE_SECONDS = REGISTRY.histogram("kebele_analytics_write_seconds", "Time to write one analytics batch.",
+                                             LATENCY_BUCKETS)
+
+# table -> ((column, type), ...); "day" is the partition and not stored in the files
+TABLES = {
+    "applications": (
+        ("ts", "timestamp"),
+        ("service", "string"),
+        ("reference", "string"),
+        ("language", "string"),
+        ("sex", "string"),
+        ("birth_year", "int16"),
+        ("print_option", "string"),
+        ("documents", "int16"),
+        ("applicant_age", "int16"),
+        ("has_previous_id", "bool"),
+        ("appointment", "string"),  # slot start, "YYYY-MM-DD HH:MM"
+    ),
+    "transitions": (
+        ("ts", "timestamp"),
+        ("user", "int64"),
+        ("service", "string"),
+        ("from_state", "string"),
+        ("to_state", "string"),
+        ("language", "string"),
+    ),
+}
+
+
+def arrow_schema(table: str):
+    import pyarrow as pa
+
+    types = {"timestamp": pa.timestamp("ms"), "string": pa.string(), "int16": pa.int16(),
+             "int64": pa.int64(), "bool": pa.bool_()}
+    return pa.schema([(name, types[kind]) for name, kind in TABLES[table]])
+
+
+def user_key(user_id: str) -> int:
+    """Stable 64-bit id for a user, so funnels can count people without storing session ids."""
+    return int.from_bytes(hashlib.blake2b(user_id.encode("utf-8"), digest_size=8).digest(), "big", signed=True)
+
+
+def _int(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _birth_year(dob) -> Optional[int]:
+    """Year from a DD/MM/YYYY date."""
+    return _int(str(dob).rpartition("/")[2]) if dob else None
+
+
+def application_row(service: str, data: dict, language: Optional[str], ts: Optional[float] = None) -> tuple:
+    """One completed request as an "applications" row."""
+    appointment = None
+    if data.get("appointment_date"):
+        appointment = f"{data['appointment_date']} {data.get('appointment_time', '')}".strip()
+    return (
+        ts or time.time(),
+        service,
+        data.get("reference_number"),
+        language,
+        data.get("sex"),
+        _birth_year(data.get("date_of_birth")),
+        data.get("print_option"),
+        len(data.get("uploaded_files") or ()),
+        _int(data.get("age")),
+        data.get("has_previous_id"),
+        appointment,
+    )
+
+
+class AnalyticsExporter:
+    def __init__(self, directory: str = ANALYTICS_DIR, flush_rows: int = ANALYTICS_FLUSH_ROWS,
+                 flush_seconds: float = ANALYTICS_FLUSH_SECONDS):
+        self.dir = Path(directory).absolute()
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self._cond = threading.Condition()
+        self._buffers: Dict[str, list] = {table: [] for table in TABLES}
+        self._buffered = 0
+        self._closed = False
+        self._parts = itertools.count(1)
+        self._writer = threading.Thread(target=self._write_loop, name="analytics-writer", daemon=True)
+        self._writer.start()
+
+    # ---- Recording (called on the turn path; only appends)
+
+    def _append(self, table: str, row: tuple):
+        with self._cond:
+            if self._closed:
+                return
+            self._buffers[table].append(row)
+            self._buffered += 1
+            if self._buffered >= self.flush_rows:
+                self._cond.notify()
+
+    def application(self, service: str, data: dict, language: Optional[str] = None):
+        """Record a completed request."""
+        self._append("applications", application_row(service, data, language))
+
+    def transition(self, user_id: str, service: Optional[str], from_state: str, to_state: str,
+                   language: Optional[str] = None):
+        """Record a conversation moving from one state to another."""
+        self._append("transitions", (time.time(), user_key(user_id), service, from_state, to_state, language))
+
+    # ---- Writing
+
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                if not self._closed and self._buffered < self.flush_rows:
+                    self._cond.wait(self.flush_seconds)
+                closed = self._closed
+            self.flush()
+            if closed:
+                return
+
+    def flush(self) -> int:
+        """Write everything buffered so far; returns the number of rows written."""
+        with self._cond:
+            batches = {table: rows for table, rows in self._buffers.items() if rows}
+            self._buffers = {table: [] for table in TABLES}
+            self._buffered = 0
+        written = 0
+        for table, rows in batches.items():
+            started = time.perf_counter()
+            try:
+                written += self._write(table, rows)
+            except Exception as e:
+                print(f"Warning: analytics export of {len(rows)} {table} rows failed: {e}")
+                ANALYTICS_DROPPED.inc(len(rows), table=table)
+                continue
+            ANALYTICS_WRITE_SECONDS.observe(time.perf_counter() - started)
+            ANALYTICS_ROWS.inc(len(rows), table=table)
+        return written
+
+    def _write(self, table: str, rows: List[tuple]) -> int:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = arrow_schema(table)
+        by_day: Dict[str, list] = {}
+        for row in rows:
+            by_day.setdefault(time.strftime("%Y-%m-%d", time.localtime(row[0])), []).append(row)
+        for day, day_rows in by_day.items():
+            columns = list(zip(*day_rows))
+            columns[0] = [int(ts * 1000) for ts in columns[0]]
+            data = pa.Table.from_arrays([pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                                        schema=schema)
+            name = f"part-{time.time_ns() // 1000000}-{os.getpid()}-{next(self._parts)}"
+            write_part(pq, data, self.dir / table / f"day={day}", name)
+        return len(rows)
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._writer.join()
+
+
+def write_part(pq, data, directory: Path, name: str):
+    """Write a Parquet file so readers never see it half-written (they skip names starting with ".")."""
+    directory.mkdir(parents=True, exist_ok=True)
+    tmp = directory / f".{name}.tmp"
+    pq.write_table(data, tmp, compression="zstd")
+    os.replace(tmp, directory / f"{name}.parquet")
+
+
+def compact(directory: str = ANALYTICS_DIR, before: Optional[date] = None) -> dict:
+    """
+    Merge each past day's part files into one, for faster reads.
+
+    Args:
+        directory: The export directory
+        before: Only days before this one (default today, which is still being written)
+
+    Returns:
+        {table: number of days merged}
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    cutoff = (before or date.today()).isoformat()
+    merged = {}
+    for table in TABLES:
+        merged[table] = 0
+        for day_dir in sorted((Path(directory) / table).glob("day=*")):
+            if day_dir.name[len("day="):] >= cutoff:
+                continue
+            parts = sorted(day_dir.glob("part-*.parquet"))
+            if len(parts) < 2:
+                continue
+            schema = arrow_schema(table)
+            data = pa.concat_tables([pq.ParquetFile(part).read().cast(schema) for part in parts])
+            write_part(pq, data.sort_by("ts"), day_dir, f"part-merged-{datetime.now():%Y%m%d%H%M%S}")
+            for part in parts:
+                part.unlink()
+            merged[table] += 1
+    return merged
+
+
+_exporter: Optional[AnalyticsExporter] = None
+_exporter_lock = threading.Lock()
+_exporter_checked = False
+
+
+def get_analytics() -> Optional[AnalyticsExporter]:
+    """Return the shared exporter, or None if ANALYTICS_ENABLED is off or pyarrow is missing."""
+    global _exporter, _exporter_checked
+    if not _exporter_checked:
+        with _exporter_lock:
+            if not _exporter_checked:
+                if ANALYTICS_ENABLED:
+                    try:
+                        import pyarrow  # noqa: F401
+                    except ImportError:
+                        print("Warning: ANALYTICS_ENABLED is set but pyarrow is not installed; export is off")
+                    else:
+                        _exporter = AnalyticsExporter()
+                        atexit.register(_exporter.close)
+                _exporter_checked = True
+    return _exporter
@@ -0,0 +1,126 @@
+"""
+Reports over the analytics export (see src/utils/analytics.py).
+
+load() reads only the day partitions and columns a report needs; the
+aggregates are pandas group-bys over whole columns, so a month of traffic
+is a few vectorized passes rather than a loop over records.
+
+    apps = load("applications", since="2026-10-01")
+    daily_volume(apps)
+    funnel(load("transitions", since="2026-10-01"), [step.state for step in BIRTH_FLOW.steps])
+"""
+import time
+from typing import Mapping, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from src.config.settings import ANALYTICS_DIR, SESSION_IDLE_TTL
+from src.utils.analytics import TABLES
+
+
+def load(table: str, since: Optional[str] = None, until: Optional[str] = None,
+         columns: Optional[Sequence[str]] = None, directory: str = ANALYTICS_DIR) -> pd.DataFrame:
+    """
+    Read one exported table.
+
+    Args:
+        table: "applications" or "transitions"
+        since: First day to include, "YYYY-MM-DD"
+        until: Last day to include, "YYYY-MM-DD"
+        columns: Columns to read (default all); "day" is always included
+        directory: The export directory
+
+    Returns:
+        DataFrame with a "day" column (string) and the table's columns;
+        empty, with those columns, if nothing was exported yet
+    """
+    names = list(columns or [name for name, _ in TABLES[table]])
+    filters = [("day", ">=", since)] if since else []
+    if until:
+        filters.append(("day", "<=", until))
+    try:
+        frame = pd.read_parquet(f"{directory}/{table}", columns=names + ["day"], filters=filters or None)
+    except (FileNotFoundError, ValueError):
+        return pd.DataFrame(columns=names + ["day"])
+    frame["day"] = frame["day"].astype(str)
+    return frame
+
+
+def daily_volume(apps: pd.DataFrame) -> pd.DataFrame:
+    """Completed requests per day (rows) and service (columns), with a "total" column."""
+    volume = pd.crosstab(apps["day"], apps["service"])
+    volume["total"] = volume.sum(axis=1)
+    return volume
+
+
+def service_mix(apps: pd.DataFrame) -> pd.DataFrame:
+    """Completed requests per service: count, share, and a count column per language."""
+    by_language = pd.crosstab(apps["service"], apps["language"].fillna("unknown"))
+    mix = pd.DataFrame({"requests": by_language.sum(axis=1)})
+    mix["share"] = mix["requests"] / max(len(apps), 1)
+    return mix.join(by_language)
+
+
+def funnel(transitions: pd.DataFrame, states: Sequence[str], idle_ttl: float = SESSION_IDLE_TTL,
+           now: Optional[float] = None) -> pd.DataFrame:
+    """
+    How far users get through one flow and where they stop.
+
+    A user reached a state if any transition landed on it or further along
+    (steps answered in one message are skipped over). A user dropped off at
+    the state they were last in when their conversation went idle for
+    idle_ttl seconds, or left via a reset (a move back to the greeting).
+    Users still inside the idle window count as in progress.
+
+    Args:
+        transitions: load("transitions") output
+        states: The flow's states in order, last one the completed state
+
+    Returns:
+        DataFrame indexed by state: reached, dropped, drop_rate, in_progress
+    """
+    order = pd.Series(np.arange(len(states)), index=list(states))
+    steps = transitions.assign(
+        to_step=transitions["to_state"].map(order),
+        from_step=transitions["from_state"].map(order),
+    )
+    steps = steps[steps["to_step"].notna() | steps["from_step"].notna()].sort_values("ts", kind="stable")
+    users = steps.groupby("user")
+    furthest = users["to_step"].max()
+    last = users.tail(1).set_index("user")
+    # A reset lands outside the flow; the user stopped where they came from
+    stopped_at = last["to_step"].fillna(last["from_step"]).astype(int)
+    cutoff = pd.Timestamp((now or time.time()) - idle_ttl, unit="s")
+    idle = (last["ts"] < cutoff) | last["to_step"].isna()
+    finished = stopped_at == len(states) - 1
+
+    counts = np.bincount(furthest.dropna().astype(int), minlength=len(states))
+    reached = counts[::-1].cumsum()[::-1]
+    dropped = np.bincount(stopped_at[idle & ~finished], minlength=len(states))
+    in_progress = np.bincount(stopped_at[~idle & ~finished], minlength=len(states))
+    result = pd.DataFrame({"reached": reached, "dropped": dropped, "in_progress": in_progress}, index=list(states))
+    result["drop_rate"] = (result["dropped"] / result["reached"].where(result["reached"] > 0)).fillna(0.0)
+    return result
+
+
+def slot_utilisation(apps: pd.DataFrame, places: Union[int, Mapping[str, int]]) -> pd.DataFrame:
+    """
+    Booked appointment places against capacity, per appointment day.
+
+    Args:
+        apps: load("applications") output
+        places: Places offered per day (slots times capacity), one number
+            for every day or a mapping of "YYYY-MM-DD" -> places
+
+    Returns:
+        DataFrame indexed by appointment day: booked, places, utilisation
+    """
+    booked = apps["appointment"].dropna().str.slice(0, 10).value_counts().sort_index().rename("booked")
+    result = booked.to_frame()
+    if isinstance(places, Mapping):
+        result["places"] = pd.Series(places).reindex(result.index).fillna(0).astype(int)
+    else:
+        result["places"] = places
+    result["utilisation"] = (result["booked"] / result["places"].where(result["places"] > 0)).fillna(0.0)
+    return result
@@ -0,0 +1,222 @@
+import csv
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from src.agent.flows import BIRTH_FLOW
+from src.agent.references import get_reference_service, normalize
+from src.agent.validation import validate_date, normalize_sex
+from src.utils.pdf_generator import BIRTH_CERTIFICATE, render_certificates_pdf
+
+
+REQUIRED_FIELDS = ["child_name", "date_of_birth", "sex", "father_name", "mother_name"]
+
+# Supplied reference numbers become file names; anything outside this set is replaced
+UNSAFE_NAME_CHARS = re.compile(r"[^A-Za-z0-9_-]")
+
+
+def read_records(path: str) -> Iterator[Tuple[int, dict]]:
+    """
+    Stream (line_number, record) pairs from a .csv or .jsonl file.
+
+    CSV files need a header row with the certificate field names.
+    """
+    source = Path(path)
+    with source.open(newline="", encoding="utf-8-sig") as f:
+        if source.suffix.lower() == ".csv":
+            for i, row in enumerate(csv.DictReader(f), start=2):
+                yield i, row
+        else:
+            for i, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield i, json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield i, {"_error": f"invalid JSON: {e}"}
+
+
+def validate_record(record: dict) -> Tuple[Optional[dict], List[str]]:
+    """
+    Apply the chat flow's rules to one record.
+
+    Returns:
+        (clean_record, []) if valid, otherwise (None, list of problems)
+    """
+    if "_error" in record:
+        return None, [record["_error"]]
+    errors = []
+    clean = {k: str(record.get(k) or "").strip() for k in REQUIRED_FIELDS}
+    for field_name in REQUIRED_FIELDS:
+        if not clean[field_name]:
+            errors.append(f"missing {field_name}")
+    if clean["date_of_birth"] and not validate_date(clean["date_of_birth"]):
+        errors.append(f"invalid date_of_birth {clean['date_of_birth']!r} (use DD/MM/YYYY)")
+    if clean["sex"]:
+        sex = normalize_sex(clean["sex"])
+        if sex is None:
+            errors.append(f"unrecognised sex {clean['sex']!r}")
+        clean["sex"] = sex
+    if errors:
+        return None, errors
+    clean["reference_number"] = str(record.get("reference_number") or "").strip() or get_reference_service().issue("BIRTH")
+    return clean, []
+
+
+def pdf_name(reference: str) -> str:
+    """The certificate's file name: "BIRTH/2026/0000001Y" -> "BIRTH_2026_0000001Y.pdf"."""
+    return UNSAFE_NAME_CHARS.sub("_", reference)[:128] + ".pdf"
+
+
+def _render_chunk(records: List[dict], out_dir: str) -> List[str]:
+    """Worker: render one file per record. Runs in a pool process."""
+    paths = []
+    for data in records:
+        path = str(Path(out_dir) / pdf_name(data["reference_number"]))
+        BIRTH_CERTIFICATE.render(data, path)
+        paths.append(path)
+    return paths
+
+
+class Progress:
+    """Prints throughput to stderr at most every ``interval`` seconds."""
+
+    def __init__(self, interval: float = 2.0):
+        self.interval = interval
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.read = 0
+        self.rendered = 0
+        self.rejected = 0
+
+    def tick(self, force: bool = False):
+        now = time.perf_counter()
+        if force or now - self._last >= self.interval:
+            self._last = now
+            print(self.line(), file=sys.stderr, flush=True)
+
+    def line(self) -> str:
+        elapsed = time.perf_counter() - self.started
+        rate = self.rendered / elapsed if elapsed else 0.0
+        return (f"read {self.read}  rendered {self.rendered}  rejected {self.rejected}  "
+                f"{rate:.1f} certs/s  {elapsed:.1f}s")
+
+    def summary(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "read": self.read,
+            "rendered": self.rendered,
+            "rejected": self.rejected,
+            "seconds": round(elapsed, 3),
+            "certs_per_second": round(self.rendered / elapsed, 1) if elapsed else 0.0,
+        }
+
+
+def _valid_records(input_path: str, errors_file, progress: Progress) -> Iterator[dict]:
+    references = get_reference_service()
+    seen = {}  # normalized reference or file name -> first line using it
+    for line_no, record in read_records(input_path):
+        progress.read += 1
+        clean, errors = validate_record(record)
+        if clean is not None:
+            ref = clean["reference_number"]
+            first = seen.setdefault(normalize(ref), seen.setdefault(pdf_name(ref), line_no))
+            if first != line_no:
+                clean, errors = None, [f"duplicate reference_number {ref!r} (line {first})"]
+            elif references.lookup(ref) is not None:
+                clean, errors = None, [f"reference_number {ref!r} is already filed"]
+        if clean is None:
+            progress.rejected += 1
+            errors_file.write(json.dumps({"line": line_no, "errors": errors}, ensure_ascii=False) + "\n")
+            continue
+        yield clean
+
+
+def batch_generate(input_path: str, output: str, single_file: bool = False, workers: int = None,
+                   chunk_size: int = 50, errors_path: str = None) -> dict:
+    """
+    Generate birth certificates for every valid record in a CSV/JSONL file.
+
+    Args:
+        input_path: .csv (with header) or .jsonl file of registrations
+        output: Output directory, or the PDF path when single_file is True
+        single_file: Write one multi-page PDF instead of one file per record
+        workers: Pool processes for per-file mode (default: all cores)
+        chunk_size: Records per pool task
+        errors_path: Where rejected records are reported (JSONL)
+
+    Returns:
+        Summary dict with counts and throughput
+
+    Every certificate written is filed under its reference like a request
+    completed in the chat, so find_request() finds it. Records whose
+    reference repeats one earlier in the input (or one already filed) are
+    rejected into the errors file rather than overwriting a certificate.
+
+    Input is streamed and at most ``2 * workers`` chunks are in flight, so
+    per-file mode keeps memory flat for large files. Single-file mode renders
+    in this process because one PDF document cannot be written from several
+    processes; the shared form XObject keeps it fast, but the whole document
+    is held until it is saved (see render_certificates_pdf).
+    """
+    progress = Progress()
+    references = get_reference_service()
+    errors_path = errors_path or (str(Path(output).with_suffix("")) + ".errors.jsonl")
+    Path(errors_path).parent.mkdir(parents=True, exist_ok=True)
+
+    with open(errors_path, "w", encoding="utf-8") as errors_file:
+        records = _valid_records(input_path, errors_file, progress)
+
+        if single_file:
+            Path(output).parent.mkdir(parents=True, exist_ok=True)
+
+            drawn = []
+
+            def counted():
+                for data in records:
+                    yield data
+                    drawn.append(data)
+                    progress.rendered += 1
+                    progress.tick()
+
+            render_certificates_pdf(BIRTH_CERTIFICATE, counted(), output)
+            # Filed once the document is saved, so a reference never points at a missing certificate
+            references.file_requests(BIRTH_FLOW.service, drawn)
+        else:
+            Path(output).mkdir(parents=True, exist_ok=True)
+            workers = workers or os.cpu_count() or 1
+
+            def rendered(future, chunk: List[dict]):
+                future.result()
+                references.file_requests(BIRTH_FLOW.service, chunk)
+                progress.rendered += len(chunk)
+                progress.tick()
+
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                max_in_flight = 2 * workers
+                in_flight = {}  # future -> its chunk
+                chunk = []
+                for data in records:
+                    chunk.append(data)
+                    if len(chunk) >= chunk_size:
+                        in_flight[pool.submit(_render_chunk, chunk, output)] = chunk
+                        chunk = []
+                    if len(in_flight) >= max_in_flight:
+                        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            rendered(future, in_flight.pop(future))
+                if chunk:
+                    in_flight[pool.submit(_render_chunk, chunk, output)] = chunk
+                for future, chunk in in_flight.items():
+                    rendered(future, chunk)
+
+    progress.tick(force=True)
+    summary = progress.summary()
+    summary["errors_path"] = errors_path
+    return summary
@@ -1,54 +1,296 @@
+"""
+Content-addressed upload storage.
+
+Uploads are validated and large photos shrunk first (see upload_checks),
+then stored once per distinct content under
+data/uploads/blobs/<aa>/<sha256>, linked from the incoming file when the
+filesystem allows (hardlink, then reflink) and copied otherwise. Each user
+has a manifest (data/uploads/manifests/<user_id>.json, the id hashed unless it
+is plain letters, digits, "_" and "-") naming their files and
+the blobs they point at; a completed application seals its files in
+data/uploads/sealed/<reference>.json. collect_garbage() drops manifests of
+abandoned sessions and deletes blobs nothing points at any more.
+"""
+import hashlib
+import json
 import os
+import re
 import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Optional
+from typing import Iterable, List, Optional
+
+from src.config.settings import UPLOAD_DIR, UPLOAD_GC_GRACE, UPLOAD_WORKERS
+from src.utils.metrics import REGISTRY
+from src.utils.upload_checks import IMAGE_KINDS, check_upload, downscale
+
+
+UPLOAD_BYTES = REGISTRY.counter("kebele_upload_bytes_total", "Uploaded bytes by how they were stored.")
+
+CHUNK_SIZE = 1 << 20
+FICLONE = 0x40049409  # Linux ioctl: share extents with another file (btrfs, xfs, overlayfs on those)
+SAFE_NAME = re.compile(r"[A-Za-z0-9_-]{1,128}")
+
+
+def file_digest(path: Path) -> str:
+    """SHA-256 of a file, read in 1 MiB chunks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _reflink(source: Path, dest: Path) -> bool:
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(source, "rb") as src, open(dest, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return True
+    except OSError:
+        dest.unlink(missing_ok=True)
+        return False
+
+
+def _link_or_copy(source: Path, dest: Path) -> str:
+    """Place source's content at dest; returns how ("hardlink", "reflink" or "copy")."""
+    try:
+        os.link(source, dest)
+        return "hardlink"
+    except OSError:
+        pass
+    if _reflink(source, dest):
+        return "reflink"
+    shutil.copyfile(source, dest)
+    return "copy"
+
+
+class UploadStore:
+    def __init__(self, root: str = UPLOAD_DIR, workers: int = UPLOAD_WORKERS):
+        self.root = Path(root)
+        self.blobs = self.root / "blobs"
+        self.manifests = self.root / "manifests"
+        self.sealed = self.root / "sealed"
+        self.tmp = self.root / "tmp"
+        self.workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="uploads")
+            return self._executor
+
+    def blob_path(self, digest: str) -> Path:
+        return self.blobs / digest[:2] / digest
+
+    def put(self, source: Path) -> tuple:
+        """
+        Store one file by content.
+
+        Returns:
+            (digest, size, how) where how is "deduplicated" when the blob was
+            already stored, otherwise "hardlink", "reflink" or "copy"
+        """
+        digest = file_digest(source)
+        blob = self.blob_path(digest)
+        size = source.stat().st_size
+        if blob.exists():
+            os.utime(blob)  # fresh mtime keeps an in-progress upload out of a concurrent GC sweep
+            how = "deduplicated"
+        else:
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            tmp = blob.with_name(f".{digest}.{os.getpid()}.{threading.get_ident()}")
+            how = _link_or_copy(source, tmp)
+            os.replace(tmp, blob)
+            os.utime(blob)
+        UPLOAD_BYTES.inc(size, kind=how)
+        return digest, size, how
+
+    @staticmethod
+    def _manifest_name(user_id: str) -> str:
+        # The id comes from the client (Gradio's session hash), so it never becomes a path as is
+        if SAFE_NAME.fullmatch(user_id):
+            return user_id
+        return "sha256-" + hashlib.sha256(user_id.encode("utf-8")).hexdigest()
+
+    def _manifest_path(self, user_id: str) -> Path:
+        return self.manifests / f"{self._manifest_name(user_id)}.json"
+
+    def manifest(self, user_id: str) -> List[dict]:
+        """The user's stored files: [{"name", "sha256", "size", "kind", "uploaded"}, ...]."""
+        return self._read_manifest(self._manifest_path(user_id))
+
+    @staticmethod
+    def _read_manifest(path: Path) -> List[dict]:
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))["files"]
+        except (OSError, ValueError, KeyError):
+            return []
+
+    def _write_json(self, path: Path, payload: dict):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}")
+        tmp.write_text(json.dumps(payload), encoding="utf-8")
+        os.replace(tmp, path)
 
+    def _ingest(self, source: Path, kind: str) -> dict:
+        """Shrink a large photo if needed, then store it; returns its manifest entry."""
+        name = source.name
+        if kind in IMAGE_KINDS:
+            self.tmp.mkdir(parents=True, exist_ok=True)
+            shrunk = self.tmp / f"{os.getpid()}.{threading.get_ident()}.jpg"
+            try:
+                if downscale(source, shrunk):
+                    digest, size, _ = self.put(shrunk)
+                    return {"name": f"{Path(name).stem}.jpg", "sha256": digest, "size": size,
+                            "kind": "jpeg", "uploaded": time.time()}
+            finally:
+                shrunk.unlink(missing_ok=True)
+        digest, size, _ = self.put(source)
+        return {"name": name, "sha256": digest, "size": size, "kind": kind, "uploaded": time.time()}
 
-def ensure_upload_dir(user_id: str) -> Path:
-    """Ensure upload directory exists for user."""
-    upload_dir = Path("data/uploads") / user_id
-    upload_dir.mkdir(parents=True, exist_ok=True)
-    return upload_dir
+    def save(self, user_id: str, files: Iterable) -> List[str]:
+        """
+        Validate a user's uploads, store them and record them in their manifest.
+
+        Every file is checked (size, magic bytes) before any is stored; photos
+        are then shrunk and stored in parallel on the store's thread pool.
+
+        Args:
+            user_id: User identifier
+            files: Paths of the uploaded files
+
+        Returns:
+            Blob paths of the stored files, in upload order
+
+        Raises:
+            UploadRejected: if any file fails validation
+        """
+        sources = [Path(f) for f in files if f and Path(f).is_file()]
+        if not sources:
+            return []
+        kinds = [check_upload(source) for source in sources]
+        if len(sources) == 1:
+            stored = [self._ingest(sources[0], kinds[0])]
+        else:
+            stored = list(self._pool().map(self._ingest, sources, kinds))
+
+        with self._lock:
+            entries = self.manifest(user_id)
+            names = {e["name"] for e in entries}
+            for entry in stored:
+                # Same naming as before (stem_1.ext, ...), but against a set instead of stat calls
+                name, stem, suffix = entry["name"], Path(entry["name"]).stem, Path(entry["name"]).suffix
+                counter = 1
+                while name in names:
+                    name = f"{stem}_{counter}{suffix}"
+                    counter += 1
+                entry["name"] = name
+                names.add(name)
+            self._write_json(self._manifest_path(user_id), {"files": entries + stored})
+        return [str(self.blob_path(e["sha256"])) for e in stored]
+
+    def seal(self, reference: str, paths: Iterable[str]):
+        """Keep a submitted application's files regardless of what happens to the session."""
+        digests = [Path(p).name for p in paths or () if Path(p).parent.parent == self.blobs]
+        if digests:
+            self._write_json(self.sealed / f"{reference.replace('/', '_')}.json", {"sha256": digests})
+
+    def collect_garbage(self, live_users: Optional[Iterable[str]] = None, grace: float = UPLOAD_GC_GRACE) -> dict:
+        """
+        Delete abandoned manifests and the blobs only they referenced.
+
+        A manifest is abandoned when it was last written more than ``grace``
+        seconds ago and its user is not in ``live_users`` (if given). Blobs
+        written within ``grace`` seconds are always kept, so uploads in
+        progress survive a concurrent sweep.
+
+        Returns:
+            Counts of removed manifests and blobs, and bytes freed
+        """
+        now = time.time()
+        live = {self._manifest_name(user_id) for user_id in live_users or ()}
+        keep = set()
+        removed_manifests = 0
+
+        with self._lock:
+            for path in self.manifests.glob("*.json"):
+                try:
+                    abandoned = path.stem not in live and now - path.stat().st_mtime > grace
+                except FileNotFoundError:
+                    continue
+                if abandoned:
+                    path.unlink(missing_ok=True)
+                    removed_manifests += 1
+                else:
+                    keep.update(e["sha256"] for e in self._read_manifest(path))
+            for path in self.sealed.glob("*.json"):
+                try:
+                    keep.update(json.loads(path.read_text(encoding="utf-8"))["sha256"])
+                except (OSError, ValueError, KeyError):
+                    continue
+
+            removed_blobs = freed = 0
+            for blob in self.blobs.glob("*/*"):
+                if blob.name in keep or blob.name.startswith("."):
+                    continue
+                try:
+                    st = blob.stat()
+                    if now - max(st.st_mtime, st.st_ctime) <= grace:
+                        continue
+                    blob.unlink()
+                except FileNotFoundError:
+                    continue
+                removed_blobs += 1
+                freed += st.st_size
+
+        return {"manifests": removed_manifests, "blobs": removed_blobs, "bytes": freed}
+
+    def stats(self) -> dict:
+        sizes = [p.stat().st_size for p in self.blobs.glob("*/*") if not p.name.startswith(".")]
+        return {"blobs": len(sizes), "bytes": sum(sizes)}
+
+
+_store: Optional[UploadStore] = None
+_store_lock = threading.Lock()
+
+
+def get_upload_store() -> UploadStore:
+    """Return the shared upload store, creating it on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = UploadStore()
+    return _store
 
 
 def save_uploads(user_id: str, files: Optional[List]) -> List[str]:
     """
-    Save uploaded files to data/uploads/<user_id>/.
-    
+    Validate uploaded files and save them to the content-addressed upload store.
+
     Args:
         user_id: User identifier
         files: List of file paths from Gradio file upload
-        
+
     Returns:
-        List of saved file paths (relative to project root)
+        List of stored blob paths (relative to project root)
+
+    Raises:
+        UploadRejected: if a file is too large or not a PDF or image
     """
     if not files:
         return []
-    
-    upload_dir = ensure_upload_dir(user_id)
-    saved_paths = []
-    
-    for file_path in files:
-        if not file_path:
-            continue
-            
-        source = Path(file_path)
-        if not source.exists():
-            continue
-            
-        # Generate unique filename to avoid conflicts
-        filename = source.name
-        counter = 1
-        dest = upload_dir / filename
-        while dest.exists():
-            stem = source.stem
-            suffix = source.suffix
-            dest = upload_dir / f"{stem}_{counter}{suffix}"
-            counter += 1
-        
-        # Copy file
-        shutil.copy2(source, dest)
-        saved_paths.append(str(dest))
-    
-    return saved_paths
+    return get_upload_store().save(user_id, files)
+
 
+def seal_uploads(reference: str, paths: Optional[List[str]]):
+    """Mark an application's uploads as submitted so garbage collection keeps them."""
+    get_upload_store().seal(reference, paths)
@@ -0,0 +1,220 @@
+import json
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Dict, Optional, Tuple
+
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+TOKEN_BUCKETS = (25, 50, 100, 200, 400, 800, 1600, 3200)
+
+
+def _label_str(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for k, v in labels:
+        v = str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_str(key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self._series: Dict[tuple, list] = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if i < len(self.buckets):
+                series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {k: list(v) for k, v in self._series.items()}
+        for key, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_label_str(key + (('le', f'{bound:g}'),))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_label_str(key + (('le', '+Inf'),))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_label_str(key)} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{_label_str(key)} {series[-1]}")
+        return lines
+
+
+class GaugeFunc:
+    """Gauge read from a callback at scrape time; fn returns a number or {labels_tuple: value}."""
+
+    def __init__(self, name: str, help: str, fn: Callable):
+        self.name = name
+        self.help = help
+        self.fn = fn
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        try:
+            value = self.fn()
+        except Exception as e:
+            print(f"Warning: metric {self.name} failed: {e}")
+            return []
+        if isinstance(value, dict):
+            for key, v in sorted(value.items()):
+                lines.append(f"{self.name}{_label_str(key)} {v:g}")
+        else:
+            lines.append(f"{self.name} {value:g}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self.register(Counter(name, help))
+
+    def histogram(self, name: str, help: str, buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, buckets))
+
+    def gauge(self, name: str, help: str, fn: Callable) -> GaugeFunc:
+        return self.register(GaugeFunc(name, help, fn))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram("kebele_stage_seconds", "Time spent per stage of a chat turn.")
+TURNS = REGISTRY.counter("kebele_turns_total", "Chat turns processed, by state before the turn.")
+TRANSITIONS = REGISTRY.counter("kebele_state_transitions_total", "State machine transitions.")
+SERVICE_EVENTS = REGISTRY.counter("kebele_service_events_total", "Service selections and completions.")
+LLM_SECONDS = REGISTRY.histogram("kebele_llm_seconds", "LLM call latency.")
+LLM_TOKENS = REGISTRY.counter("kebele_llm_tokens_total", "LLM tokens used, by kind.")
+LLM_CALL_TOKENS = REGISTRY.histogram("kebele_llm_call_tokens", "LLM tokens per call, by kind and state.",
+                                     TOKEN_BUCKETS)
+
+
+# Per-turn stage timings and counts; set by the agent's drivers, read when the turn ends
+_turn_stages: ContextVar[Optional[dict]] = ContextVar("kebele_turn_stages", default=None)
+_turn_counts: ContextVar[Optional[dict]] = ContextVar("kebele_turn_counts", default=None)
+
+
+def begin_turn():
+    """Start collecting stage timings and counts for the current turn; returns a reset token."""
+    return _turn_stages.set({}), _turn_counts.set({})
+
+
+def end_turn(token):
+    stages_token, counts_token = token
+    _turn_counts.reset(counts_token)
+    _turn_stages.reset(stages_token)
+
+
+def turn_stages() -> dict:
+    return _turn_stages.get() or {}
+
+
+def turn_counts() -> dict:
+    return _turn_counts.get() or {}
+
+
+def count(name: str, amount: float = 1):
+    """Add to a per-turn count (e.g. LLM tokens) for the current turn, if any."""
+    counts = _turn_counts.get()
+    if counts is not None:
+        counts[name] = counts.get(name, 0) + amount
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block as one stage of the current turn."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        stages = _turn_stages.get()
+        if stages is not None:
+            stages[name] = stages.get(name, 0) + elapsed
+
+
+def timed(name: str):
+    """Decorator form of stage()."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TurnLog:
+    """Optional JSON-lines log with one record per chat turn ("-" for stdout)."""
+
+    def __init__(self, path: str = ""):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+        if path and path != "-":
+            self._file = open(path, "a", encoding="utf-8", buffering=1)
+
+    def write(self, record: dict):
+        if not self.path:
+            return
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            print(line, file=self._file or sys.stdout, flush=self._file is None)
@@ -1,9 +1,11 @@
 import os
 from datetime import datetime
 from pathlib import Path
+from typing import Iterable, List, Tuple
 
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import cm
+from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.pdfgen import canvas
 
 
@@ -14,10 +16,135 @@ def ensure_generated_dir() -> Path:
     return gen_dir
 
 
+class CertificateTemplate:
+    """
+    Certificate layout split into a static part and per-citizen fields.
+
+    Positions and string widths for the static part (national header, title,
+    rule, field labels, footer) are computed once when the template is built,
+    and labels are drawn with one font switch per style. In multi-page
+    documents the static part is drawn once into a PDF form XObject and
+    stamped onto every page with doForm(); single-certificate files (the chat
+    path) replay the static part's page operators, recorded on the template's
+    first render. Field values are drawn in a single text object. New
+    certificate types only need a title and a field list.
+
+    Args:
+        name: Unique form name (used as the XObject name)
+        title: Certificate title under the national header
+        fields: (label, data_key, space_after) rows; space_after is in line heights.
+            The special key "issue_date" defaults to today's date.
+    """
+
+    HEADER = "Federal Democratic Republic of Ethiopia"
+    FOOTER = "Kebele Service Agent MVP"
+    LABEL_X = 3 * cm
+    VALUE_X = 6 * cm
+    LINE_HEIGHT = 0.8 * cm
+    # Fonts of the static part, in the order _draw_static() first sets them
+    STATIC_FONTS = ("Helvetica-Bold", "Helvetica")
+
+    def __init__(self, name: str, title: str, fields: List[Tuple[str, str, float]],
+                 pagesize=A4):
+        self.name = name
+        self.title = title
+        self.pagesize = pagesize
+        width, height = pagesize
+
+        # Precomputed (x, y, text) for static strings, grouped by font
+        self.header = ((width - stringWidth(self.HEADER, "Helvetica-Bold", 16)) / 2, height - 2 * cm, self.HEADER)
+        self.title_pos = ((width - stringWidth(title, "Helvetica-Bold", 20)) / 2, height - 3.5 * cm, title)
+        self.rule = (2 * cm, height - 4 * cm, width - 2 * cm, height - 4 * cm)
+        self.footer = ((width - stringWidth(self.FOOTER, "Helvetica", 8)) / 2, 1.5 * cm, self.FOOTER)
+
+        self.labels = []
+        self.slots = []  # (y, data_key)
+        y = height - 5.5 * cm
+        for label, key, space_after in fields:
+            self.labels.append((self.LABEL_X, y, label))
+            self.slots.append((y, key))
+            y -= self.LINE_HEIGHT * space_after
+        self._static = None  # (internal font names, page operators) recorded by _stamp_static
+
+    def _draw_static(self, c: canvas.Canvas):
+        c.setFont("Helvetica-Bold", 16)
+        c.drawString(*self.header)
+        c.setFont("Helvetica-Bold", 20)
+        c.drawString(*self.title_pos)
+        c.setLineWidth(1)
+        c.line(*self.rule)
+        c.setFont("Helvetica-Bold", 12)
+        for x, y, text in self.labels:
+            c.drawString(x, y, text)
+        c.setFont("Helvetica", 8)
+        c.drawString(*self.footer)
+
+    def _stamp_static(self, c: canvas.Canvas):
+        """
+        Add the static part to the current page from operators recorded once per template.
+
+        The operators refer to fonts by the document's internal names (/F1,
+        /F2), which follow registration order, so the fonts are registered
+        first and the recording is only reused when the names match.
+        """
+        fonts = [c._doc.getInternalFontName(name) for name in self.STATIC_FONTS]
+        recorded = self._static
+        if recorded is not None and recorded[0] == fonts:
+            c._code.extend(recorded[1])
+            return
+        start = len(c._code)
+        self._draw_static(c)
+        self._static = (fonts, c._code[start:])
+
+    def draw_page(self, c: canvas.Canvas, data: dict, issue_date: str = None, as_form: bool = True):
+        """Draw one certificate on the current page of ``c``."""
+        if as_form:
+            if not c.hasForm(self.name):
+                c.beginForm(self.name)
+                self._draw_static(c)
+                c.endForm()
+            c.doForm(self.name)
+        else:
+            # A form only pays off when it is reused across pages
+            self._stamp_static(c)
+
+        values = dict(data)
+        values.setdefault("issue_date", issue_date or datetime.now().strftime("%d/%m/%Y"))
+        text = c.beginText()
+        text.setFont("Helvetica", 12)
+        for y, key in self.slots:
+            text.setTextOrigin(self.VALUE_X, y)
+            text.textOut(str(values.get(key) or ""))
+        c.drawText(text)
+
+    def render(self, data: dict, output_path: str) -> str:
+        """Write a single-certificate PDF."""
+        # The page stream is ~1 KB; compressing it costs more time than it saves
+        c = canvas.Canvas(output_path, pagesize=self.pagesize, pageCompression=0)
+        self.draw_page(c, data, as_form=False)
+        c.save()
+        return output_path
+
+
+BIRTH_CERTIFICATE = CertificateTemplate(
+    "birth_certificate",
+    "Birth Certificate",
+    [
+        ("Child Name:", "child_name", 1),
+        ("Date of Birth:", "date_of_birth", 1),
+        ("Sex:", "sex", 1.5),
+        ("Father Name:", "father_name", 1),
+        ("Mother Name:", "mother_name", 1.5),
+        ("Reference Number:", "reference_number", 1),
+        ("Issue Date:", "issue_date", 1),
+    ],
+)
+
+
 def generate_birth_certificate_pdf(data: dict, output_path: str) -> str:
     """
     Generate a birth certificate PDF using reportlab.
-    
+
     Args:
         data: Dictionary containing:
             - child_name: str
@@ -27,88 +154,33 @@ def generate_birth_certificate_pdf(data: dict, output_path: str) -> str:
             - mother_name: str
             - reference_number: str
         output_path: Path where PDF should be saved
-        
+
     Returns:
         Path to generated PDF file
     """
     ensure_generated_dir()
-    
-    # Create PDF canvas
-    c = canvas.Canvas(output_path, pagesize=A4)
-    width, height = A4
-    
-    # Header
-    c.setFont("Helvetica-Bold", 16)
-    c.drawCentredString(width / 2, height - 2 * cm, "Federal Democratic Republic of Ethiopia")
-    
-    # Title
-    c.setFont("Helvetica-Bold", 20)
-    c.drawCentredString(width / 2, height - 3.5 * cm, "Birth Certificate")
-    
-    # Draw a line under title
-    c.setLineWidth(1)
-    c.line(2 * cm, height - 4 * cm, width - 2 * cm, height - 4 * cm)
-    
-    # Content area
-    y_start = height - 5.5 * cm
-    line_height = 0.8 * cm
-    c.setFont("Helvetica", 12)
-    
-    # Child Name
-    y = y_start
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(3 * cm, y, "Child Name:")
-    c.setFont("Helvetica", 12)
-    c.drawString(6 * cm, y, data.get("child_name", ""))
-    y -= line_height
-    
-    # Date of Birth
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(3 * cm, y, "Date of Birth:")
-    c.setFont("Helvetica", 12)
-    c.drawString(6 * cm, y, data.get("date_of_birth", ""))
-    y -= line_height
-    
-    # Sex
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(3 * cm, y, "Sex:")
-    c.setFont("Helvetica", 12)
-    c.drawString(6 * cm, y, data.get("sex", ""))
-    y -= line_height * 1.5
-    
-    # Father Name
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(3 * cm, y, "Father Name:")
-    c.setFont("Helvetica", 12)
-    c.drawString(6 * cm, y, data.get("father_name", ""))
-    y -= line_height
-    
-    # Mother Name
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(3 * cm, y, "Mother Name:")
-    c.setFont("Helvetica", 12)
-    c.drawString(6 * cm, y, data.get("mother_name", ""))
-    y -= line_height * 1.5
-    
-    # Reference Number
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(3 * cm, y, "Reference Number:")
-    c.setFont("Helvetica", 12)
-    c.drawString(6 * cm, y, data.get("reference_number", ""))
-    y -= line_height
-    
-    # Issue Date
+    return BIRTH_CERTIFICATE.render(data, output_path)
+
+
+def render_certificates_pdf(template: CertificateTemplate, records: Iterable[dict], output_path: str) -> int:
+    """
+    Render many certificates into one multi-page PDF.
+
+    The static layout is defined once for the whole document. Records are
+    consumed lazily, so the input need not fit in memory, but ReportLab keeps
+    every finished page until save(): memory grows with the page count (about
+    6 KB a page). Split very large batches or write one file per record.
+
+    Returns:
+        Number of pages written
+    """
+    c = canvas.Canvas(output_path, pagesize=template.pagesize)
     issue_date = datetime.now().strftime("%d/%m/%Y")
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(3 * cm, y, "Issue Date:")
-    c.setFont("Helvetica", 12)
-    c.drawString(6 * cm, y, issue_date)
-    
-    # Footer
-    c.setFont("Helvetica", 8)
-    c.drawCentredString(width / 2, 1.5 * cm, "Kebele Service Agent MVP")
-    
-    # Save PDF
+    pages = 0
+    for data in records:
+        if pages:
+            c.showPage()
+        template.draw_page(c, data, issue_date)
+        pages += 1
     c.save()
-    return output_path
-
+    return pages
@@ -0,0 +1,171 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from src.config.settings import PDF_WORKERS, PDF_QUEUE_MAX, PDF_MAX_RETRIES, PDF_SUBMIT_TIMEOUT
+
+
+def _render(data: dict, output_path: str) -> str:
+    # Imported in the worker: ReportLab stays out of the web process until needed
+    from src.utils.pdf_generator import generate_birth_certificate_pdf
+
+    return generate_birth_certificate_pdf(data, output_path)
+
+
+def _load() -> bool:
+    import src.utils.pdf_generator  # noqa: F401
+
+    return True
+
+
+class RenderQueueFull(Exception):
+    """Raised when the queue stays full for longer than the submit timeout."""
+
+
+class RenderQueue:
+    """
+    Background PDF rendering on a process pool.
+
+    At most ``max_pending`` jobs are queued or running; submit() waits up to
+    ``submit_timeout`` seconds for a free slot and then raises RenderQueueFull
+    so the caller can fall back to rendering inline. Failed jobs are retried
+    up to ``max_retries`` times. If a worker dies (OOM kill, crash) the pool
+    is broken for good, so it is shut down and the next job starts a new one.
+    """
+
+    # Finished jobs kept for status polling
+    MAX_FINISHED = 10000
+
+    def __init__(self, workers: int = PDF_WORKERS, max_pending: int = PDF_QUEUE_MAX,
+                 max_retries: int = PDF_MAX_RETRIES, submit_timeout: float = PDF_SUBMIT_TIMEOUT):
+        self.workers = workers
+        self.max_retries = max_retries
+        self.submit_timeout = submit_timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._jobs: "OrderedDict[str, dict]" = OrderedDict()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def _discard_executor(self, executor: ProcessPoolExecutor):
+        """Drop a broken pool so _get_executor() starts a fresh one (once, however many jobs notice)."""
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+        print("Warning: PDF worker process died, starting a new pool")
+        executor.shutdown(wait=False)
+
+    def submit(self, job_id: str, data: dict, output_path: str) -> str:
+        """Queue a birth certificate for rendering; returns the job id."""
+        if not self._slots.acquire(timeout=self.submit_timeout):
+            raise RenderQueueFull(f"PDF queue full ({job_id})")
+        job = {
+            "status": "queued",
+            "path": output_path,
+            "attempts": 0,
+            "error": None,
+            "submitted_at": time.time(),
+            "finished_at": None,
+            "data": dict(data),
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+        try:
+            self._start(job_id, job)
+        except Exception:
+            self._finish(job_id, job, "failed", "could not start render job")
+            raise
+        return job_id
+
+    def _start(self, job_id: str, job: dict):
+        job["attempts"] += 1
+        executor = self._get_executor()
+        try:
+            future = executor.submit(_render, job["data"], job["path"])
+        except BrokenProcessPool:
+            self._discard_executor(executor)
+            executor = self._get_executor()
+            future = executor.submit(_render, job["data"], job["path"])
+        future.add_done_callback(lambda f: self._on_done(job_id, job, f, executor))
+
+    def _on_done(self, job_id: str, job: dict, future, executor: ProcessPoolExecutor):
+        error = future.exception()
+        if error is None:
+            self._finish(job_id, job, "done")
+            return
+        if isinstance(error, BrokenProcessPool):
+            self._discard_executor(executor)
+        if job["attempts"] <= self.max_retries:
+            print(f"Warning: PDF render for {job_id} failed (attempt {job['attempts']}), retrying: {error}")
+            try:
+                self._start(job_id, job)
+                return
+            except Exception as e:
+                error = e
+        print(f"Warning: PDF render for {job_id} failed: {error}")
+        self._finish(job_id, job, "failed", str(error))
+
+    def _finish(self, job_id: str, job: dict, status: str, error: str = None):
+        job["status"] = status
+        job["error"] = error
+        job["finished_at"] = time.time()
+        job.pop("data", None)
+        self._slots.release()
+        with self._lock:
+            self._jobs.move_to_end(job_id)
+            while len(self._jobs) > self.MAX_FINISHED:
+                oldest_id, oldest = next(iter(self._jobs.items()))
+                if oldest["finished_at"] is None:
+                    break
+                del self._jobs[oldest_id]
+
+    def status(self, job_id: str) -> Optional[dict]:
+        """Return {"status", "path", "attempts", "error"} or None for unknown jobs."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return {k: job[k] for k in ("status", "path", "attempts", "error")}
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return counts
+
+    def warm_up(self):
+        """Start the worker processes and load ReportLab in them now rather than on the first certificate."""
+        executor = self._get_executor()
+        futures = [executor.submit(_load) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+_queue: Optional[RenderQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_render_queue() -> RenderQueue:
+    """Return the shared render queue, creating it on first use."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = RenderQueue()
+    return _queue
@@ -0,0 +1,123 @@
+"""
+Checks and shrinking applied to uploads before they are stored.
+
+The type comes from the file's first bytes, not its name, and oversized
+phone photos are re-encoded to a bounded size so the store, backups and
+later PDF embedding deal with a few hundred KB instead of 5-12 MB.
+"""
+from pathlib import Path
+from typing import Optional
+
+from src.agent.catalog import messages
+from src.agent.prompts import MSG
+from src.config.settings import (
+    UPLOAD_MAX_BYTES,
+    UPLOAD_IMAGE_MAX_SIDE,
+    UPLOAD_IMAGE_QUALITY,
+    UPLOAD_REENCODE_BYTES,
+)
+
+
+class UploadRejected(ValueError):
+    """
+    An upload failed validation.
+
+    ``key`` is an MSG catalog key (src/agent/prompts.py) and ``params`` fill
+    in its placeholders; the user sees it in their language, and str() gives
+    the English text for logs and the CLI.
+    """
+
+    def __init__(self, key: str, **params):
+        super().__init__(key)
+        self.key = key
+        self.params = params
+
+    def message(self, language: Optional[str]) -> str:
+        """The user-facing text in ``language`` (the catalog's fallbacks apply)."""
+        return messages(language)[self.key].format(**self.params)
+
+    def __str__(self) -> str:
+        return self.message("en")
+
+
+# (offset, signature) -> kind
+MAGIC = (
+    (0, b"%PDF-", "pdf"),
+    (0, b"\xff\xd8\xff", "jpeg"),
+    (0, b"\x89PNG\r\n\x1a\n", "png"),
+    (8, b"WEBP", "webp"),
+    (4, b"ftypheic", "heic"),
+    (4, b"ftypheix", "heic"),
+    (4, b"ftypmif1", "heic"),
+)
+IMAGE_KINDS = {"jpeg", "png", "webp"}  # re-encodable; HEIC is stored as uploaded
+
+
+def sniff(path: Path) -> Optional[str]:
+    """Return the file kind from its magic bytes, or None if not an accepted type."""
+    with open(path, "rb") as f:
+        head = f.read(16)
+    for offset, signature, kind in MAGIC:
+        if head[offset:offset + len(signature)] == signature:
+            return kind
+    return None
+
+
+def check_upload(path: Path, max_bytes: int = UPLOAD_MAX_BYTES) -> str:
+    """
+    Validate one upload without reading more than its header.
+
+    Args:
+        path: The uploaded file
+        max_bytes: Largest accepted size
+
+    Returns:
+        The sniffed kind ("pdf", "jpeg", "png", "webp" or "heic")
+
+    Raises:
+        UploadRejected: if the file is too large or not a PDF or image
+    """
+    size = path.stat().st_size
+    if size > max_bytes:
+        max_mb = f"{max_bytes / 1e6:g}"
+        raise UploadRejected(MSG.UPLOAD_TOO_LARGE, name=path.name, max_mb=max_mb)
+    kind = sniff(path)
+    if kind is None:
+        raise UploadRejected(MSG.UPLOAD_NOT_ACCEPTED, name=path.name)
+    return kind
+
+
+def downscale(source: Path, dest: Path, max_side: int = UPLOAD_IMAGE_MAX_SIDE,
+              quality: int = UPLOAD_IMAGE_QUALITY, min_bytes: int = UPLOAD_REENCODE_BYTES) -> bool:
+    """
+    Re-encode a large photo as a JPEG no larger than max_side on either side.
+
+    Photos under min_bytes that already fit are left alone. JPEGs are
+    decoded at reduced scale (DCT draft mode), which is most of the saving.
+
+    Returns:
+        True if dest was written and is smaller than source
+
+    Raises:
+        UploadRejected: if the image cannot be decoded
+    """
+    from PIL import Image, ImageOps
+
+    size = source.stat().st_size
+    try:
+        with Image.open(source) as img:
+            if size <= min_bytes and max(img.size) <= max_side:
+                return False
+            img.draft("RGB", (max_side, max_side))
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((max_side, max_side))
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            img.save(dest, "JPEG", quality=quality, optimize=True)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        dest.unlink(missing_ok=True)
+        raise UploadRejected(MSG.UPLOAD_UNREADABLE, name=source.name) from e
+    if dest.stat().st_size >= size:
+        dest.unlink()
+        return False
+    return True
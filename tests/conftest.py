@@ -0,0 +1,33 @@
+"""
+Test environment.
+
+Settings are read at import time, so before anything from src is imported
+the working directory (and with it every data/ path) moves to a scratch
+directory, the journal and analytics are off and the LLM is replaced by the
+offline rules.
+"""
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+SCRATCH = tempfile.mkdtemp(prefix="kebele-tests-")
+atexit.register(shutil.rmtree, SCRATCH, ignore_errors=True)
+os.chdir(SCRATCH)
+os.environ.update({
+    "OPENAI_API_KEY": "sk-test",
+    "NLU_PROVIDERS": "rules",
+    "NLU_CACHE_SIZE": "0",
+    "JOURNAL_ENABLED": "False",
+    "ANALYTICS_ENABLED": "False",
+    "SESSION_BACKEND": "memory",
+    "PDF_BACKGROUND": "False",
+    "TRACE_PATH": "",
+    "METRICS_LOG_PATH": "",
+})
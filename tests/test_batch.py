@@ -0,0 +1,82 @@
+"""Batch certificates: issued references are filed like chat requests, file names are safe, duplicates are rejected."""
+import csv
+import json
+from datetime import datetime
+
+import pytest
+
+from src.agent.references import ReferenceService
+from src.utils.batch import batch_generate
+
+
+YEAR = datetime.now().year  # of the references the batch issues
+FIELDS = ["child_name", "date_of_birth", "sex", "father_name", "mother_name", "reference_number"]
+
+
+def registration(child: str, reference: str = "") -> dict:
+    return {"child_name": child, "date_of_birth": "01/02/2020", "sex": "F", "father_name": "Kebede Alemu",
+            "mother_name": "Almaz Tesfaye", "reference_number": reference}
+
+
+@pytest.fixture
+def references(tmp_path, monkeypatch):
+    references = ReferenceService(str(tmp_path / "references.db"))
+    monkeypatch.setattr("src.utils.batch.get_reference_service", lambda: references)
+    return references
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    return str(path)
+
+
+def errors(summary) -> dict:
+    with open(summary["errors_path"], encoding="utf-8") as f:
+        return {entry["line"]: entry["errors"] for entry in map(json.loads, f)}
+
+
+@pytest.mark.parametrize("single_file", [False, True])
+def test_issued_references_are_filed(tmp_path, references, single_file):
+    source = write_csv(tmp_path / "in.csv", [registration("Abebe"), registration("Sara")])
+    output = str(tmp_path / ("out.pdf" if single_file else "out"))
+    summary = batch_generate(source, output, single_file=single_file, workers=1)
+
+    assert summary["rendered"] == 2
+    for serial, child in (("0000001Y", "Abebe"), ("0000002W", "Sara")):
+        record = references.lookup(f"BIRTH/{YEAR}/{serial}")
+        assert (record["kind"], record["data"]["child_name"]) == ("birth_certificate", child)
+        if not single_file:
+            assert (tmp_path / "out" / f"BIRTH_{YEAR}_{serial}.pdf").exists()
+
+
+def test_supplied_references_cannot_escape_the_output_directory(tmp_path, references):
+    source = write_csv(tmp_path / "in.csv", [registration("Abebe", "../../escaped"), registration("Sara", "a b/c.d")])
+    summary = batch_generate(source, str(tmp_path / "out"), workers=1)
+
+    assert summary["rendered"] == 2
+    assert sorted(p.name for p in (tmp_path / "out").iterdir()) == ["______escaped.pdf", "a_b_c_d.pdf"]
+    assert not (tmp_path.parent / "escaped.pdf").exists()
+
+
+def test_duplicate_references_go_to_the_errors_file(tmp_path, references):
+    references.file_requests("birth_certificate", [registration("Old", "BIRTH/2026/0000001Y")])
+    source = write_csv(tmp_path / "in.csv", [
+        registration("Abebe", "OLD/1"),
+        registration("Sara", "old/1"),  # same reference, other case
+        registration("Hana", "OLD_1"),  # would overwrite OLD_1.pdf
+        registration("Yonas", "BIRTH/2026/000000IY"),  # already filed (I read as 1)
+        registration("Meron", "NEW-2"),
+    ])
+    summary = batch_generate(source, str(tmp_path / "out"), workers=1)
+
+    assert (summary["rendered"], summary["rejected"]) == (2, 3)
+    assert errors(summary) == {
+        3: ["duplicate reference_number 'old/1' (line 2)"],
+        4: ["duplicate reference_number 'OLD_1' (line 2)"],
+        5: ["reference_number 'BIRTH/2026/000000IY' is already filed"],
+    }
+    assert references.lookup("BIRTH/2026/0000001Y")["data"]["child_name"] == "Old"
+    assert sorted(p.name for p in (tmp_path / "out").iterdir()) == ["NEW-2.pdf", "OLD_1.pdf"]
@@ -0,0 +1,93 @@
+"""NLU dispatcher: identical requests share one call, a lone request does not wait for a batch."""
+import asyncio
+import threading
+import time
+
+from src.agent.dispatcher import NLUDispatcher, RateLimiter
+
+
+class Router:
+    """Stands in for ProviderRouter: counts calls, each taking ``seconds``."""
+
+    def __init__(self, seconds: float = 0.1):
+        self.seconds = seconds
+        self.calls = []
+
+    async def aparse(self, message: str, state: str, language: str):
+        self.calls.append(message)
+        await asyncio.sleep(self.seconds)
+        return f"parsed {message}", self
+
+    def health(self) -> dict:
+        return {}
+
+    async def aclose(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def dispatcher(router: Router, window_ms: float = 50) -> NLUDispatcher:
+    return NLUDispatcher(router, window_ms=window_ms, max_in_flight=8, limiter=RateLimiter(rpm=0, tpm=0))
+
+
+def test_identical_concurrent_messages_share_one_call():
+    router = Router()
+    nlu = dispatcher(router)
+    barrier = threading.Barrier(20)
+    results = []
+
+    def ask(message: str):
+        barrier.wait()
+        results.append(nlu.parse(message, "birth_child_name", "en")[0])
+
+    threads = [threading.Thread(target=ask, args=("Abebe Kebede" if i % 4 else "Sara Alemu",)) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    nlu.close()
+
+    assert sorted(router.calls) == ["Abebe Kebede", "Sara Alemu"]
+    assert results.count("parsed Abebe Kebede") == 15
+    assert results.count("parsed Sara Alemu") == 5
+
+
+def test_async_callers_coalesce_too():
+    router = Router()
+    nlu = dispatcher(router)
+
+    async def ask_all():
+        return await asyncio.gather(*(nlu.aparse("I need an ID", "greeting", "en") for _ in range(10)))
+
+    results = asyncio.run(ask_all())
+    nlu.close()
+    assert router.calls == ["I need an ID"]
+    assert {command for command, _ in results} == {"parsed I need an ID"}
+
+
+def test_lone_request_skips_the_batch_window():
+    router = Router(seconds=0)
+    nlu = dispatcher(router, window_ms=2000)
+    started = time.perf_counter()
+    nlu.parse("Abebe Kebede", "birth_child_name", "en")
+    nlu.parse("Sara Alemu", "birth_mother_name", "en")
+    elapsed = time.perf_counter() - started
+    nlu.close()
+    assert elapsed < 1
+
+
+def test_request_behind_a_running_call_waits_for_the_batch():
+    router = Router(seconds=0.5)
+    nlu = dispatcher(router, window_ms=300)
+    first = threading.Thread(target=nlu.parse, args=("Abebe Kebede", "birth_child_name", "en"))
+    first.start()
+    while not router.calls:
+        time.sleep(0.01)
+    started = time.perf_counter()
+    nlu.parse("Sara Alemu", "birth_mother_name", "en")
+    elapsed = time.perf_counter() - started
+    first.join()
+    nlu.close()
+    assert elapsed >= 0.3 + 0.5 * 0.9  # the window, then the call itself
@@ -0,0 +1,93 @@
+"""Fast path: unambiguous answers skip the LLM, sentences and requests never become names."""
+import pytest
+
+from src.agent.fastpath import fast_parse, rule_parse
+from src.agent.state import STATES
+
+
+NAME_STATES = [STATES.BIRTH_CHILD_NAME, STATES.BIRTH_FATHER_NAME, STATES.BIRTH_MOTHER_NAME]
+
+
+def parse(message, state):
+    return fast_parse(message, state, "en")
+
+
+@pytest.mark.parametrize("message, service", [
+    ("A", "birth_certificate"),
+    ("b", "id_appointment"),
+    ("birth certificate please", "birth_certificate"),
+    ("I need an ID appointment", "id_appointment"),
+    ("የልደት ሰርተፍኬት ልደት", "birth_certificate"),
+])
+def test_greeting_choices(message, service):
+    cmd = parse(message, STATES.GREETING)
+    assert (cmd.intent, cmd.service) == ("choose_service", service)
+
+
+@pytest.mark.parametrize("message, choice", [("c", "C"), ("D", "D"), ("done", "DONE")])
+def test_menu_choices(message, choice):
+    cmd = parse(message, STATES.BIRTH_PRINT_OPTION)
+    assert (cmd.intent, cmd.choice) == ("choose_option", choice)
+
+
+@pytest.mark.parametrize("message, dob", [
+    ("12/10/2020", "12/10/2020"),
+    ("1.2.2020", "01/02/2020"),
+    ("3-11-2019", "03/11/2019"),
+])
+def test_dates_are_normalised(message, dob):
+    assert parse(message, STATES.BIRTH_DOB).fields == {"date_of_birth": dob}
+
+
+@pytest.mark.parametrize("message", ["31/02/2020", "12/13/2020", "yesterday", "2020"])
+def test_invalid_dates_go_to_the_llm(message):
+    assert parse(message, STATES.BIRTH_DOB) is None
+
+
+@pytest.mark.parametrize("message, age", [("25", 25), ("30 years old", 30), ("18 yrs", 18)])
+def test_ages(message, age):
+    assert parse(message, STATES.ID_AGE).fields == {"age": age}
+
+
+@pytest.mark.parametrize("message, choice", [("yes", "A"), ("I do", "A"), ("no", "B"), ("I don't", "B")])
+def test_has_id_answers(message, choice):
+    assert parse(message, STATES.ID_HAS_ID).choice == choice
+
+
+@pytest.mark.parametrize("state", NAME_STATES)
+@pytest.mark.parametrize("message", ["Abebe Kebede", "Almaz  Tesfaye Bekele", "O'Neil", "አበበ ከበደ"])
+def test_names(state, message):
+    cmd = parse(message, state)
+    assert cmd.intent == "provide_field"
+    assert list(cmd.fields.values()) == [" ".join(message.split())]
+
+
+@pytest.mark.parametrize("state", NAME_STATES)
+@pytest.mark.parametrize("message", [
+    "I want ID",
+    "I need an appointment",
+    "birth certificate",
+    "go back",
+    "start again",
+    "change service",
+    "my name is Abebe",
+    "girl",
+    "yes",
+    "thank you",
+    "ልጅ ነው",
+])
+def test_requests_and_sentences_are_not_names(state, message):
+    assert parse(message, state) is None
+
+
+@pytest.mark.parametrize("state", NAME_STATES)
+@pytest.mark.parametrize("message", ["start over", "Cancel", "restart"])
+def test_reset_in_a_name_state(state, message):
+    assert parse(message, state).intent == "reset"
+
+
+def test_rule_parse_takes_the_name_out_of_a_sentence():
+    assert rule_parse("my name is Abebe Kebede", STATES.BIRTH_FATHER_NAME, "en").fields == {
+        "father_name": "Abebe Kebede"}
+    assert rule_parse("I want ID", STATES.BIRTH_CHILD_NAME, "en") is None
+    assert rule_parse("his name is I want ID", STATES.BIRTH_CHILD_NAME, "en") is None
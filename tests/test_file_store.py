@@ -0,0 +1,39 @@
+"""Upload store: manifests stay inside their directory whatever the user id."""
+from src.utils.file_store import UploadStore
+
+
+def upload(tmp_path, name="notice.pdf"):
+    path = tmp_path / name
+    path.write_bytes(b"%PDF-1.4\n%test\n")
+    return path
+
+
+def test_hostile_user_id_stays_inside_manifests(tmp_path):
+    store = UploadStore(str(tmp_path / "uploads"))
+    hostile = "../../x"
+    store.save(hostile, [upload(tmp_path)])
+
+    manifests = list(store.manifests.iterdir())
+    assert len(manifests) == 1
+    assert manifests[0].parent == store.manifests
+    assert not (tmp_path / "x.json").exists()
+    assert [entry["name"] for entry in store.manifest(hostile)] == ["notice.pdf"]
+
+
+def test_plain_user_id_keeps_its_file_name(tmp_path):
+    store = UploadStore(str(tmp_path / "uploads"))
+    store.save("abc_123-x", [upload(tmp_path)])
+    assert (store.manifests / "abc_123-x.json").exists()
+
+
+def test_garbage_collection_keeps_live_hostile_user(tmp_path):
+    store = UploadStore(str(tmp_path / "uploads"))
+    hostile = "../sessions/../y"
+    source = upload(tmp_path)
+    store.save(hostile, [source])
+
+    assert store.collect_garbage(live_users=[hostile], grace=-1)["manifests"] == 0
+    assert store.manifest(hostile)
+    assert store.collect_garbage(live_users=[], grace=-1) == {
+        "manifests": 1, "blobs": 1, "bytes": source.stat().st_size}
+    assert store.manifest(hostile) == []
@@ -0,0 +1,149 @@
+"""Conversation flows end to end through KebeleAgent.process, with the offline rules as the NLU."""
+import time
+from datetime import datetime
+
+import pytest
+
+from src.agent import slots
+from src.agent.catalog import messages
+from src.agent.core import KebeleAgent
+from src.agent.prompts import MSG
+from src.agent.references import ReferenceService
+from src.agent.sessions import MemorySessionStore
+from src.agent.slots import SlotInventory
+from src.agent.state import STATES
+
+
+EN = messages("en")
+UPLOAD = object()  # a turn that uploads a document instead of typing
+
+
+@pytest.fixture
+def inventory(tmp_path, monkeypatch):
+    inventory = SlotInventory(str(tmp_path / "slots.db"), capacity=1, office_days="0,1,2,3,4,5,6", cache_ttl=0)
+    monkeypatch.setattr(slots, "_inventory", inventory)
+    return inventory
+
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch, inventory):
+    references = ReferenceService(str(tmp_path / "references.db"))
+    monkeypatch.setattr("src.agent.core.get_reference_service", lambda: references)
+    return KebeleAgent(sessions=MemorySessionStore())
+
+
+@pytest.fixture
+def document(tmp_path):
+    path = tmp_path / "residence.pdf"
+    path.write_bytes(b"%PDF-1.4\n%test\n")
+    return str(path)
+
+
+def walk(agent, user, turns, document=None):
+    """Send each (message, state, nextAction) turn and check where the conversation lands."""
+    response = None
+    for message, state, action in turns:
+        if message is UPLOAD:
+            response = agent.process(user, "", "en", files=[document])
+        else:
+            response = agent.process(user, message, "en")
+        assert (agent.sessions.get(user)["state"], response["nextAction"]) == (state, action), message
+    return response
+
+
+BIRTH = [
+    ("", STATES.GREETING, "button_choice"),
+    ("A", STATES.BIRTH_CHILD_NAME, "input_field"),
+    ("I want ID", STATES.BIRTH_CHILD_NAME, "input_field"),
+    ("go back", STATES.BIRTH_CHILD_NAME, "input_field"),
+    ("Abebe Kebede", STATES.BIRTH_DOB, "input_field"),
+    ("31/02/2020", STATES.BIRTH_DOB, "retry"),
+    ("1.2.2020", STATES.BIRTH_SEX, "button_choice"),
+    ("girl", STATES.BIRTH_FATHER_NAME, "input_field"),
+    ("my name is Kebede Alemu", STATES.BIRTH_MOTHER_NAME, "input_field"),
+    ("Almaz Tesfaye", STATES.BIRTH_DOCUMENTS, "file_upload"),
+    (UPLOAD, STATES.BIRTH_PAYMENT, "button_choice"),
+    ("A", STATES.BIRTH_PRINT_OPTION, "input_field"),
+    ("C", STATES.BIRTH_COMPLETE, "complete"),
+]
+
+ID = [
+    ("", STATES.GREETING, "button_choice"),
+    ("I need an ID appointment", STATES.ID_AGE, "input_field"),
+    ("12", STATES.ID_AGE, "retry"),
+    ("25 years old", STATES.ID_HAS_ID, "button_choice"),
+    ("no", STATES.ID_SLOT_SELECTION, "button_choice"),
+    ("B", STATES.ID_DOCUMENTS, "input_field"),
+    ("residence letter", STATES.ID_PAYMENT, "button_choice"),
+    ("A", STATES.ID_COMPLETE, "complete"),
+]
+
+
+def test_birth_certificate_flow(agent, document):
+    response = walk(agent, "mother", BIRTH, document)
+    data = response["data"]
+    assert {key: data[key] for key in ("child_name", "date_of_birth", "sex", "father_name", "mother_name")} == {
+        "child_name": "Abebe Kebede", "date_of_birth": "01/02/2020", "sex": "Female",
+        "father_name": "Kebede Alemu", "mother_name": "Almaz Tesfaye"}
+    assert data["reference_number"] == f"BIRTH/{datetime.now().year}/0000001Y"
+    assert data["print_option"] == "C"
+    assert agent.find_request(data["reference_number"])["data"]["child_name"] == "Abebe Kebede"
+
+
+def test_id_appointment_flow_books_the_offered_slot(agent, inventory):
+    offered = inventory.available(4)
+    response = walk(agent, "applicant", ID[:5])
+    assert response["options"] == ["A", "B", "C", "D"]
+    assert agent.sessions.get("applicant")["data"]["slot_offer"] == dict(zip("ABCD", offered))
+
+    walk(agent, "applicant", ID[5:6])
+    data = agent.sessions.get("applicant")["data"]
+    assert "slot_offer" not in data
+    assert f"{data['appointment_date']} {data['appointment_time']}" == offered[1]
+    assert offered[1] not in inventory.available(4)  # held for this applicant
+
+    response = walk(agent, "applicant", ID[6:])
+    assert response["data"]["has_previous_id"] is False
+    assert inventory.confirm(response["data"]["appointment_reservation"])  # booked, not just held
+    assert agent.find_request(response["data"]["reference_number"])["kind"] == "id_appointment"
+
+
+def test_slot_taken_since_the_offer_is_offered_again(agent, inventory):
+    walk(agent, "late", ID[:5])
+    first = agent.sessions.get("late")["data"]["slot_offer"]["A"]
+    assert inventory.reserve(first) is not None  # someone else was quicker
+
+    response = walk(agent, "late", [("A", STATES.ID_SLOT_SELECTION, "button_choice")])
+    assert response["response"].startswith(EN[MSG.SLOT_TAKEN])
+    assert first not in agent.sessions.get("late")["data"]["slot_offer"].values()
+    walk(agent, "late", [("A", STATES.ID_DOCUMENTS, "input_field")])
+
+
+def test_expired_hold_sends_the_applicant_back_to_the_slots(agent, inventory):
+    inventory.hold_seconds = 0.05
+    walk(agent, "slow", ID[:7])
+    time.sleep(0.1)
+    data = agent.sessions.get("slow")["data"]
+    taken = f"{data['appointment_date']} {data['appointment_time']}"
+    assert inventory.reserve(taken) is not None  # the expired hold gave its place to someone else
+
+    response = walk(agent, "slow", [("A", STATES.ID_SLOT_SELECTION, "button_choice")])
+    assert response["response"].startswith(EN[MSG.SLOT_RELEASED])
+    assert "appointment_reservation" not in agent.sessions.get("slow")["data"]
+
+
+def test_no_free_slots(agent, inventory, monkeypatch):
+    monkeypatch.setattr(inventory, "available", lambda n, after=None: [])
+    response = walk(agent, "unlucky", ID[:4] + [("yes", STATES.ID_SLOT_SELECTION, "retry")])
+    assert response["response"] == EN[MSG.NO_SLOTS]
+
+
+@pytest.mark.parametrize("flow, turns", [("birth", 6), ("birth", 10), ("id", 3), ("id", 6)])
+@pytest.mark.parametrize("reset", ["restart", "start over", "Cancel"])
+def test_reset_mid_flow_starts_again(agent, flow, turns, reset):
+    walk(agent, "u", (BIRTH if flow == "birth" else ID)[:turns])
+    walk(agent, "u", [(reset, STATES.GREETING, "button_choice")])
+    assert agent.sessions.get("u")["data"] == {}
+    assert agent.sessions.get("u")["service"] is None
+    # The other service from a clean slate
+    walk(agent, "u", (ID if flow == "birth" else BIRTH)[1:3])
@@ -0,0 +1,54 @@
+"""
+Importing the app must not load the LLM stack, ReportLab or python-dotenv.
+
+The first two are deferred to warm_up() (see src/agent/warmup.py) so a new replica
+starts serving quickly; benchmarks/bench_import.py --check measures the same
+thing with timings. python-dotenv is only imported when there is a .env
+file to load.
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+from src.config.settings import find_env_file
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+DEFERRED = ("langchain_openai", "reportlab")
+if find_env_file(str(ROOT / "src" / "config")) is None:
+    DEFERRED += ("dotenv",)  # (a developer's .env next to the code is loaded, so it is imported then)
+
+
+def run(code: str, cwd: Path, pythonpath: Path) -> str:
+    # A fresh interpreter, so nothing imported by the test session counts
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=cwd, capture_output=True, text=True, timeout=120,
+        env={**os.environ, "PYTHONPATH": str(pythonpath), "JOURNAL_ENABLED": "False", "ANALYTICS_ENABLED": "False"},
+    )
+    assert result.returncode == 0, result.stderr
+    return result.stdout.strip().splitlines()[-1]
+
+
+def test_app_import_defers_llm_and_pdf_stacks(tmp_path):
+    code = (
+        "import json, sys\n"
+        "import src.ui.gradio_app\n"
+        f"print(json.dumps([name for name in {DEFERRED!r} if name in sys.modules]))\n"
+    )
+    assert json.loads(run(code, tmp_path, ROOT)) == []
+
+
+def test_env_file_is_found_above_the_settings_and_loaded(tmp_path, monkeypatch):
+    config = tmp_path / "app" / "src" / "config"
+    config.mkdir(parents=True)
+    shutil.copy(ROOT / "src" / "config" / "settings.py", config)
+    (tmp_path / ".env").write_text("NLU_TIMEOUT=3.5\n")
+    assert find_env_file(str(config)) == tmp_path / ".env"
+
+    code = "import sys\nfrom src.config import settings\nprint(settings.NLU_TIMEOUT, 'dotenv' in sys.modules)\n"
+    monkeypatch.delenv("NLU_TIMEOUT", raising=False)  # a real variable would win over the .env
+    assert run(code, tmp_path, tmp_path / "app") == "3.5 True"
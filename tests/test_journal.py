@@ -0,0 +1,97 @@
+"""Journal: crash recovery, rotation and compaction, and what startup re-indexes."""
+import json
+import time
+
+from src.agent.journal import Journal
+from src.agent.references import ReferenceService
+from src.agent.sessions import MemorySessionStore
+
+
+def session(state: str) -> dict:
+    return {"state": state, "language": "en", "service": "birth_certificate", "data": {}}
+
+
+def test_replay_after_crash_restores_latest_sessions_and_records(tmp_path):
+    journal = Journal(str(tmp_path))
+    journal.session("a", session("birth_child_name"))
+    journal.session("a", session("birth_dob"))
+    journal.session("b", session("id_age"))
+    journal.session("c", session("id_age"))
+    journal.delete("c")
+    journal.record("birth_certificate", {"reference_number": "BIRTH/2026/0000001Y"})  # waits for the disk
+    # Crash: no close(), and the process died halfway through the next line
+    with open(tmp_path / "journal.log", "ab") as f:
+        f.write(b'{"op": "session", "user": "a", "sess')
+
+    state = Journal(str(tmp_path)).replay()
+    assert {user: s["state"] for user, (_, s) in state.sessions.items()} == {"a": "birth_dob", "b": "id_age"}
+    assert list(state.records) == ["BIRTH/2026/0000001Y"]
+
+
+def test_compaction_keeps_latest_session_and_record_per_key(tmp_path):
+    journal = Journal(str(tmp_path), compact_bytes=1 << 30)
+    for i in range(50):
+        journal.session(f"user{i % 5}", session(f"state{i}"))
+    journal.delete("user4")
+    journal.record("id_appointment", {"reference_number": "ID/2026/00000012", "appointment_time": "09:00"})
+    journal.record("id_appointment", {"reference_number": "ID/2026/00000012", "appointment_time": "10:30"})
+    before = journal.replay()
+    journal.compact()
+
+    assert not (tmp_path / "journal.1.log").exists()
+    snapshot = [json.loads(line) for line in (tmp_path / "snapshot.jsonl").read_text().splitlines()]
+    assert len(snapshot) == 1 + 4  # one record, four live sessions
+    after = journal.replay()
+    assert after.sessions == before.sessions
+    assert after.records["ID/2026/00000012"]["data"]["appointment_time"] == "10:30"
+    journal.close()
+
+
+def test_rotation_by_size_and_interrupted_compaction(tmp_path):
+    journal = Journal(str(tmp_path), compact_bytes=2000, flush_ms=0)
+    for i in range(200):
+        journal.session(f"user{i}", session("id_age"))
+    journal.record("birth_certificate", {"reference_number": "BIRTH/2026/0000001Y"})
+    journal.close()
+    assert (tmp_path / "snapshot.jsonl").exists()
+
+    # A rotated log left behind (crash mid-compaction) is still replayed
+    (tmp_path / "journal.log").rename(tmp_path / "journal.1.log")
+    state = Journal(str(tmp_path)).replay()
+    assert len(state.sessions) == 200
+    assert "BIRTH/2026/0000001Y" in state.records
+
+
+def test_idle_sessions_are_not_restored(tmp_path):
+    journal = Journal(str(tmp_path), idle_ttl=60)
+    journal.append({"op": "session", "user": "old", "session": session("id_age"), "t": time.time() - 3600})
+    journal.session("new", session("id_age"))
+    journal.close()
+    assert list(Journal(str(tmp_path), idle_ttl=60).replay().sessions) == ["new"]
+
+
+def test_startup_indexes_only_records_since_the_last_startup(tmp_path, monkeypatch):
+    from src.agent.core import KebeleAgent
+
+    references = ReferenceService(str(tmp_path / "references.db"))
+    indexed = []
+    index_many = references.index_many
+    monkeypatch.setattr(references, "index_many", lambda rows: indexed.append(list(rows)) or index_many(indexed[-1]))
+    monkeypatch.setattr("src.agent.core.get_reference_service", lambda: references)
+
+    def start(records: list) -> KebeleAgent:
+        journal = Journal(str(tmp_path / "journal"))
+        for ref in records:
+            journal.record("birth_certificate", {"reference_number": ref})
+        journal.close()
+        return KebeleAgent(sessions=MemorySessionStore(), journal=Journal(str(tmp_path / "journal")))
+
+    start(["BIRTH/2026/0000001Y", "BIRTH/2026/0000002W"]).journal.close()
+    start(["BIRTH/2026/0000003T"]).journal.close()
+    agent = start([])
+    agent.journal.close()
+
+    assert [len(rows) for rows in indexed] == [2, 2, 1]  # the newest record of a batch is the mark itself
+    assert [ref for ref, _ in indexed[1]] == ["BIRTH/2026/0000002W", "BIRTH/2026/0000003T"]
+    assert len(references) == 3
+    assert agent.references.lookup("BIRTH/2026/0000003T")["ref"] == "BIRTH/2026/0000003T"
@@ -0,0 +1,68 @@
+"""NLU cache: extracted fields are never served to another user, and entries expire."""
+import time
+
+from src.agent.nlu import UserCommand, UserMessageParser
+from src.agent.nlu_cache import NLUCache, make_key
+
+
+class LLM:
+    """Stands in for the provider router: counts calls, answers from a table."""
+
+    cacheable = True
+
+    def __init__(self, answers: dict):
+        self.answers = answers
+        self.calls = 0
+
+    def parse(self, message, state, language):
+        self.calls += 1
+        return UserCommand(**self.answers[message]), self
+
+
+NAME = {"intent": "provide_field", "fields": {"child_name": "Abebe Kebede"}}
+CHOICE = {"intent": "choose_service", "service": "birth_certificate"}
+
+
+def test_parse_with_fields_is_not_reused_for_the_same_message():
+    llm = LLM({"his name is Abebe Kebede": NAME})
+    parser = UserMessageParser(llm, NLUCache())
+    # Two users (the key carries no user id) typing the same thing in the same state
+    for _ in range(2):
+        assert parser.parse("his name is Abebe Kebede", "birth_child_name", "en").fields == NAME["fields"]
+    assert llm.calls == 2
+    assert parser.cache.stats()["size"] == 0
+
+
+def test_parse_with_fields_is_not_reused_in_another_state():
+    llm = LLM({"Abebe Kebede": NAME})
+    parser = UserMessageParser(llm, NLUCache())
+    parser.parse("Abebe Kebede", "birth_child_name", "en")
+    parser.parse("Abebe Kebede", "birth_father_name", "en")
+    assert llm.calls == 2
+
+
+def test_intent_only_parse_is_shared():
+    llm = LLM({"I want a birth certificate": CHOICE})
+    parser = UserMessageParser(llm, NLUCache())
+    parser.parse("I want a birth certificate", "greeting", "en")
+    assert parser.parse("i want a birth certificate!", "greeting", "en").service == "birth_certificate"
+    assert llm.calls == 1
+
+
+def test_cache_refuses_fields_directly_and_from_disk(tmp_path):
+    path = tmp_path / "nlu_cache.json"
+    cache = NLUCache(path=str(path))
+    assert cache.put(make_key("x", "birth_dob", "en"), {"intent": "provide_field", "fields": {"dob": "1/1/2020"}}) is False
+    # A file written by an older version (or by hand) with fields in it
+    path.write_text('[["birth_dob", "en", "x", 1e12, {"intent": "provide_field", "fields": {"dob": "1/1/2020"}}]]')
+    assert NLUCache(path=str(path)).get(make_key("x", "birth_dob", "en")) is None
+
+
+def test_entries_expire_after_ttl():
+    cache = NLUCache(ttl=0.05)
+    key = make_key("A", "greeting", "en")
+    cache.put(key, CHOICE)
+    assert cache.get(key) == CHOICE
+    time.sleep(0.1)
+    assert cache.get(key) is None
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,46 @@
+"""Certificate rendering: the recorded static part produces the same PDF as drawing it."""
+from io import BytesIO
+
+import pytest
+from reportlab.pdfgen import canvas
+
+from src.utils.pdf_generator import BIRTH_CERTIFICATE, CertificateTemplate
+
+
+DATA = {
+    "child_name": "Abebe Kebede", "date_of_birth": "01/02/2020", "sex": "Female",
+    "father_name": "Kebede Alemu", "mother_name": "Almaz Tesfaye", "reference_number": "BIRTH/2026/0000001Y",
+}
+
+
+def page(template: CertificateTemplate) -> bytes:
+    c = canvas.Canvas(BytesIO(), pagesize=template.pagesize, pageCompression=0, invariant=1)
+    template.draw_page(c, DATA, "18/10/2026", as_form=False)
+    return c.getpdfdata()
+
+
+def test_recorded_static_part_matches_drawing_it(monkeypatch):
+    template = CertificateTemplate("test_certificate", "Test Certificate", [("Child Name:", "child_name", 1)])
+    with monkeypatch.context() as patch:
+        patch.setattr(template, "_stamp_static", template._draw_static)
+        drawn = page(template)
+    assert template._static is None
+
+    assert page(template) == drawn  # records
+    assert template._static is not None
+    monkeypatch.setattr(template, "_draw_static", lambda c: pytest.fail("static part drawn again"))
+    assert page(template) == drawn  # replays
+
+
+def test_recording_is_not_reused_when_font_names_differ():
+    template = CertificateTemplate("test_certificate", "Test Certificate", [("Child Name:", "child_name", 1)])
+    page(template)
+    c = canvas.Canvas(BytesIO(), pagesize=template.pagesize, invariant=1)
+    c.setFont("Courier", 10)  # takes /F2 (Helvetica is /F1), so Helvetica-Bold becomes /F3, not /F2
+    template.draw_page(c, DATA, "18/10/2026", as_form=False)
+    assert "/F3 16 Tf" in "".join(c._code)
+
+
+def test_single_file_render(tmp_path):
+    path = BIRTH_CERTIFICATE.render(DATA, str(tmp_path / "certificate.pdf"))
+    assert open(path, "rb").read(5) == b"%PDF-"
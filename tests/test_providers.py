@@ -0,0 +1,110 @@
+"""Providers: closing from any thread or loop, and failover when a provider's circuit opens."""
+import asyncio
+import time
+
+import pytest
+
+from benchmarks.mock_openai import MockOpenAI
+from src.agent.nlu import UserCommand
+from src.agent.providers import CircuitBreaker, OpenAIProvider, Provider, ProviderRouter
+
+
+@pytest.fixture
+def endpoint():
+    mock = MockOpenAI(latency_ms=0).start()
+    yield mock.base_url
+    mock.stop()
+
+
+def used_on_own_loop(base_url: str) -> tuple:
+    """A provider whose async connections were opened on a loop that is no longer running."""
+    provider = OpenAIProvider("openai", api_key="sk-test", base_url=base_url, max_retries=0)
+    loop = asyncio.new_event_loop()
+    assert loop.run_until_complete(provider.aparse("A", "greeting", "en")).choice == "A"
+    return provider, loop
+
+
+def test_close_inside_another_running_loop(endpoint):
+    provider, loop = used_on_own_loop(endpoint)
+
+    async def shutdown():
+        provider.close()  # must not try to run the provider's loop inside this one
+        await provider._closing
+
+    asyncio.run(shutdown())
+    assert provider.async_http_client.is_closed
+    loop.close()
+
+
+def test_close_with_no_loop_running(endpoint):
+    provider, loop = used_on_own_loop(endpoint)
+    provider.close()
+    assert provider.async_http_client.is_closed
+    loop.close()
+
+
+def test_close_unused_provider(endpoint):
+    provider = OpenAIProvider("openai", api_key="sk-test", base_url=endpoint, max_retries=0)
+    provider.close()
+    assert provider.async_http_client.is_closed and provider.http_client.is_closed
+
+
+class Down(Provider):
+    name = "down"
+
+    def __init__(self):
+        self.calls = 0
+
+    def parse(self, message: str, state: str, language: str) -> UserCommand:
+        self.calls += 1
+        raise ConnectionError("provider down")
+
+    async def aparse(self, message: str, state: str, language: str) -> UserCommand:
+        return self.parse(message, state, language)
+
+
+class Up(Provider):
+    name = "up"
+
+    def parse(self, message: str, state: str, language: str) -> UserCommand:
+        return UserCommand(intent="choose_option", choice="A", fields={})
+
+    async def aparse(self, message: str, state: str, language: str) -> UserCommand:
+        return self.parse(message, state, language)
+
+
+def test_router_fails_over_and_skips_an_open_circuit():
+    down, up = Down(), Up()
+    router = ProviderRouter([down, up], failure_threshold=2, reset_timeout=0.2)
+
+    for _ in range(2):
+        assert router.parse("A", "greeting", "en")[1] is up  # down fails, up answers
+    assert router.health()["down"]["circuit"] == CircuitBreaker.OPEN
+    assert down.calls == 2
+
+    for _ in range(5):
+        assert asyncio.run(router.aparse("A", "greeting", "en"))[1] is up
+    assert down.calls == 2  # not tried while its circuit is open
+
+    time.sleep(0.25)
+    assert router.parse("A", "greeting", "en")[1] is up
+    assert down.calls == 3  # one half-open trial, which failed and opened the circuit again
+    assert router.health()["down"]["circuit"] == CircuitBreaker.OPEN
+
+
+def test_router_recovers_after_a_successful_trial():
+    down, up = Down(), Up()
+    router = ProviderRouter([down, up], failure_threshold=1, reset_timeout=0.1)
+    router.parse("A", "greeting", "en")
+    assert router.health()["down"]["circuit"] == CircuitBreaker.OPEN
+
+    down.parse = up.parse  # back up
+    time.sleep(0.15)
+    assert router.parse("A", "greeting", "en")[1] is down
+    assert router.health()["down"]["circuit"] == CircuitBreaker.CLOSED
+
+
+def test_router_falls_back_to_buttons_when_every_provider_is_down():
+    router = ProviderRouter([Down()], failure_threshold=1)
+    command, provider = router.parse("b", "greeting", "en")
+    assert (command.choice, provider) == ("B", None)
@@ -0,0 +1,62 @@
+"""Render queue: a dead worker process does not take PDF rendering down with it."""
+import os
+import signal
+import time
+
+from src.utils.render_queue import RenderQueue
+
+
+CERTIFICATE = {
+    "child_name": "Abebe Kebede", "date_of_birth": "01/02/2020", "sex": "Female",
+    "father_name": "Kebede Alemu", "mother_name": "Almaz Tesfaye", "reference_number": "BIRTH/2026/0000001Y",
+}
+
+
+def wait_for(queue: RenderQueue, job_id: str, timeout: float = 60) -> dict:
+    deadline = time.monotonic() + timeout
+    while queue.status(job_id)["status"] == "queued":
+        assert time.monotonic() < deadline, f"{job_id} still queued"
+        time.sleep(0.05)
+    return queue.status(job_id)
+
+
+def kill_worker(queue: RenderQueue):
+    executor = queue._executor
+    pid = next(iter(executor._processes))
+    os.kill(pid, signal.SIGKILL)
+    deadline = time.monotonic() + 10
+    while not executor._broken:
+        assert time.monotonic() < deadline, "pool never noticed the dead worker"
+        time.sleep(0.01)
+    return executor
+
+
+def test_killed_worker_is_replaced(tmp_path):
+    queue = RenderQueue(workers=1, max_pending=4, max_retries=1)
+    try:
+        queue.warm_up()
+        broken = kill_worker(queue)
+
+        job = queue.submit("first", CERTIFICATE, str(tmp_path / "first.pdf"))
+        assert wait_for(queue, job)["status"] == "done"
+        assert queue._executor is not broken
+        assert (tmp_path / "first.pdf").stat().st_size > 0
+    finally:
+        queue.shutdown()
+
+
+def test_job_running_when_its_worker_dies_is_retried_on_a_new_pool(tmp_path):
+    queue = RenderQueue(workers=1, max_pending=4, max_retries=1)
+    try:
+        queue.warm_up()
+        job = queue.submit("second", CERTIFICATE, str(tmp_path / "second.pdf"))
+        broken = kill_worker(queue)
+
+        status = wait_for(queue, job)
+        assert status["status"] == "done"
+        assert queue._executor is not broken
+        # Later jobs run on the new pool too
+        later = queue.submit("third", CERTIFICATE, str(tmp_path / "third.pdf"))
+        assert wait_for(queue, later)["status"] == "done"
+    finally:
+        queue.shutdown()
@@ -0,0 +1,81 @@
+"""Slot inventory: no overbooking, expired holds give their place back, full slots are not offered."""
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from src.agent.slots import SlotInventory
+
+
+EVERY_DAY = "0,1,2,3,4,5,6"
+
+
+def inventory(path, **kwargs) -> SlotInventory:
+    kwargs.setdefault("capacity", 1)
+    return SlotInventory(str(path), office_days=EVERY_DAY, cache_ttl=0, **kwargs)
+
+
+def reserve_in_process(path: str, start: str):
+    return inventory(path).reserve(start)
+
+
+def test_last_place_goes_to_one_thread(tmp_path):
+    path = tmp_path / "slots.db"
+    start, = inventory(path).available(1)
+    barrier = threading.Barrier(16)
+    results = []
+
+    def book():
+        slots = inventory(path)  # one connection each, like separate workers
+        barrier.wait()
+        results.append(slots.reserve(start))
+
+    threads = [threading.Thread(target=book) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len([r for r in results if r is not None]) == 1
+
+
+def test_last_place_goes_to_one_process(tmp_path):
+    path = tmp_path / "slots.db"
+    start, = inventory(path).available(1)
+    # Spawned like the app's workers: SQLite connections must not be inherited through fork
+    with ProcessPoolExecutor(8, mp_context=multiprocessing.get_context("spawn")) as pool:
+        results = list(pool.map(reserve_in_process, [str(path)] * 8, [start] * 8))
+    assert len([r for r in results if r is not None]) == 1
+
+
+def test_expired_hold_frees_its_place(tmp_path):
+    path = tmp_path / "slots.db"
+    slots = inventory(path, hold_seconds=0.05)
+    start, = slots.available(1)
+    held = slots.reserve(start)
+    assert held is not None
+    assert slots.reserve(start) is None
+
+    time.sleep(0.1)
+    assert slots.reserve(start) is not None
+    assert slots.confirm(held) is False  # the expired hold is gone
+
+
+def test_confirmed_booking_does_not_expire(tmp_path):
+    slots = inventory(tmp_path / "slots.db", hold_seconds=0.05)
+    start, = slots.available(1)
+    assert slots.confirm(slots.reserve(start))
+    time.sleep(0.1)
+    assert slots.reserve(start) is None
+
+
+def test_full_slots_are_not_offered(tmp_path):
+    path = tmp_path / "slots.db"
+    slots = inventory(path, capacity=2)
+    first, second = slots.available(2)
+    slots.reserve(first)
+    assert slots.available(1) == [first]
+    slots.reserve(first)
+    assert first not in slots.available(4)
+    assert slots.available(1) == [second]
+    # Another process's view of the database agrees
+    assert inventory(path, capacity=2).available(1) == [second]
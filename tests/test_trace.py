@@ -0,0 +1,99 @@
+"""Traces: names and birth dates are masked, and a masked trace still replays to the recorded states."""
+import pytest
+
+from benchmarks.replay_traces import replay
+from src.agent import slots
+from src.agent.core import KebeleAgent
+from src.agent.fastpath import rule_parse
+from src.agent.nlu import UserCommand
+from src.agent.references import ReferenceService
+from src.agent.sessions import MemorySessionStore
+from src.agent.slots import SlotInventory
+from src.agent.state import STATES
+from src.agent.trace import TraceWriter, mask, read_traces, redact
+
+
+CONVERSATIONS = {
+    "mother": ["", "A", "go back", "Abebe Kebede", "31/02/2020", "1.2.2020", "girl", "my name is Kebede Alemu",
+               "Almaz Tesfaye", None, "A", "C"],
+    "father": ["", "A", "his name is Dawit Girma", "born on 15-06-2021", "boy", "Girma Bekele", "Hiwot Alemu",
+               "Hiwot Alemu", "restart", "I need an ID appointment", "25 years old", "no", "B", "residence letter",
+               "A"],
+}
+PERSONAL = ["Abebe", "Kebede", "Alemu", "Almaz", "Tesfaye", "Dawit", "Girma", "Bekele", "Hiwot", "2020", "2021",
+            "residence letter"]
+
+
+@pytest.fixture
+def new_agent(tmp_path, monkeypatch):
+    monkeypatch.setattr(slots, "_inventory", SlotInventory(str(tmp_path / "slots.db"), office_days="0,1,2,3,4,5,6"))
+    references = ReferenceService(str(tmp_path / "references.db"))
+    monkeypatch.setattr("src.agent.core.get_reference_service", lambda: references)
+    return lambda tracer: KebeleAgent(sessions=MemorySessionStore(), tracer=tracer)
+
+
+def turns(path) -> list:
+    return [record for record in read_traces(str(path)) if record["op"] == "turn"]
+
+
+def test_redacted_trace_replays_to_the_recorded_states(tmp_path, new_agent):
+    document = tmp_path / "residence.pdf"
+    document.write_bytes(b"%PDF-1.4\n%test\n")
+    agent = new_agent(TraceWriter(str(tmp_path / "trace.jsonl"), redact=True))
+    for user, messages in CONVERSATIONS.items():
+        for message in messages:
+            agent.process(user, message or "", "en", files=None if message is not None else [str(document)])
+    agent.tracer.close()
+
+    recorded = turns(tmp_path / "trace.jsonl")
+    text = (tmp_path / "trace.jsonl").read_text(encoding="utf-8")
+    assert [word for word in PERSONAL if word in text] == []
+    assert "Xxxxx Xxxxxx" in text and "01.01.2000" in text and "00/00/0000" in text
+
+    replayed_agent = new_agent(TraceWriter(str(tmp_path / "replay.jsonl"), redact=False))
+    counts = replay(replayed_agent, recorded, str(document), 1, UserCommand, rule_parse)
+    replayed_agent.tracer.close()
+    replayed = turns(tmp_path / "replay.jsonl")
+
+    assert counts["unrecorded"] == 0
+    assert [(r["user"], r["before"], r["after"], r["service"]) for r in replayed] == \
+           [(r["user"], r["before"], r["after"], r["service"]) for r in recorded]
+    assert [r["msg"] for r in replayed] == [r["msg"] for r in recorded]
+
+
+def test_unredacted_trace_keeps_the_message(tmp_path, new_agent):
+    agent = new_agent(TraceWriter(str(tmp_path / "trace.jsonl"), redact=False))
+    for message in ["", "A", "Abebe Kebede"]:
+        agent.process("mother", message, "en")
+    agent.tracer.close()
+    assert turns(tmp_path / "trace.jsonl")[-1]["msg"] == "Abebe Kebede"
+
+
+@pytest.mark.parametrize("value, masked", [
+    ("Abebe Kebede", "Xxxxx Xxxxxx"),
+    ("አበበ ከበደ", "ሀሀሀ ሀሀሀ"),
+    ("O'Neil-Tesfaye", "X'Xxxx-Xxxxxxx"),
+    ("1.2.2020", "01.01.2000"),
+    ("31/02/2020", "00/00/0000"),
+    ("born 15-06-2021", "xxxx 01-01-2000"),
+])
+def test_mask_keeps_the_shape(value, masked):
+    assert mask(value) == masked
+
+
+@pytest.mark.parametrize("message, state, masked", [
+    ("Hiwot Alemu", STATES.BIRTH_DOCUMENTS, "Xxxxx Xxxxx"),  # a name at the wrong step
+    ("Hiwot Alemu", STATES.GREETING, "Xxxxx Xxxxx"),
+    ("b", STATES.GREETING, "b"),  # the fast path acts on these: kept as typed
+    ("DONE", STATES.BIRTH_DOCUMENTS, "DONE"),
+    ("birth certificate", STATES.GREETING, "birth certificate"),
+    ("go back", STATES.BIRTH_CHILD_NAME, "go back"),
+])
+def test_whole_message_is_masked_only_when_it_reads_as_a_name(message, state, masked):
+    assert redact(message, None, None, state, "en") == (masked, None)
+
+
+def test_button_answer_kept_as_a_note_is_not_masked():
+    assert redact("done", None, {"documents_note": "done"}, STATES.ID_DOCUMENTS, "en")[0] == "done"
+    assert redact("my kebele letter", None, {"documents_note": "my kebele letter"}, STATES.ID_DOCUMENTS, "en")[0] == \
+        "xx xxxxxx xxxxxx"